@@ -0,0 +1,33 @@
+"""sie_files: company, content hash and size for server-side uploads
+
+Revision ID: 0011_sie_file_uploads
+Revises: 0010_company_lock_takeover_requests
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011_sie_file_uploads"
+down_revision = "0010_company_lock_takeover_requests"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("sie_files", sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=True))
+    op.add_column("sie_files", sa.Column("sha256", sa.String(length=64), nullable=True))
+    op.add_column("sie_files", sa.Column("size_bytes", sa.BigInteger(), nullable=True))
+    op.add_column("sie_files", sa.Column("encoding", sa.String(length=20), nullable=True))
+    op.create_index("ix_sie_files_sha256", "sie_files", ["sha256"], unique=False)
+    op.create_index("ix_sie_files_company_id", "sie_files", ["company_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sie_files_company_id", table_name="sie_files")
+    op.drop_index("ix_sie_files_sha256", table_name="sie_files")
+    op.drop_column("sie_files", "encoding")
+    op.drop_column("sie_files", "size_bytes")
+    op.drop_column("sie_files", "sha256")
+    op.drop_column("sie_files", "company_id")
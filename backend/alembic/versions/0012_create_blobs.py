@@ -0,0 +1,75 @@
+"""blobs table (content-addressed file store) + receipt upload columns
+
+Revision ID: 0012_create_blobs
+Revises: 0011_sie_file_uploads
+Create Date: 2026-10-19
+"""
+
+import os
+from pathlib import Path
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+revision = "0012_create_blobs"
+down_revision = "0011_sie_file_uploads"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("sha256", sa.String(length=64), primary_key=True),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("content_type", sa.String(length=255), nullable=True),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("NOW()")),
+    )
+
+    op.add_column("receipts", sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=True))
+    op.add_column("receipts", sa.Column("blob_sha256", sa.String(length=64), nullable=True))
+    op.add_column("receipts", sa.Column("size_bytes", sa.BigInteger(), nullable=True))
+    op.add_column("receipts", sa.Column("content_type", sa.String(length=255), nullable=True))
+    op.create_index("ix_receipts_blob_sha256", "receipts", ["blob_sha256"], unique=False)
+    op.create_index("ix_receipts_company_id", "receipts", ["company_id"], unique=False)
+
+    # Uploaded SIE files (0011) were stored as STORAGE_DIR/sie/<sha256>.se.
+    # Register them as blobs and move them into the sharded layout.
+    conn = op.get_bind()
+    conn.execute(
+        text(
+            """
+            INSERT INTO blobs (sha256, size_bytes, content_type, ref_count, created_at)
+            SELECT sha256, MAX(size_bytes), 'text/plain', COUNT(*), MIN(created_at)
+            FROM sie_files
+            WHERE sha256 IS NOT NULL
+            GROUP BY sha256
+            """
+        )
+    )
+
+    storage_dir = Path(os.getenv("STORAGE_DIR", str(Path(__file__).resolve().parents[2] / "storage")))
+    rows = conn.execute(text("SELECT DISTINCT sha256 FROM sie_files WHERE sha256 IS NOT NULL")).fetchall()
+    for (sha256,) in rows:
+        old_path = storage_dir / "sie" / f"{sha256}.se"
+        new_path = storage_dir / "blobs" / sha256[0:2] / sha256[2:4] / sha256
+        if old_path.exists() and not new_path.exists():
+            new_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(old_path, new_path)
+        conn.execute(
+            text("UPDATE sie_files SET storage_path = :path WHERE sha256 = :sha256"),
+            {"path": str(new_path), "sha256": sha256},
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_receipts_company_id", table_name="receipts")
+    op.drop_index("ix_receipts_blob_sha256", table_name="receipts")
+    op.drop_column("receipts", "content_type")
+    op.drop_column("receipts", "size_bytes")
+    op.drop_column("receipts", "blob_sha256")
+    op.drop_column("receipts", "company_id")
+    op.drop_table("blobs")
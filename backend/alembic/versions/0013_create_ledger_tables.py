@@ -0,0 +1,63 @@
+"""ledger tables (relational copy of company SIE state)
+
+Revision ID: 0013_create_ledger_tables
+Revises: 0012_create_blobs
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0013_create_ledger_tables"
+down_revision = "0012_create_blobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL -> the ledger is (re)built from sie_content on first use
+    op.add_column("company_sie_states", sa.Column("ledger_version", sa.Integer(), nullable=True))
+
+    op.create_table(
+        "ledger_accounts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("number", sa.String(length=20), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.UniqueConstraint("company_id", "number", name="uq_ledger_accounts_company_number"),
+    )
+
+    op.create_table(
+        "ledger_vouchers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("series", sa.String(length=20), nullable=False),
+        sa.Column("number", sa.Integer(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.UniqueConstraint("company_id", "seq", name="uq_ledger_vouchers_company_seq"),
+    )
+    op.create_index("ix_ledger_vouchers_company_date", "ledger_vouchers", ["company_id", "date"], unique=False)
+
+    op.create_table(
+        "ledger_lines",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("voucher_seq", sa.Integer(), nullable=False),
+        sa.Column("line_no", sa.Integer(), nullable=False),
+        sa.Column("account", sa.String(length=20), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("amount_ore", sa.BigInteger(), nullable=False),
+    )
+    op.create_index("ix_ledger_lines_company_voucher", "ledger_lines", ["company_id", "voucher_seq"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ledger_lines_company_voucher", table_name="ledger_lines")
+    op.drop_table("ledger_lines")
+    op.drop_index("ix_ledger_vouchers_company_date", table_name="ledger_vouchers")
+    op.drop_table("ledger_vouchers")
+    op.drop_table("ledger_accounts")
+    op.drop_column("company_sie_states", "ledger_version")
@@ -0,0 +1,63 @@
+"""company_sie_versions (append-only SIE history: snapshots + line diffs)
+
+Revision ID: 0014_company_sie_versions
+Revises: 0013_create_ledger_tables
+Create Date: 2026-10-19
+"""
+
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+revision = "0014_company_sie_versions"
+down_revision = "0013_create_ledger_tables"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "company_sie_versions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=10), nullable=False),
+        sa.Column("payload", sa.LargeBinary(), nullable=False),
+        sa.Column("content_length", sa.Integer(), nullable=False),
+        sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("NOW()")),
+        sa.UniqueConstraint("company_id", "version", name="uq_company_sie_versions_company_version"),
+    )
+    op.create_index("ix_company_sie_versions_id", "company_sie_versions", ["id"], unique=False)
+
+    # Earlier versions were overwritten; start each history with a snapshot of the current state.
+    conn = op.get_bind()
+    rows = conn.execute(
+        text("SELECT company_id, version, sie_content, updated_by_user_id, updated_at FROM company_sie_states")
+    ).fetchall()
+    for company_id, version, sie_content, user_id, updated_at in rows:
+        conn.execute(
+            text(
+                """
+                INSERT INTO company_sie_versions
+                    (company_id, version, kind, payload, content_length, created_by_user_id, created_at)
+                VALUES (:company_id, :version, 'snapshot', :payload, :length, :user_id, COALESCE(:created_at, NOW()))
+                """
+            ),
+            {
+                "company_id": company_id,
+                "version": version or 1,
+                "payload": zlib.compress(sie_content.encode("utf-8"), 6),
+                "length": len(sie_content),
+                "user_id": user_id,
+                "created_at": updated_at,
+            },
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_company_sie_versions_id", table_name="company_sie_versions")
+    op.drop_table("company_sie_versions")
@@ -0,0 +1,27 @@
+"""ledger_lines index for per-account statements
+
+Revision ID: 0016_ledger_lines_account_index
+Revises: 0015_create_audit_log
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+
+revision = "0016_ledger_lines_account_index"
+down_revision = "0015_create_audit_log"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_ledger_lines_company_account_date",
+        "ledger_lines",
+        ["company_id", "account", "date", "voucher_seq", "line_no"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ledger_lines_company_account_date", table_name="ledger_lines")
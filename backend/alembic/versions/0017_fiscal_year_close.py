@@ -0,0 +1,46 @@
+"""fiscal_years + opening_balances (server-side year closing)
+
+Revision ID: 0017_fiscal_year_close
+Revises: 0016_ledger_lines_account_index
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0017_fiscal_year_close"
+down_revision = "0016_ledger_lines_account_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fiscal_years",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("end_date", sa.Date(), nullable=False),
+        sa.Column("digest", sa.String(length=64), nullable=False),
+        sa.Column("closed_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("closed_at", sa.DateTime(), nullable=True, server_default=sa.text("NOW()")),
+        sa.UniqueConstraint("company_id", "year", name="uq_fiscal_years_company_year"),
+    )
+
+    op.create_table(
+        "opening_balances",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("account", sa.String(length=20), nullable=False),
+        sa.Column("amount_ore", sa.BigInteger(), nullable=False),
+        sa.UniqueConstraint("company_id", "year", "account", name="uq_opening_balances_company_year_account"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("opening_balances")
+    op.drop_table("fiscal_years")
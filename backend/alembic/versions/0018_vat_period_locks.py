@@ -0,0 +1,44 @@
+"""vat_period_locks + vat_period_boxes (server-side VAT period locking)
+
+Revision ID: 0018_vat_period_locks
+Revises: 0017_fiscal_year_close
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0018_vat_period_locks"
+down_revision = "0017_fiscal_year_close"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "vat_period_locks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("period_key", sa.String(length=10), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("end_date", sa.Date(), nullable=False),
+        sa.Column("digest", sa.String(length=64), nullable=False),
+        sa.Column("locked_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("locked_at", sa.DateTime(), nullable=True, server_default=sa.text("NOW()")),
+        sa.UniqueConstraint("company_id", "period_key", name="uq_vat_period_locks_company_period"),
+    )
+
+    op.create_table(
+        "vat_period_boxes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("lock_id", sa.Integer(), sa.ForeignKey("vat_period_locks.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("box", sa.String(length=4), nullable=False),
+        sa.Column("amount_ore", sa.BigInteger(), nullable=False),
+        sa.UniqueConstraint("lock_id", "box", name="uq_vat_period_boxes_lock_box"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("vat_period_boxes")
+    op.drop_table("vat_period_locks")
@@ -0,0 +1,93 @@
+"""invoices, invoice_lines, invoice_runs, invoice_number_sequences (server-side billing)
+
+Revision ID: 0019_invoices
+Revises: 0018_vat_period_locks
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0019_invoices"
+down_revision = "0018_vat_period_locks"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "invoice_number_sequences",
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("next_number", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+    op.create_table(
+        "invoice_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("first_number", sa.Integer(), nullable=False),
+        sa.Column("last_number", sa.Integer(), nullable=False),
+        sa.Column("invoice_count", sa.Integer(), nullable=False),
+        sa.Column("voucher_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_ore", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("NOW()")),
+    )
+    op.create_index("ix_invoice_runs_company_id", "invoice_runs", ["company_id"])
+
+    op.create_table(
+        "invoices",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("invoice_number", sa.Integer(), nullable=False),
+        sa.Column("run_id", sa.Integer(), sa.ForeignKey("invoice_runs.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("document_type", sa.String(length=20), nullable=False, server_default="invoice"),
+        sa.Column("customer_id", sa.Integer(), sa.ForeignKey("customers.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("customer_name", sa.String(length=255), nullable=False),
+        sa.Column("customer_address", sa.String(length=255), nullable=False, server_default=""),
+        sa.Column("issue_date", sa.Date(), nullable=False),
+        sa.Column("due_date", sa.Date(), nullable=False),
+        sa.Column("subtotal_ore", sa.BigInteger(), nullable=False),
+        sa.Column("total_vat_ore", sa.BigInteger(), nullable=False),
+        sa.Column("total_ore", sa.BigInteger(), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="sent"),
+        sa.Column("paid_date", sa.Date(), nullable=True),
+        sa.Column("voucher_number", sa.Integer(), nullable=True),
+        sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("NOW()")),
+        sa.UniqueConstraint("company_id", "invoice_number", name="uq_invoices_company_number"),
+    )
+    op.create_index("ix_invoices_run_id", "invoices", ["run_id"])
+
+    op.create_table(
+        "invoice_lines",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), nullable=False),
+        sa.Column("invoice_number", sa.Integer(), nullable=False),
+        sa.Column("line_no", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("product_name", sa.String(length=255), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("unit_price_ore", sa.BigInteger(), nullable=False),
+        sa.Column("vat_rate", sa.Float(), nullable=False),
+        sa.Column("total_excl_vat_ore", sa.BigInteger(), nullable=False),
+        sa.Column("vat_ore", sa.BigInteger(), nullable=False),
+        sa.Column("total_incl_vat_ore", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["company_id", "invoice_number"],
+            ["invoices.company_id", "invoices.invoice_number"],
+            ondelete="CASCADE",
+        ),
+        sa.UniqueConstraint("company_id", "invoice_number", "line_no", name="uq_invoice_lines_invoice_line"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("invoice_lines")
+    op.drop_index("ix_invoices_run_id", table_name="invoices")
+    op.drop_table("invoices")
+    op.drop_index("ix_invoice_runs_company_id", table_name="invoice_runs")
+    op.drop_table("invoice_runs")
+    op.drop_table("invoice_number_sequences")
@@ -0,0 +1,47 @@
+"""ledger_monthly_totals (pre-aggregated totals for company summaries)
+
+Revision ID: 0020_ledger_monthly_totals
+Revises: 0019_invoices
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0020_ledger_monthly_totals"
+down_revision = "0019_invoices"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ledger_monthly_totals",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("account", sa.String(length=20), nullable=False),
+        sa.Column("debit_ore", sa.BigInteger(), nullable=False),
+        sa.Column("credit_ore", sa.BigInteger(), nullable=False),
+        sa.UniqueConstraint("company_id", "month", "account", name="uq_ledger_monthly_totals_company_month_account"),
+    )
+
+    # existing ledgers; later syncs keep the totals up to date
+    op.execute(
+        """
+        INSERT INTO ledger_monthly_totals (company_id, month, account, debit_ore, credit_ore)
+        SELECT
+            company_id,
+            date_trunc('month', date)::date,
+            account,
+            SUM(CASE WHEN amount_ore > 0 THEN amount_ore ELSE 0 END),
+            SUM(CASE WHEN amount_ore < 0 THEN -amount_ore ELSE 0 END)
+        FROM ledger_lines
+        GROUP BY company_id, date_trunc('month', date)::date, account
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ledger_monthly_totals")
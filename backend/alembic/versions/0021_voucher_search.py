@@ -0,0 +1,39 @@
+"""voucher search: full-text vector on descriptions, amount index on lines
+
+Revision ID: 0021_voucher_search
+Revises: 0020_ledger_monthly_totals
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+
+revision = "0021_voucher_search"
+down_revision = "0020_ledger_monthly_totals"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # generated, so ledger syncs (COPY with an explicit column list) fill it
+    # without knowing about it; 'simple' keeps names and numbers unstemmed
+    op.execute(
+        """
+        ALTER TABLE ledger_vouchers
+        ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(description, ''))) STORED
+        """
+    )
+    op.execute("CREATE INDEX ix_ledger_vouchers_search_vector ON ledger_vouchers USING gin (search_vector)")
+    op.create_index(
+        "ix_ledger_lines_company_amount",
+        "ledger_lines",
+        ["company_id", "amount_ore"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ledger_lines_company_amount", table_name="ledger_lines")
+    op.drop_index("ix_ledger_vouchers_search_vector", table_name="ledger_vouchers")
+    op.drop_column("ledger_vouchers", "search_vector")
@@ -0,0 +1,33 @@
+"""ledger_vouchers.fingerprint for duplicate voucher detection
+
+Revision ID: 0022_voucher_fingerprints
+Revises: 0021_voucher_search
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0022_voucher_fingerprints"
+down_revision = "0021_voucher_search"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ledger_vouchers", sa.Column("fingerprint", sa.String(length=64), nullable=True))
+    op.create_index(
+        "ix_ledger_vouchers_company_fingerprint",
+        "ledger_vouchers",
+        ["company_id", "fingerprint"],
+        unique=False,
+    )
+    # fingerprints are computed in Python; mark every ledger stale so
+    # ensure_ledger() rebuilds it (with fingerprints) on next use
+    op.execute("UPDATE company_sie_states SET ledger_version = NULL")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ledger_vouchers_company_fingerprint", table_name="ledger_vouchers")
+    op.drop_column("ledger_vouchers", "fingerprint")
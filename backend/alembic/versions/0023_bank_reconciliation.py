@@ -0,0 +1,64 @@
+"""bank_statements + bank_transactions for bank reconciliation
+
+Revision ID: 0023_bank_reconciliation
+Revises: 0022_voucher_fingerprints
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0023_bank_reconciliation"
+down_revision = "0022_voucher_fingerprints"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bank_statements",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=True),
+        sa.Column("format", sa.String(length=20), nullable=False),
+        sa.Column("account", sa.String(length=20), nullable=False, server_default="1930"),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("row_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("NOW()")),
+        sa.UniqueConstraint("company_id", "sha256", name="uq_bank_statements_company_sha256"),
+    )
+
+    op.create_table(
+        "bank_transactions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("statement_id", sa.Integer(), sa.ForeignKey("bank_statements.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("row_no", sa.Integer(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("amount_ore", sa.BigInteger(), nullable=False),
+        sa.Column("text", sa.String(length=255), nullable=True),
+        sa.Column("reference", sa.String(length=255), nullable=True),
+        sa.Column("match_status", sa.String(length=20), nullable=False, server_default="unmatched"),
+        sa.Column("voucher_series", sa.String(length=20), nullable=True),
+        sa.Column("voucher_number", sa.Integer(), nullable=True),
+        sa.Column("voucher_line_no", sa.Integer(), nullable=True),
+        sa.Column("match_day_diff", sa.Integer(), nullable=True),
+    )
+    op.create_index("ix_bank_transactions_company_status", "bank_transactions", ["company_id", "match_status", "id"], unique=False)
+    op.create_index("ix_bank_transactions_statement", "bank_transactions", ["statement_id"], unique=False)
+    op.create_index(
+        "ix_bank_transactions_voucher",
+        "bank_transactions",
+        ["company_id", "voucher_series", "voucher_number", "voucher_line_no"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bank_transactions_voucher", table_name="bank_transactions")
+    op.drop_index("ix_bank_transactions_statement", table_name="bank_transactions")
+    op.drop_index("ix_bank_transactions_company_status", table_name="bank_transactions")
+    op.drop_table("bank_transactions")
+    op.drop_table("bank_statements")
@@ -0,0 +1,64 @@
+"""payroll_runs + payroll_lines
+
+Revision ID: 0024_payroll
+Revises: 0023_bank_reconciliation
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0024_payroll"
+down_revision = "0023_bank_reconciliation"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "payroll_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("period", sa.String(length=7), nullable=False),
+        sa.Column("pay_date", sa.Date(), nullable=False),
+        sa.Column("employee_count", sa.Integer(), nullable=False),
+        sa.Column("gross_ore", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("tax_ore", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("net_ore", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("contributions_ore", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("vacation_ore", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("vacation_contributions_ore", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("voucher_series", sa.String(length=20), nullable=True),
+        sa.Column("voucher_number", sa.Integer(), nullable=True),
+        sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text("NOW()")),
+    )
+    op.create_index("ix_payroll_runs_company_period", "payroll_runs", ["company_id", "period"], unique=False)
+
+    op.create_table(
+        "payroll_lines",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("run_id", sa.Integer(), sa.ForeignKey("payroll_runs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("employee_id", sa.String(length=64), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("personal_number", sa.String(length=20), nullable=False),
+        sa.Column("tax_table", sa.Integer(), nullable=True),
+        sa.Column("tax_column", sa.Integer(), nullable=True),
+        sa.Column("tax_percent", sa.Float(), nullable=True),
+        sa.Column("gross_ore", sa.BigInteger(), nullable=False),
+        sa.Column("tax_ore", sa.BigInteger(), nullable=False),
+        sa.Column("net_ore", sa.BigInteger(), nullable=False),
+        sa.Column("contribution_rate_bp", sa.Integer(), nullable=False),
+        sa.Column("contributions_ore", sa.BigInteger(), nullable=False),
+        sa.Column("vacation_ore", sa.BigInteger(), nullable=False),
+        sa.Column("vacation_contributions_ore", sa.BigInteger(), nullable=False),
+    )
+    op.create_index("ix_payroll_lines_run_id", "payroll_lines", ["run_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payroll_lines_run_id", table_name="payroll_lines")
+    op.drop_table("payroll_lines")
+    op.drop_index("ix_payroll_runs_company_period", table_name="payroll_runs")
+    op.drop_table("payroll_runs")
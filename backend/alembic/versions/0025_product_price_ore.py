@@ -0,0 +1,29 @@
+"""products.price (float SEK) -> products.price_ore (BIGINT öre)
+
+Revision ID: 0025_product_price_ore
+Revises: 0024_payroll
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0025_product_price_ore"
+down_revision = "0024_payroll"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("products", sa.Column("price_ore", sa.BigInteger(), nullable=True))
+    op.execute("UPDATE products SET price_ore = ROUND(price::numeric * 100)")
+    op.alter_column("products", "price_ore", nullable=False)
+    op.drop_column("products", "price")
+
+
+def downgrade() -> None:
+    op.add_column("products", sa.Column("price", sa.Float(), nullable=True))
+    op.execute("UPDATE products SET price = price_ore / 100.0")
+    op.alter_column("products", "price", nullable=False)
+    op.drop_column("products", "price_ore")
@@ -0,0 +1,34 @@
+"""company_locks: one lock per (company, scope) instead of per company
+
+Revision ID: 0026_company_lock_scopes
+Revises: 0025_product_price_ore
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0026_company_lock_scopes"
+down_revision = "0025_product_price_ore"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing locks keep covering the whole company
+    op.add_column(
+        "company_locks",
+        sa.Column("scope", sa.String(length=32), nullable=False, server_default="company"),
+    )
+    op.drop_index("ix_company_locks_company_id", table_name="company_locks")
+    op.drop_constraint("company_locks_pkey", "company_locks", type_="primary")
+    op.create_primary_key("company_locks_pkey", "company_locks", ["company_id", "scope"])
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM company_locks WHERE scope <> 'company'")
+    op.drop_constraint("company_locks_pkey", "company_locks", type_="primary")
+    op.create_primary_key("company_locks_pkey", "company_locks", ["company_id"])
+    op.create_index("ix_company_locks_company_id", "company_locks", ["company_id"], unique=True)
+    op.drop_column("company_locks", "scope")
@@ -0,0 +1,29 @@
+"""rate_limit_buckets: token buckets for RATE_LIMIT_BACKEND=postgres
+
+Revision ID: 0027_rate_limit_buckets
+Revises: 0026_company_lock_scopes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0027_rate_limit_buckets"
+down_revision = "0026_company_lock_scopes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("key", sa.String(length=128), primary_key=True),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("allowed", sa.Boolean(), nullable=False, server_default=sa.text("TRUE")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("NOW()")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rate_limit_buckets")
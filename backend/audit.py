@@ -0,0 +1,113 @@
+"""
+Server-side audit trail.
+
+Endpoints call audit_log() after their own commit; entries are queued in
+memory and a background thread writes them with one multi-row INSERT every
+AUDIT_BATCH_SIZE entries or AUDIT_FLUSH_MS milliseconds, whichever comes
+first. Entries still queued when the process is killed are lost, so
+shutdown calls flush_audit_log(). Writing the audit trail never fails the
+request that produced it.
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from database import SessionLocal
+from models import AuditLogEntry
+
+logger = logging.getLogger("snug-api")
+
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_MS = int(os.getenv("AUDIT_FLUSH_MS", "250"))
+
+
+class AuditWriter:
+    def __init__(self, batch_size: int = AUDIT_BATCH_SIZE, flush_ms: int = AUDIT_FLUSH_MS):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self._pending: list[dict] = []
+        self._lock = threading.Lock()
+        # serializes flushes so batches are written in queue order
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, entry: dict) -> None:
+        with self._lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            db = SessionLocal()
+            try:
+                db.execute(insert(AuditLogEntry).values(batch))
+                db.commit()
+                return len(batch)
+            except Exception:
+                db.rollback()
+                logger.warning("Failed to write %d audit entries at once, retrying one by one", len(batch))
+                return self._write_each(db, batch)
+            finally:
+                db.close()
+
+    @staticmethod
+    def _write_each(db, batch: list[dict]) -> int:
+        """
+        Write entries one per savepoint. An entry the database rejects
+        (e.g. its company was deleted meanwhile) is logged and dropped
+        rather than retried forever; the rest of the batch is kept. Any
+        other error (database down) drops the batch.
+        """
+        written = 0
+        try:
+            for entry in batch:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(AuditLogEntry).values(entry))
+                    written += 1
+                except (IntegrityError, DataError):
+                    logger.exception("Dropped audit entry %s for company %s", entry["action"], entry["company_id"])
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to write %d audit entries", len(batch))
+            return 0
+        return written
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+_writer = AuditWriter()
+
+
+def audit_log(company_id: int, user_id: int | None, action: str, description: str) -> None:
+    _writer.add({
+        "company_id": company_id,
+        "user_id": user_id,
+        "action": action,
+        "description": description,
+        "created_at": datetime.utcnow(),
+    })
+
+
+def flush_audit_log() -> int:
+    return _writer.flush()
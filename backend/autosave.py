@@ -0,0 +1,231 @@
+"""
+Write-behind autosave for the SIE state.
+
+While editing, clients save the whole SIE text every few seconds, and each
+plain save is a full version: history row, ledger sync and commit. An
+autosave is instead acknowledged as soon as it is journaled to disk and
+buffered in memory. Saves for a company are coalesced: AUTOSAVE_FLUSH_MS
+after the first save of a burst, only the latest text is written, as one
+ordinary save.
+
+Acknowledged saves are not lost. Each one is first written (and fsynced)
+to AUTOSAVE_DIR/<company>-<seq>.json, and the file is removed only once
+that text, or a later one, has been committed. Files left behind by a
+crash are replayed on startup. A write that fails for another reason
+(the database is unreachable, a dropped connection) keeps the save
+buffered and journaled and is retried with backoff, up to
+AUTOSAVE_RETRY_MAX_MS apart. A save that is rejected (an HTTPException,
+say it changes a closed fiscal year) is reported by failure() until a
+later save for the company goes through, and its file is renamed to
+.failed: kept for recovery, but never replayed over newer data.
+
+Anything that reads or writes the SIE state calls flush_company() first,
+so clients read their own writes and plain saves never get overwritten by
+an older buffered one. The buffer is per process: run one worker (the
+default) or route each company to the same worker.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+from fastapi import HTTPException
+
+from uploads import STORAGE_DIR
+
+logger = logging.getLogger("snug-api")
+
+AUTOSAVE_FLUSH_MS = int(os.getenv("AUTOSAVE_FLUSH_MS", "2000"))
+AUTOSAVE_DIR = Path(os.getenv("AUTOSAVE_DIR", str(STORAGE_DIR / "autosave")))
+# longest wait between retries of a save that failed to write
+AUTOSAVE_RETRY_MAX_MS = int(os.getenv("AUTOSAVE_RETRY_MAX_MS", "60000"))
+
+
+class PendingSave(NamedTuple):
+    user_id: int
+    content: str
+    seq: int
+    # time.monotonic() when the burst is written
+    due: float
+    # failed writes so far, for the retry backoff
+    attempts: int = 0
+
+
+class SieAutosave:
+    def __init__(
+        self,
+        write: Callable[[int, int, str], int],
+        flush_ms: int = AUTOSAVE_FLUSH_MS,
+        journal_dir: Path = AUTOSAVE_DIR,
+    ):
+        # write(company_id, user_id, sie_content) commits one save and returns its version
+        self.write = write
+        self.flush_interval = flush_ms / 1000
+        self.journal_dir = journal_dir
+        self._pending: dict[int, PendingSave] = {}
+        # company -> (seq, error detail) of the last save that could not be written
+        self._failed: dict[int, tuple[int, Any]] = {}
+        self._last_seq = 0
+        self._lock = threading.Lock()
+        # one flush per company at a time, so versions are written in save order
+        self._company_locks: dict[int, threading.Lock] = {}
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def save(self, company_id: int, user_id: int, content: str) -> int:
+        """Journal and buffer one save; returns its sequence number once it is durable."""
+        with self._lock:
+            # wall clock based, so sequence numbers keep growing across restarts
+            self._last_seq = seq = max(self._last_seq + 1, time.time_ns())
+        self._journal(company_id, seq, user_id, content)
+
+        with self._lock:
+            current = self._pending.get(company_id)
+            if current is None or current.seq < seq:
+                due = current.due if current else time.monotonic() + self.flush_interval
+                attempts = current.attempts if current else 0
+                self._pending[company_id] = PendingSave(user_id, content, seq, due, attempts)
+            self._start_thread()
+        self._wakeup.set()
+        return seq
+
+    def pending_content(self, company_id: int) -> str | None:
+        with self._lock:
+            pending = self._pending.get(company_id)
+        return pending.content if pending else None
+
+    def failure(self, company_id: int) -> Any:
+        with self._lock:
+            failed = self._failed.get(company_id)
+        return failed[1] if failed else None
+
+    def flush_company(self, company_id: int) -> int | None:
+        """
+        Write the company's buffered save now; returns its version, or None
+        if there was none or it was rejected. If the write fails otherwise
+        the save stays buffered for a retry and HTTPException 503 is raised,
+        so callers do not go on to read or overwrite older data.
+        """
+        with self._lock:
+            company_lock = self._company_locks.setdefault(company_id, threading.Lock())
+        with company_lock:
+            with self._lock:
+                pending = self._pending.pop(company_id, None)
+            if pending is None:
+                return None
+            try:
+                version = self.write(company_id, pending.user_id, pending.content)
+            except HTTPException as exc:
+                with self._lock:
+                    self._failed[company_id] = (pending.seq, exc.detail)
+                for _, seq, path in self._journal_files(company_id):
+                    if seq <= pending.seq:
+                        path.replace(path.with_suffix(".failed"))
+                return None
+            except Exception as exc:
+                delay = min(max(self.flush_interval, 1.0) * 2 ** pending.attempts, AUTOSAVE_RETRY_MAX_MS / 1000)
+                logger.exception("Autosave for company %s failed; retrying in %.1fs", company_id, delay)
+                with self._lock:
+                    # a save that arrived meanwhile is newer and replaces this one
+                    if company_id not in self._pending:
+                        self._pending[company_id] = pending._replace(
+                            due=time.monotonic() + delay, attempts=pending.attempts + 1
+                        )
+                    self._failed[company_id] = (pending.seq, "Saving failed; retrying")
+                    self._start_thread()
+                self._wakeup.set()
+                raise HTTPException(
+                    status_code=503,
+                    detail="Buffered changes could not be saved yet; try again shortly",
+                    headers={"Retry-After": str(max(1, round(delay)))},
+                ) from exc
+            with self._lock:
+                failed = self._failed.get(company_id)
+                if failed and failed[0] <= pending.seq:
+                    del self._failed[company_id]
+            self._remove_journal(company_id, pending.seq)
+            return version
+
+    def flush_all(self) -> int:
+        """Write every buffered save; returns how many were written (failed ones stay journaled)."""
+        with self._lock:
+            company_ids = list(self._pending)
+        written = 0
+        for company_id in company_ids:
+            try:
+                written += self.flush_company(company_id) is not None
+            except HTTPException:
+                pass
+        return written
+
+    def replay(self) -> int:
+        """Buffer the newest journaled save of each company (left by a crash) and write them."""
+        latest: dict[int, tuple[int, Path]] = {}
+        for company_id, seq, path in self._journal_files():
+            if company_id not in latest or latest[company_id][0] < seq:
+                latest[company_id] = (seq, path)
+        with self._lock:
+            for company_id, (seq, path) in latest.items():
+                record = json.loads(path.read_text(encoding="utf-8"))
+                self._pending[company_id] = PendingSave(record["userId"], record["sieContent"], seq, 0.0)
+                self._last_seq = max(self._last_seq, seq)
+        if latest:
+            logger.info("Replaying %d journaled autosaves", len(latest))
+        return self.flush_all()
+
+    def _start_thread(self) -> None:
+        # caller holds self._lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sie-autosave", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                due = [company_id for company_id, pending in self._pending.items() if pending.due <= now]
+                next_due = min((pending.due for pending in self._pending.values()), default=None)
+            if due:
+                for company_id in due:
+                    try:
+                        self.flush_company(company_id)
+                    except HTTPException:
+                        # still buffered, with a later due time
+                        pass
+                continue
+            self._wakeup.wait(None if next_due is None else next_due - now)
+            self._wakeup.clear()
+
+    def _journal(self, company_id: int, seq: int, user_id: int, content: str) -> None:
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        path = self.journal_dir / f"{company_id}-{seq}.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"companyId": company_id, "userId": user_id, "seq": seq, "sieContent": content}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if hasattr(os, "O_DIRECTORY"):
+            # make the rename itself durable
+            fd = os.open(self.journal_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _journal_files(self, company_id: int | None = None):
+        if not self.journal_dir.is_dir():
+            return
+        for path in self.journal_dir.glob(f"{'*' if company_id is None else company_id}-*.json"):
+            company_id, _, seq = path.stem.partition("-")
+            if company_id.isdigit() and seq.isdigit():
+                yield int(company_id), int(seq), path
+
+    def _remove_journal(self, company_id: int, up_to_seq: int) -> None:
+        for _, seq, path in self._journal_files(company_id):
+            if seq <= up_to_seq:
+                path.unlink(missing_ok=True)
@@ -0,0 +1,614 @@
+"""
+Bank reconciliation.
+
+Statement files (CSV exports or ISO 20022 camt.054 XML) are parsed row by
+row straight from the spooled upload and loaded in batches, so a large
+statement never sits in memory. Matching pairs bank rows with ledger lines
+on the statement's bank account (1930 by default): both sides are sorted by
+(amount, date) and merged in one pass, pairing equal amounts whose dates
+are at most MATCH_WINDOW_DAYS apart, i.e. O(n log n) for the sorts and
+O(n) for the merge. Pairs are stored as suggestions until a user confirms
+them; confirmed matches are never touched by later runs.
+"""
+
+import codecs
+import csv
+import io
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, exists, select, text, tuple_, update
+from sqlalchemy.orm import Session
+
+from bulk_import import MAX_REPORTED_ERRORS
+from database import bulk_insert, copy_rows
+from models import BankStatement, BankTransaction, LedgerLine, LedgerVoucher
+from uploads import STORAGE_DIR, UploadedFile
+
+BANK_UPLOAD_DIR = STORAGE_DIR / "bank-uploads"
+
+# Rows per INSERT / COPY batch while loading a statement.
+BANK_BATCH_SIZE = 5000
+
+# Largest difference in days between a bank row and a voucher that is still suggested as a match.
+MATCH_WINDOW_DAYS = int(os.getenv("BANK_MATCH_WINDOW_DAYS", "5"))
+
+DEFAULT_BANK_ACCOUNT = "1930"
+
+# CSV headers of Swedish bank exports, in order of preference
+_CSV_COLUMNS = {
+    "date": ("date", "datum", "bokföringsdag", "bokforingsdag", "bokföringsdatum", "transaktionsdag",
+             "transaktionsdatum", "booking date", "valutadag"),
+    "amount": ("amount", "belopp", "belopp sek", "transaktionsbelopp"),
+    "text": ("text", "beskrivning", "description", "meddelande", "transaktionstext", "rubrik", "mottagare"),
+    "reference": ("reference", "referens", "ocr", "verifikationsnummer"),
+}
+# some exports (Swedbank) put a title line or two above the header
+_CSV_HEADER_SEARCH_LINES = 10
+
+_DATE_FORMATS = ("%Y-%m-%d", "%Y%m%d", "%Y/%m/%d", "%d.%m.%Y", "%y-%m-%d")
+
+
+# ------------------------------------------------------------
+# Parsing
+# ------------------------------------------------------------
+def parse_bank_amount(raw: str) -> int:
+    """'-1 234,50', '1234.50' or '1.234,50' -> öre. Raises ValueError."""
+    value = re.sub(r"[\s ]", "", raw or "").replace("SEK", "").replace("kr", "")
+    value = value.replace("−", "-")
+    if "," in value and "." in value:
+        # the later separator is the decimal one
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    else:
+        value = value.replace(",", ".")
+    if not re.fullmatch(r"[-+]?\d+(\.\d{1,2})?", value):
+        raise ValueError(f"Invalid amount '{raw}'")
+    sign = -1 if value.startswith("-") else 1
+    whole, _, frac = value.lstrip("+-").partition(".")
+    return sign * (int(whole) * 100 + int((frac + "00")[:2]))
+
+
+def parse_bank_date(raw: str) -> date:
+    value = (raw or "").strip()[:10]
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{raw}'")
+
+
+def detect_statement_format(head: bytes) -> str:
+    start = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    return "camt054" if start.startswith(b"<") else "csv"
+
+
+def _detect_text_encoding(head: bytes) -> str:
+    # bank exports are UTF-8 or Windows-1252; a cut-off multi-byte character at the end of head is fine
+    try:
+        head.decode("utf-8")
+        return "utf-8-sig"
+    except UnicodeDecodeError as exc:
+        return "utf-8-sig" if exc.start >= len(head) - 3 else "cp1252"
+
+
+def _cp1252_fallback(exc: UnicodeError) -> tuple[str, int]:
+    # head only shows the first chunk: a Windows-1252 file can be plain ASCII there and
+    # have "å" as a lone 0xE5 further down, which is read as Windows-1252 instead of failing
+    if not isinstance(exc, UnicodeDecodeError):
+        raise exc
+    return exc.object[exc.start:exc.end].decode("cp1252", errors="replace"), exc.end
+
+
+codecs.register_error("bank-cp1252", _cp1252_fallback)
+
+
+def _csv_columns(header: list[str]) -> dict[str, int] | None:
+    names = [name.strip().strip('"').lower() for name in header]
+    columns = {}
+    for field, aliases in _CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    return columns if "date" in columns and "amount" in columns else None
+
+
+def iter_csv_rows(path: Path, head: bytes) -> Iterator[tuple[int, dict | None, str | None]]:
+    """Yield (row_no, row, error) like bulk_import.iter_raw_rows; row_no counts data rows."""
+    with open(path, "rb") as raw:
+        stream = io.TextIOWrapper(raw, encoding=_detect_text_encoding(head), errors="bank-cp1252", newline="")
+        columns = None
+        for _ in range(_CSV_HEADER_SEARCH_LINES):
+            line = stream.readline()
+            if not line:
+                break
+            delimiter = max((";", ",", "\t"), key=line.count)
+            header = next(csv.reader([line], delimiter=delimiter))
+            columns = _csv_columns(header)
+            if columns:
+                break
+        if not columns:
+            raise HTTPException(status_code=400, detail="No date and amount columns found in the CSV header")
+
+        for row_no, values in enumerate(csv.reader(stream, delimiter=delimiter), start=1):
+            if not any(value.strip() for value in values):
+                continue
+            try:
+                row = {
+                    "date": parse_bank_date(values[columns["date"]]),
+                    "amount_ore": parse_bank_amount(values[columns["amount"]]),
+                    "text": values[columns["text"]].strip()[:255] or None if "text" in columns else None,
+                    "reference": values[columns["reference"]].strip()[:255] or None if "reference" in columns else None,
+                }
+            except IndexError:
+                yield row_no, None, "Too few columns"
+                continue
+            except ValueError as exc:
+                yield row_no, None, str(exc)
+                continue
+            yield row_no, row, None
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child(element: ET.Element, *names: str) -> ET.Element | None:
+    for name in names:
+        element = next((c for c in element if _local(c.tag) == name), None)
+        if element is None:
+            return None
+    return element
+
+
+def _descendant_text(element: ET.Element, name: str) -> str | None:
+    for node in element.iter():
+        if _local(node.tag) == name and node.text and node.text.strip():
+            return node.text.strip()
+    return None
+
+
+def iter_camt054_rows(path: Path) -> Iterator[tuple[int, dict | None, str | None]]:
+    """One row per booked entry (<Ntry>); entries are dropped once read so memory stays flat."""
+    row_no = 0
+    # open elements; an entry is removed from its parent, clear() alone keeps it in the tree
+    parents: list[ET.Element] = []
+    try:
+        for event, element in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                parents.append(element)
+                continue
+            parents.pop()
+            if _local(element.tag) != "Ntry":
+                continue
+            row_no += 1
+            try:
+                amount = _child(element, "Amt")
+                booked = _child(element, "BookgDt", "Dt")
+                if booked is None:
+                    booked = _child(element, "BookgDt", "DtTm")
+                if booked is None:
+                    booked = _child(element, "ValDt", "Dt")
+                if amount is None or booked is None:
+                    raise ValueError("Entry without amount or booking date")
+                amount_ore = parse_bank_amount(amount.text or "")
+                indicator = _child(element, "CdtDbtInd")
+                if indicator is not None and (indicator.text or "").strip() == "DBIT":
+                    amount_ore = -abs(amount_ore)
+                message = _descendant_text(element, "Ustrd") or _descendant_text(element, "Nm") or _descendant_text(element, "AddtlNtryInf")
+                reference = _descendant_text(element, "AcctSvcrRef") or _descendant_text(element, "EndToEndId")
+                row = {
+                    "date": parse_bank_date(booked.text or ""),
+                    "amount_ore": amount_ore,
+                    "text": message[:255] if message else None,
+                    "reference": reference[:255] if reference else None,
+                }
+            except ValueError as exc:
+                yield row_no, None, str(exc)
+                continue
+            finally:
+                element.clear()
+                if parents:
+                    parents[-1].remove(element)
+            yield row_no, row, None
+    except ET.ParseError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid camt.054 file: {exc}")
+
+
+# ------------------------------------------------------------
+# Import
+# ------------------------------------------------------------
+def import_statement(db: Session, company_id: int, upload: UploadedFile, account: str, user_id: int) -> dict:
+    """Load a statement and run matching (caller commits). Re-uploads of the same file are reported, not loaded."""
+    existing = (
+        db.query(BankStatement)
+        .filter(BankStatement.company_id == company_id, BankStatement.sha256 == upload.sha256)
+        .first()
+    )
+    if existing:
+        return {"statementId": existing.id, "duplicate": True, "imported": 0, "failed": 0, "errors": []}
+
+    started = time.perf_counter()
+    fmt = detect_statement_format(upload.head)
+    statement = BankStatement(
+        company_id=company_id,
+        filename=upload.filename,
+        format=fmt,
+        account=account,
+        sha256=upload.sha256,
+        created_by_user_id=user_id,
+    )
+    db.add(statement)
+    db.flush()
+
+    rows = iter_camt054_rows(upload.path) if fmt == "camt054" else iter_csv_rows(upload.path, upload.head)
+    report = {"failed": 0, "errors": []}
+    batch: list[dict] = []
+    imported = 0
+    for row_no, row, error in rows:
+        if error:
+            report["failed"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": row_no, "error": error})
+            continue
+        batch.append({
+            "company_id": company_id,
+            "statement_id": statement.id,
+            "row_no": row_no,
+            **row,
+            "match_status": "unmatched",
+            "voucher_series": None,
+            "voucher_number": None,
+            "voucher_line_no": None,
+            "match_day_diff": None,
+        })
+        if len(batch) >= BANK_BATCH_SIZE:
+            bulk_insert(db, BankTransaction, batch)
+            imported += len(batch)
+            batch = []
+    bulk_insert(db, BankTransaction, batch)
+    imported += len(batch)
+    if not imported:
+        raise HTTPException(status_code=400, detail={"message": "No bank rows could be read", **report})
+    statement.row_count = imported
+
+    matching = reconcile(db, company_id, account)
+    return {
+        "statementId": statement.id,
+        "duplicate": False,
+        "format": fmt,
+        "imported": imported,
+        **report,
+        "matching": matching,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+# ------------------------------------------------------------
+# Matching
+# ------------------------------------------------------------
+def match_transactions(
+    bank_rows: list[tuple[int, int, int]],
+    ledger_lines: list[tuple[int, int, tuple]],
+    window_days: int = MATCH_WINDOW_DAYS,
+) -> list[tuple[int, tuple, int]]:
+    """
+    Pair (amount_ore, day ordinal, id) bank rows with (amount_ore, day
+    ordinal, key) ledger lines: equal amounts, dates at most `window_days`
+    apart. Greedy in (amount, date) order, which gives the largest number
+    of pairs for a fixed window. Returns (id, key, day difference).
+    """
+    bank_rows = sorted(bank_rows)
+    ledger_lines = sorted(ledger_lines, key=lambda line: (line[0], line[1]))
+    pairs = []
+    i = j = 0
+    while i < len(bank_rows) and j < len(ledger_lines):
+        bank_amount, bank_day, bank_id = bank_rows[i]
+        line_amount, line_day, line_key = ledger_lines[j]
+        if bank_amount < line_amount:
+            i += 1
+        elif bank_amount > line_amount:
+            j += 1
+        elif line_day < bank_day - window_days:
+            j += 1
+        elif line_day > bank_day + window_days:
+            i += 1
+        else:
+            pairs.append((bank_id, line_key, line_day - bank_day))
+            i += 1
+            j += 1
+    return pairs
+
+
+def _statement_scope(company_id: int, account: str):
+    return BankTransaction.statement_id.in_(
+        select(BankStatement.id).where(BankStatement.company_id == company_id, BankStatement.account == account)
+    )
+
+
+def _matched_line(company_id: int):
+    """EXISTS: a bank row is matched or suggested to the LedgerLine/LedgerVoucher row."""
+    return exists().where(
+        BankTransaction.company_id == company_id,
+        BankTransaction.match_status != "unmatched",
+        BankTransaction.voucher_series == LedgerVoucher.series,
+        BankTransaction.voucher_number == LedgerVoucher.number,
+        BankTransaction.voucher_line_no == LedgerLine.line_no,
+    )
+
+
+def _store_suggestions(db: Session, rows: list[dict]) -> None:
+    """COPY into a temp table + one UPDATE ... FROM on Postgres, executemany by id elsewhere."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(
+            "CREATE TEMP TABLE bank_suggestions (tx_id integer, series varchar(20), number integer, "
+            "line_no integer, day_diff integer)"
+        ))
+        copy_rows(db, "bank_suggestions", ["tx_id", "series", "number", "line_no", "day_diff"], rows)
+        db.execute(text(
+            "UPDATE bank_transactions SET match_status = 'suggested', voucher_series = s.series, "
+            "voucher_number = s.number, voucher_line_no = s.line_no, match_day_diff = s.day_diff "
+            "FROM bank_suggestions s WHERE bank_transactions.id = s.tx_id"
+        ))
+        db.execute(text("DROP TABLE bank_suggestions"))
+        return
+    table = BankTransaction.__table__
+    db.execute(
+        table.update()
+        .where(table.c.id == bindparam("tx_id"))
+        .values(
+            match_status="suggested",
+            voucher_series=bindparam("series"),
+            voucher_number=bindparam("number"),
+            voucher_line_no=bindparam("line_no"),
+            match_day_diff=bindparam("day_diff"),
+        ),
+        rows,
+    )
+
+
+def reconcile(db: Session, company_id: int, account: str = DEFAULT_BANK_ACCOUNT, window_days: int = MATCH_WINDOW_DAYS) -> dict:
+    """Replace the suggestions for `account` (caller commits). The ledger must be up to date."""
+    started = time.perf_counter()
+    scope = _statement_scope(company_id, account)
+    db.execute(
+        update(BankTransaction)
+        .where(BankTransaction.company_id == company_id, BankTransaction.match_status == "suggested", scope)
+        .values(match_status="unmatched", voucher_series=None, voucher_number=None, voucher_line_no=None, match_day_diff=None)
+        .execution_options(synchronize_session=False)
+    )
+
+    bank_rows = [
+        (amount_ore, row_date.toordinal(), tx_id)
+        for tx_id, row_date, amount_ore in db.query(BankTransaction.id, BankTransaction.date, BankTransaction.amount_ore)
+        .filter(BankTransaction.company_id == company_id, BankTransaction.match_status == "unmatched", scope)
+    ]
+    ledger_lines = [
+        (amount_ore, line_date.toordinal(), (series, number, line_no))
+        for amount_ore, line_date, series, number, line_no in (
+            db.query(LedgerLine.amount_ore, LedgerLine.date, LedgerVoucher.series, LedgerVoucher.number, LedgerLine.line_no)
+            .join(
+                LedgerVoucher,
+                (LedgerVoucher.company_id == LedgerLine.company_id) & (LedgerVoucher.seq == LedgerLine.voucher_seq),
+            )
+            .filter(LedgerLine.company_id == company_id, LedgerLine.account == account, ~_matched_line(company_id))
+        )
+    ]
+
+    pairs = match_transactions(bank_rows, ledger_lines, window_days)
+    if pairs:
+        _store_suggestions(db, [
+            {"tx_id": tx_id, "series": series, "number": number, "line_no": line_no, "day_diff": day_diff}
+            for tx_id, (series, number, line_no), day_diff in pairs
+        ])
+    return {
+        "suggested": len(pairs),
+        "unmatchedBankRows": len(bank_rows) - len(pairs),
+        "unmatchedLedgerLines": len(ledger_lines) - len(pairs),
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def confirm_match(
+    db: Session,
+    company_id: int,
+    transaction: BankTransaction,
+    account: str,
+    series: str | None,
+    number: int | None,
+    line_no: int | None,
+) -> None:
+    """Confirm the suggestion, or match to the given ledger line instead (caller commits)."""
+    if series is None:
+        if transaction.match_status != "suggested":
+            raise HTTPException(status_code=400, detail="No suggestion to confirm, give series, voucher_number and line_no")
+        transaction.match_status = "matched"
+        return
+
+    line = (
+        db.query(LedgerLine.date)
+        .join(
+            LedgerVoucher,
+            (LedgerVoucher.company_id == LedgerLine.company_id) & (LedgerVoucher.seq == LedgerLine.voucher_seq),
+        )
+        .filter(
+            LedgerLine.company_id == company_id,
+            LedgerLine.account == account,
+            LedgerVoucher.series == series,
+            LedgerVoucher.number == number,
+            LedgerLine.line_no == line_no,
+        )
+        .first()
+    )
+    if not line:
+        raise HTTPException(status_code=404, detail=f"No line {line_no} on account {account} in voucher {series}{number}")
+    taken = (
+        db.query(BankTransaction.id)
+        .filter(
+            BankTransaction.company_id == company_id,
+            BankTransaction.id != transaction.id,
+            BankTransaction.match_status == "matched",
+            BankTransaction.voucher_series == series,
+            BankTransaction.voucher_number == number,
+            BankTransaction.voucher_line_no == line_no,
+        )
+        .first()
+    )
+    if taken:
+        raise HTTPException(status_code=409, detail=f"Voucher {series}{number} line {line_no} is already matched to bank row {taken[0]}")
+    # a suggestion of another bank row for the same line is dropped
+    db.execute(
+        update(BankTransaction)
+        .where(
+            BankTransaction.company_id == company_id,
+            BankTransaction.id != transaction.id,
+            BankTransaction.match_status == "suggested",
+            BankTransaction.voucher_series == series,
+            BankTransaction.voucher_number == number,
+            BankTransaction.voucher_line_no == line_no,
+        )
+        .values(match_status="unmatched", voucher_series=None, voucher_number=None, voucher_line_no=None, match_day_diff=None)
+        .execution_options(synchronize_session=False)
+    )
+    transaction.match_status = "matched"
+    transaction.voucher_series = series
+    transaction.voucher_number = number
+    transaction.voucher_line_no = line_no
+    transaction.match_day_diff = line[0].toordinal() - transaction.date.toordinal()
+
+
+def unmatch(transaction: BankTransaction) -> None:
+    transaction.match_status = "unmatched"
+    transaction.voucher_series = None
+    transaction.voucher_number = None
+    transaction.voucher_line_no = None
+    transaction.match_day_diff = None
+
+
+# ------------------------------------------------------------
+# Listing
+# ------------------------------------------------------------
+def transactions_out(db: Session, company_id: int, transactions: list[BankTransaction]) -> list[dict]:
+    """Bank rows with the voucher they are matched or suggested to (one lookup for the page)."""
+    keys = {(tx.voucher_series, tx.voucher_number) for tx in transactions if tx.voucher_series is not None}
+    vouchers = {}
+    if keys:
+        vouchers = {
+            (series, number): (voucher_date, description)
+            for series, number, voucher_date, description in db.query(
+                LedgerVoucher.series, LedgerVoucher.number, LedgerVoucher.date, LedgerVoucher.description
+            ).filter(LedgerVoucher.company_id == company_id, tuple_(LedgerVoucher.series, LedgerVoucher.number).in_(keys))
+        }
+
+    out = []
+    for tx in transactions:
+        match = None
+        if tx.voucher_series is not None:
+            voucher_date, description = vouchers.get((tx.voucher_series, tx.voucher_number), (None, None))
+            match = {
+                "series": tx.voucher_series,
+                "voucherNumber": tx.voucher_number,
+                "lineNo": tx.voucher_line_no,
+                # None if the voucher was removed from the ledger since
+                "date": voucher_date.isoformat() if voucher_date else None,
+                "description": description,
+                "dayDiff": tx.match_day_diff,
+            }
+        out.append({
+            "id": tx.id,
+            "statementId": tx.statement_id,
+            "rowNo": tx.row_no,
+            "date": tx.date.isoformat(),
+            "amount": tx.amount_ore / 100,
+            "text": tx.text,
+            "reference": tx.reference,
+            "status": tx.match_status,
+            "match": match,
+        })
+    return out
+
+
+def unmatched_ledger_lines(db: Session, company_id: int, account: str, offset: int, limit: int) -> dict:
+    """Lines on the bank account that no bank row is matched or suggested to, oldest first."""
+    rows = (
+        db.query(LedgerVoucher.series, LedgerVoucher.number, LedgerLine.line_no, LedgerLine.date, LedgerLine.amount_ore, LedgerVoucher.description)
+        .join(
+            LedgerVoucher,
+            (LedgerVoucher.company_id == LedgerLine.company_id) & (LedgerVoucher.seq == LedgerLine.voucher_seq),
+        )
+        .filter(LedgerLine.company_id == company_id, LedgerLine.account == account, ~_matched_line(company_id))
+        .order_by(LedgerLine.date, LedgerLine.voucher_seq, LedgerLine.line_no)
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    return {
+        "lines": [
+            {
+                "series": series,
+                "voucherNumber": number,
+                "lineNo": line_no,
+                "date": line_date.isoformat(),
+                "amount": amount_ore / 100,
+                "description": description,
+            }
+            for series, number, line_no, line_date, amount_ore, description in rows[:limit]
+        ],
+        "nextOffset": offset + limit if has_more else None,
+    }
+
+
+def main() -> int:
+    # python bank.py [rows] -> matching engine timing on synthetic data (no database)
+    import random
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    first_day = date(2025, 1, 1).toordinal()
+    ledger_lines = [
+        (rng.choice((-1, 1)) * rng.randint(100, 5_000_000), first_day + rng.randint(0, 364), ("A", n, 1))
+        for n in range(1, count + 1)
+    ]
+    # 90% of the bank rows book a ledger line a few days later, the rest are unknown
+    bank_rows = [
+        (amount, day + rng.randint(0, 3), n) if n % 10 else (rng.randint(100, 5_000_000), day, n)
+        for n, (amount, day, _) in enumerate(ledger_lines)
+    ]
+    rng.shuffle(bank_rows)
+
+    started = time.perf_counter()
+    pairs = match_transactions(bank_rows, ledger_lines)
+    elapsed = time.perf_counter() - started
+    print(f"{count} bank rows x {count} ledger lines: {len(pairs)} pairs in {elapsed * 1000:.0f} ms")
+
+    buf = io.StringIO()
+    buf.write("Bokföringsdag;Belopp;Text\n")
+    for amount, day, n in bank_rows:
+        buf.write(f"{date.fromordinal(day).isoformat()};{amount / 100:.2f}".replace(".", ",") + f";Rad {n}\n")
+    path = BANK_UPLOAD_DIR / "benchmark.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(buf.getvalue(), encoding="utf-8")
+    try:
+        started = time.perf_counter()
+        parsed = sum(1 for _, row, _ in iter_csv_rows(path, path.read_bytes()[:64 * 1024]) if row)
+        elapsed = time.perf_counter() - started
+        print(f"CSV parse: {parsed} rows in {elapsed * 1000:.0f} ms ({parsed / elapsed:.0f} rows/s)")
+    finally:
+        path.unlink()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
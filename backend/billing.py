@@ -0,0 +1,354 @@
+"""
+Server-side billing: batch invoice runs.
+
+A run creates any number of invoices in one transaction. Invoice numbers
+are reserved as one block from invoice_number_sequences (row locked until
+commit, so numbers are gap-free and a failed run gives them back), rows are
+written with COPY, and, when a voucher template is given, one voucher per
+invoice is built in the same pass and appended to the SIE state by the
+caller. Amounts follow src/lib/billing (calculateInvoiceLine and
+buildVoucherFromTemplate) but are computed in öre.
+"""
+
+import time
+from datetime import date, datetime, timedelta
+from typing import Literal
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import bulk_insert
+from ledger import format_voucher, to_ore
+from models import Customer, Invoice, InvoiceLine, InvoiceNumberSequence, InvoiceRun, Product
+
+# Invoices (and their lines) per COPY / INSERT batch.
+INVOICE_BATCH_SIZE = 5000
+
+# Upper bound on invoices per run, so one request cannot hold the number lock for minutes.
+MAX_RUN_INVOICES = 50_000
+
+
+class InvoiceRunLine(BaseModel):
+    product_id: int | None = None
+    # required without product_id, otherwise they override the product
+    product_name: str | None = None
+    unit_price: float | None = None  # excl. VAT
+    vat_rate: float | None = None
+    description: str | None = None
+    quantity: float = 1
+
+
+class InvoiceRunItem(BaseModel):
+    customer_id: int
+    # falls back to the run's lines (the usual recurring case)
+    lines: list[InvoiceRunLine] | None = None
+
+
+class VoucherTemplateLine(BaseModel):
+    account_number: str
+    account_name: str = ""
+    side: Literal["debit", "credit"]
+    amount_source: Literal["total", "subtotal", "totalVat", "fixed"]
+    fixed_amount: float | None = None
+
+
+class InvoiceRunCreate(BaseModel):
+    user_id: int
+    issue_date: date
+    due_date: date | None = None
+    payment_terms_days: int = 30
+    lines: list[InvoiceRunLine] = []
+    invoices: list[InvoiceRunItem]
+    # book one voucher per invoice on the issue date
+    template: list[VoucherTemplateLine] | None = None
+
+
+def reserve_invoice_numbers(db: Session, company_id: int, count: int) -> int:
+    """Take `count` consecutive invoice numbers; returns the first (caller commits)."""
+    sequence = (
+        db.query(InvoiceNumberSequence)
+        .filter(InvoiceNumberSequence.company_id == company_id)
+        .with_for_update()
+        .first()
+    )
+    if sequence is None:
+        start = (db.query(func.max(Invoice.invoice_number)).filter(Invoice.company_id == company_id).scalar() or 0) + 1
+        try:
+            with db.begin_nested():
+                db.add(InvoiceNumberSequence(company_id=company_id, next_number=start))
+        except IntegrityError:
+            pass  # created by a concurrent run, lock that row instead
+        sequence = (
+            db.query(InvoiceNumberSequence)
+            .filter(InvoiceNumberSequence.company_id == company_id)
+            .with_for_update()
+            .one()
+        )
+    first = sequence.next_number
+    sequence.next_number = first + count
+    db.flush()
+    return first
+
+
+def _price_lines(lines: list[InvoiceRunLine], products: dict[int, Product]) -> list[dict]:
+    priced = []
+    for line_no, line in enumerate(lines, start=1):
+        product = products.get(line.product_id) if line.product_id is not None else None
+        if line.product_id is not None and product is None:
+            raise HTTPException(status_code=400, detail=f"Product {line.product_id} not found")
+
+        vat_rate = line.vat_rate if line.vat_rate is not None else (product.vat_rate if product else None)
+        unit_price = line.unit_price
+        if unit_price is None and product is not None:
+            price = product.price_ore / 100
+            unit_price = price / (1 + product.vat_rate / 100) if product.includes_vat else price
+        name = line.product_name or (product.name if product else None)
+        if unit_price is None or vat_rate is None or not name:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Line {line_no}: product_name, unit_price and vat_rate are required without product_id",
+            )
+
+        excl = to_ore(line.quantity * unit_price)
+        vat = int(round(excl * vat_rate / 100))
+        priced.append({
+            "line_no": line_no,
+            "product_id": line.product_id,
+            "product_name": name,
+            "description": line.description,
+            "quantity": line.quantity,
+            "unit_price_ore": to_ore(unit_price),
+            "vat_rate": vat_rate,
+            "total_excl_vat_ore": excl,
+            "vat_ore": vat,
+            "total_incl_vat_ore": excl + vat,
+        })
+    return priced
+
+
+def _template_amount(line: VoucherTemplateLine, subtotal: int, vat: int, total: int) -> int:
+    if line.amount_source == "total":
+        return total
+    if line.amount_source == "subtotal":
+        return subtotal
+    if line.amount_source == "totalVat":
+        return vat
+    return to_ore(line.fixed_amount or 0)
+
+
+def build_voucher_lines(template: list[VoucherTemplateLine], subtotal: int, vat: int, total: int) -> list[tuple[str, int]]:
+    """(account, amount_ore) per template line, debit positive; zero lines are dropped."""
+    lines = []
+    for line in template:
+        amount = _template_amount(line, subtotal, vat, total)
+        if amount:
+            lines.append((line.account_number, amount if line.side == "debit" else -amount))
+    return lines
+
+
+def create_invoice_run(
+    db: Session,
+    company_id: int,
+    payload: InvoiceRunCreate,
+    first_voucher_number: int | None = None,
+) -> tuple[InvoiceRun, list[str]]:
+    """
+    Write all invoices of a run (caller commits). With a template, returns
+    the SIE text (#VER blocks, series A from `first_voucher_number`) of one
+    voucher per invoice for the caller to append to the SIE state.
+    """
+    if not payload.invoices:
+        raise HTTPException(status_code=400, detail="No invoices in run")
+    if len(payload.invoices) > MAX_RUN_INVOICES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RUN_INVOICES} invoices per run")
+
+    customer_ids = {item.customer_id for item in payload.invoices}
+    customers = {
+        c.id: c
+        for c in db.query(Customer).filter(Customer.company_id == company_id, Customer.id.in_(customer_ids))
+    }
+    missing = sorted(customer_ids - customers.keys())
+    if missing:
+        raise HTTPException(status_code=400, detail={"message": "Unknown customers", "customerIds": missing[:100]})
+
+    product_ids = {line.product_id for line in payload.lines if line.product_id is not None}
+    for item in payload.invoices:
+        product_ids.update(line.product_id for line in item.lines or () if line.product_id is not None)
+    products = {
+        p.id: p
+        for p in db.query(Product).filter(Product.company_id == company_id, Product.id.in_(product_ids))
+    } if product_ids else {}
+
+    # the shared recurring lines are priced once for the whole run
+    default_lines = _price_lines(payload.lines, products)
+    due_date = payload.due_date or payload.issue_date + timedelta(days=payload.payment_terms_days)
+
+    first_number = reserve_invoice_numbers(db, company_id, len(payload.invoices))
+    run = InvoiceRun(
+        company_id=company_id,
+        first_number=first_number,
+        last_number=first_number + len(payload.invoices) - 1,
+        invoice_count=len(payload.invoices),
+        created_by_user_id=payload.user_id,
+    )
+    db.add(run)
+    db.flush()
+
+    now = datetime.utcnow()
+    invoices: list[dict] = []
+    lines: list[dict] = []
+    vouchers: list[str] = []
+    run_total = 0
+    for offset, item in enumerate(payload.invoices):
+        number = first_number + offset
+        customer = customers[item.customer_id]
+        priced = _price_lines(item.lines, products) if item.lines else default_lines
+        if not priced:
+            raise HTTPException(status_code=400, detail=f"Invoice for customer {customer.id} has no lines")
+
+        subtotal = sum(line["total_excl_vat_ore"] for line in priced)
+        vat = sum(line["vat_ore"] for line in priced)
+        total = subtotal + vat
+        run_total += total
+
+        voucher_number = None
+        if payload.template:
+            voucher_lines = build_voucher_lines(payload.template, subtotal, vat, total)
+            debit = sum(amount for _, amount in voucher_lines if amount > 0)
+            if debit <= 0 or sum(amount for _, amount in voucher_lines):
+                raise HTTPException(status_code=400, detail=f"Template is not balanced for invoice #{number}")
+            voucher_number = first_voucher_number + offset
+            vouchers.extend(format_voucher(
+                "A", voucher_number, payload.issue_date, f"Invoice #{number} - {customer.name}", voucher_lines,
+            ))
+
+        invoices.append({
+            "company_id": company_id,
+            "invoice_number": number,
+            "run_id": run.id,
+            "document_type": "invoice",
+            "customer_id": customer.id,
+            "customer_name": customer.name,
+            "customer_address": customer.address or "",
+            "issue_date": payload.issue_date,
+            "due_date": due_date,
+            "subtotal_ore": subtotal,
+            "total_vat_ore": vat,
+            "total_ore": total,
+            "status": "sent",
+            "paid_date": None,
+            "voucher_number": voucher_number,
+            "created_by_user_id": payload.user_id,
+            "created_at": now,
+        })
+        for line in priced:
+            lines.append({"company_id": company_id, "invoice_number": number, **line})
+
+        # lines reference invoices, so each batch writes its invoices first
+        if len(invoices) >= INVOICE_BATCH_SIZE:
+            bulk_insert(db, Invoice, invoices)
+            bulk_insert(db, InvoiceLine, lines)
+            invoices, lines = [], []
+
+    bulk_insert(db, Invoice, invoices)
+    bulk_insert(db, InvoiceLine, lines)
+
+    run.voucher_count = len(payload.invoices) if payload.template else 0
+    run.total_ore = run_total
+    return run, vouchers
+
+
+def invoice_out(invoice: Invoice, lines: list[InvoiceLine] | None = None) -> dict:
+    out = {
+        "id": invoice.id,
+        "invoiceNumber": invoice.invoice_number,
+        "runId": invoice.run_id,
+        "documentType": invoice.document_type,
+        "customerId": invoice.customer_id,
+        "customerName": invoice.customer_name,
+        "customerAddress": invoice.customer_address,
+        "issueDate": invoice.issue_date.isoformat(),
+        "dueDate": invoice.due_date.isoformat(),
+        "subtotal": invoice.subtotal_ore / 100,
+        "totalVat": invoice.total_vat_ore / 100,
+        "total": invoice.total_ore / 100,
+        "status": invoice.status,
+        "paidDate": invoice.paid_date.isoformat() if invoice.paid_date else None,
+        "voucherNumber": invoice.voucher_number,
+        "createdAt": invoice.created_at.isoformat() if invoice.created_at else None,
+    }
+    if lines is not None:
+        out["lines"] = [
+            {
+                "lineNo": line.line_no,
+                "productId": line.product_id,
+                "productName": line.product_name,
+                "description": line.description,
+                "quantity": line.quantity,
+                "unitPrice": line.unit_price_ore / 100,
+                "vatRate": line.vat_rate,
+                "totalExclVat": line.total_excl_vat_ore / 100,
+                "vatAmount": line.vat_ore / 100,
+                "totalInclVat": line.total_incl_vat_ore / 100,
+            }
+            for line in lines
+        ]
+    return out
+
+
+def main() -> int:
+    # python billing.py [invoices] -> throughput of one run against DATABASE_URL (rolled back)
+    import sys
+
+    from database import Base, SessionLocal
+    from models import Company, User
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    db = SessionLocal()
+    if db.get_bind().dialect.name == "sqlite":
+        Base.metadata.create_all(db.get_bind())
+    try:
+        user = User(email="billing-benchmark@example.com", password="x", role="user")
+        company = Company(company_name="Benchmark AB", organization_number="5560000000")
+        db.add_all([user, company])
+        db.flush()
+        bulk_insert(db, Customer, [
+            {
+                "user_id": user.id, "company_id": company.id, "type": "company", "name": f"Kund {n} AB",
+                "address": f"Gatan {n}", "postal_code": "11122", "city": "Stockholm", "country": "Sverige",
+            }
+            for n in range(count)
+        ])
+        product = Product(user_id=user.id, company_id=company.id, name="Abonnemang", price_ore=100_000, includes_vat=False, vat_rate=25)
+        db.add(product)
+        db.flush()
+        customer_ids = [c for (c,) in db.query(Customer.id).filter(Customer.company_id == company.id)]
+
+        payload = InvoiceRunCreate(
+            user_id=user.id,
+            issue_date=date.today(),
+            lines=[InvoiceRunLine(product_id=product.id, quantity=1), InvoiceRunLine(product_name="Support", unit_price=250, vat_rate=25, quantity=2)],
+            invoices=[InvoiceRunItem(customer_id=c) for c in customer_ids],
+            template=[
+                VoucherTemplateLine(account_number="1510", side="debit", amount_source="total"),
+                VoucherTemplateLine(account_number="3001", side="credit", amount_source="subtotal"),
+                VoucherTemplateLine(account_number="2611", side="credit", amount_source="totalVat"),
+            ],
+        )
+        started = time.perf_counter()
+        run, vouchers = create_invoice_run(db, company.id, payload, first_voucher_number=1)
+        db.flush()
+        elapsed = time.perf_counter() - started
+        print(f"{db.get_bind().dialect.name}: {run.invoice_count} invoices, {run.voucher_count} vouchers "
+              f"({len(vouchers)} SIE lines) in {elapsed * 1000:.0f} ms, {run.invoice_count / elapsed:.0f} invoices/s")
+    finally:
+        db.rollback()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
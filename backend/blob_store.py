@@ -0,0 +1,227 @@
+"""
+Content-addressed blob store for receipts and SIE files.
+
+Files live under STORAGE_DIR/blobs/<aa>/<bb>/<sha256> (sharded by the first
+hash bytes so no directory grows huge). Each blob has one row in `blobs`
+with a reference count; identical uploads share one file and the file is
+removed when the last reference is released.
+"""
+
+import os
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+import anyio
+from fastapi import HTTPException, Request
+from sqlalchemy import delete, event, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+
+from models import Blob
+from uploads import STORAGE_DIR, UploadedFile
+
+BLOB_DIR = STORAGE_DIR / "blobs"
+# Uploads are spooled next to the blobs so the final move is a rename.
+BLOB_UPLOAD_DIR = BLOB_DIR / "tmp"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Session.info key: hashes whose row was deleted in the open transaction
+_RELEASED_KEY = "released_blobs"
+
+
+def blob_path(sha256: str) -> Path:
+    return BLOB_DIR / sha256[0:2] / sha256[2:4] / sha256
+
+
+def _lock_blob(db: Session, sha256: str) -> Blob | None:
+    return db.query(Blob).filter(Blob.sha256 == sha256).with_for_update().first()
+
+
+def put_blob(db: Session, upload: UploadedFile) -> Blob:
+    """
+    Take a reference on the blob for `upload` and move the file into place
+    (or drop it if the content is already stored). The row lock, or for a
+    new row the insert, serializes this with the removal of a released
+    blob (see _unlink_released_blobs), so a file is never deleted under a
+    new owner.
+    """
+    blob = _lock_blob(db, upload.sha256)
+    if blob is None:
+        try:
+            with db.begin_nested():
+                blob = Blob(
+                    sha256=upload.sha256,
+                    size_bytes=upload.size,
+                    content_type=upload.content_type,
+                    ref_count=0,
+                )
+                db.add(blob)
+        except IntegrityError:
+            # inserted concurrently -> lock the winner's row instead
+            blob = _lock_blob(db, upload.sha256)
+
+    path = blob_path(upload.sha256)
+    if blob.ref_count and path.exists():
+        upload.discard()
+    else:
+        # a new row: a file still there is a released one about to be unlinked
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(upload.path, path)
+
+    blob.ref_count = (blob.ref_count or 0) + 1
+    return blob
+
+
+def add_blob_ref(db: Session, sha256: str) -> None:
+    """Reference an already stored blob (caller commits)."""
+    blob = _lock_blob(db, sha256)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    blob.ref_count += 1
+
+
+def release_blob(db: Session, sha256: str | None, refs: int = 1) -> None:
+    """
+    Drop `refs` references; deletes the row at zero. Caller commits. The
+    file is removed only after that commit, so a rollback keeps row and file.
+    """
+    if not sha256:
+        return
+    blob = _lock_blob(db, sha256)
+    if blob is None:
+        return
+    blob.ref_count -= refs
+    if blob.ref_count <= 0:
+        db.delete(blob)
+        db.info.setdefault(_RELEASED_KEY, set()).add(sha256)
+
+
+@event.listens_for(Session, "after_commit")
+def _unlink_released_blobs(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    released = session.info.pop(_RELEASED_KEY, None)
+    if not released:
+        return
+    # the session cannot query here. Claim each hash with a placeholder row
+    # while unlinking: an upload of it still in flight makes the insert wait
+    # and then fail (the file is theirs now), a later one waits for the delete
+    for sha256 in sorted(released):
+        try:
+            with session.get_bind().begin() as conn:
+                conn.execute(insert(Blob).values(sha256=sha256, size_bytes=0, ref_count=0))
+                blob_path(sha256).unlink(missing_ok=True)
+                conn.execute(delete(Blob).where(Blob.sha256 == sha256))
+        except IntegrityError:
+            continue
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_released_blobs(session: Session) -> None:
+    if not session.in_nested_transaction():
+        session.info.pop(_RELEASED_KEY, None)
+
+
+def _parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Single "bytes=" range -> inclusive (start, end). Multiple ranges are
+    answered with the full body, which RFC 9110 allows.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+class BlobResponse(Response):
+    """
+    Serve a byte range of a file without reading it into memory. Uses the
+    ASGI zero-copy send extension (sendfile) when the server offers it and
+    falls back to chunked reads otherwise.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int, headers: dict, media_type: str | None):
+        self.path = path
+        self.start = start
+        self.count = end - start + 1
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or self.count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f.fileno(),
+                    "offset": self.start,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def blob_response(request: Request, sha256: str, media_type: str | None, filename: str | None) -> Response:
+    path = blob_path(sha256)
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File content missing")
+
+    # Content-addressed: the hash is a perfect strong ETag
+    etag = f'"{sha256}"'
+    headers = {"accept-ranges": "bytes", "etag": etag, "cache-control": "private, max-age=31536000, immutable"}
+    if filename:
+        headers["content-disposition"] = f"inline; filename*=utf-8''{quote(filename)}"
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"etag": etag})
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range == etag:
+        byte_range = _parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        return BlobResponse(path, 0, size - 1, 200, headers, media_type or "application/octet-stream")
+
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return BlobResponse(path, start, end, 206, headers, media_type or "application/octet-stream")
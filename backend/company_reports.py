@@ -0,0 +1,134 @@
+"""
+Reports across all of a user's companies (accounting bureaus).
+
+Each company is computed on a thread of a shared pool with its own session
+(the work is mostly database bound, so threads overlap well) and yielded as soon
+as it finishes, fastest first. Figures derived from the ledger are cached
+per company, ledger version, report and period; lock status is always read
+fresh since locking does not bump the version.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from typing import Iterator
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from ledger import ensure_ledger
+from models import CompanySIEState, VatPeriodLock
+from sie_import import iter_sie_records
+from summary import company_summary
+
+logger = logging.getLogger("snug-api")
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "8"))
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "4096"))
+# unbalanced vouchers listed per company (the count is always complete)
+UNBALANCED_LIST_MAX = 20
+
+REPORTS = ("vat_due", "result", "unbalanced")
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+_report_cache: OrderedDict = OrderedDict()
+_report_cache_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="company-report")
+        return _pool
+
+
+def shutdown_report_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def unbalanced_vouchers(sie_content: str) -> dict:
+    """Vouchers whose debit and credit differ; sync_ledger leaves these out, so they are read from the SIE content."""
+    errors = [
+        {"line": record[1], "detail": record[2]}
+        for record in iter_sie_records((sie_content or "").splitlines())
+        if record[0] == "error"
+    ]
+    return {"unbalancedCount": len(errors), "unbalanced": errors[:UNBALANCED_LIST_MAX]}
+
+
+def _ledger_figures(
+    db: Session,
+    company_id: int,
+    state: CompanySIEState | None,
+    report: str,
+    period: str,
+    start: date,
+    end: date,
+    today: date,
+) -> dict:
+    ledger_version = state.ledger_version if state else None
+    key = (company_id, ledger_version, report, period, today.replace(day=1))
+    with _report_cache_lock:
+        if key in _report_cache:
+            _report_cache.move_to_end(key)
+            return _report_cache[key]
+
+    if report == "unbalanced":
+        figures = unbalanced_vouchers(state.sie_content if state else "")
+    else:
+        summary = company_summary(db, company_id, ledger_version, start, min(end, today), today)
+        if report == "vat_due":
+            figures = {"vatDue": summary["vatDue"]}
+        else:
+            figures = {"revenue": summary["revenue"], "expenses": summary["expenses"], "netResult": summary["netResult"]}
+
+    with _report_cache_lock:
+        _report_cache[key] = figures
+        while len(_report_cache) > REPORT_CACHE_SIZE:
+            _report_cache.popitem(last=False)
+    return figures
+
+
+def company_report(company: dict, report: str, period: str, start: date, end: date, today: date) -> dict:
+    """One company's row; errors are reported in the row rather than ending the stream."""
+    db = SessionLocal()
+    try:
+        state = ensure_ledger(db, company["id"])
+        ledger_version = state.ledger_version if state else None
+        row = {**company, "ledgerVersion": ledger_version}
+        row.update(_ledger_figures(db, company["id"], state, report, period, start, end, today))
+        if report == "vat_due":
+            row["locked"] = (
+                db.query(VatPeriodLock.id)
+                .filter(VatPeriodLock.company_id == company["id"], VatPeriodLock.period_key == period)
+                .first()
+            ) is not None
+        return row
+    except Exception:
+        db.rollback()
+        logger.exception("Report %s failed for company %s", report, company["id"])
+        return {**company, "error": "Report failed"}
+    finally:
+        db.close()
+
+
+def iter_company_reports(companies: list[dict], report: str, period: str, start: date, end: date, today: date) -> Iterator[dict]:
+    """Rows in completion order. Unstarted companies are cancelled if the client goes away."""
+    pool = _get_pool()
+    futures = [pool.submit(company_report, company, report, period, start, end, today) for company in companies]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
@@ -1,10 +1,66 @@
+import io
+import math
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, insert
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://snug:snug@db:5432/snug_ledger")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# how quickly the pool wait average forgets old waits (seconds)
+POOL_WAIT_DECAY_SECONDS = 2.0
+
+
+class _PoolWait:
+    """Moving average of connection checkout waits; it decays while nothing is checked out."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._average = 0.0
+        self._updated = time.monotonic()
+        self.waiting = 0
+
+    def _decayed(self, now: float) -> float:
+        return self._average * math.exp(-(now - self._updated) / POOL_WAIT_DECAY_SECONDS)
+
+    def started(self) -> None:
+        with self._lock:
+            self.waiting += 1
+
+    def finished(self, seconds: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.waiting -= 1
+            self._average = 0.8 * self._decayed(now) + 0.2 * seconds
+            self._updated = now
+
+    def current_ms(self) -> float:
+        with self._lock:
+            return self._decayed(time.monotonic()) * 1000
+
+
+pool_wait = _PoolWait()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection (see rate_limit)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        pool_wait.started()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.finished(time.perf_counter() - started)
+
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    **({} if DATABASE_URL.startswith("sqlite") else {"poolclass": TimedQueuePool}),
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -16,4 +72,42 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def _copy_field(value) -> str:
+    # COPY csv reads an unquoted empty field as NULL and a quoted one as an
+    # empty string; csv.writer writes "" unquoted, so every value is quoted
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_rows(db, table: str, columns: list[str], rows: list[dict]) -> None:
+    """
+    Load rows with Postgres COPY on the session's own connection, so it is
+    part of the caller's transaction. Much faster than INSERT for big batches.
+    """
+    buf = io.StringIO()
+    for row in rows:
+        buf.write(",".join(_copy_field(row[c]) for c in columns))
+        buf.write("\n")
+    buf.seek(0)
+
+    raw_conn = db.connection().connection
+    with raw_conn.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buf,
+        )
+
+
+def bulk_insert(db, model, rows: list[dict]) -> None:
+    """COPY on Postgres, batched executemany INSERT elsewhere (e.g. SQLite in dev)."""
+    if not rows:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        copy_rows(db, model.__tablename__, list(rows[0].keys()), rows)
+    else:
+        # render_nulls keeps rows with and without NULLs in one executemany
+        db.execute(insert(model).execution_options(render_nulls=True), rows)
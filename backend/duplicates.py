@@ -0,0 +1,68 @@
+"""
+Duplicate vouchers and receipts.
+
+Vouchers are keyed by ledger_vouchers.fingerprint (ledger.voucher_fingerprint:
+date + net amount per account), receipts by the SHA-256 of their content.
+Both columns are indexed, so a full scan is one GROUP BY (hash aggregate,
+O(n)) and the check for a single new item is an index lookup.
+"""
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import LedgerVoucher, Receipt
+
+
+def duplicate_voucher_groups(db: Session, company_id: int) -> list[dict]:
+    fingerprints = (
+        db.query(LedgerVoucher.fingerprint)
+        .filter(LedgerVoucher.company_id == company_id, LedgerVoucher.fingerprint.isnot(None))
+        .group_by(LedgerVoucher.fingerprint)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    rows = (
+        db.query(LedgerVoucher.fingerprint, LedgerVoucher.series, LedgerVoucher.number, LedgerVoucher.date, LedgerVoucher.description)
+        .filter(LedgerVoucher.company_id == company_id, LedgerVoucher.fingerprint.in_(db.query(fingerprints.c.fingerprint)))
+        .order_by(LedgerVoucher.date, LedgerVoucher.seq)
+        .all()
+    )
+    groups: dict[str, list[dict]] = {}
+    for fingerprint, series, number, voucher_date, description in rows:
+        groups.setdefault(fingerprint, []).append({
+            "series": series,
+            "voucherNumber": number,
+            "date": voucher_date.isoformat(),
+            "description": description,
+        })
+    return [{"fingerprint": fingerprint, "vouchers": vouchers} for fingerprint, vouchers in groups.items()]
+
+
+def duplicate_receipt_groups(db: Session, company_id: int) -> list[dict]:
+    hashes = (
+        db.query(Receipt.blob_sha256)
+        .filter(Receipt.company_id == company_id, Receipt.blob_sha256.isnot(None))
+        .group_by(Receipt.blob_sha256)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    rows = (
+        db.query(Receipt.blob_sha256, Receipt.id, Receipt.filename, Receipt.created_at)
+        .filter(Receipt.company_id == company_id, Receipt.blob_sha256.in_(db.query(hashes.c.blob_sha256)))
+        .order_by(Receipt.id)
+        .all()
+    )
+    groups: dict[str, list[dict]] = {}
+    for sha256, receipt_id, filename, created_at in rows:
+        groups.setdefault(sha256, []).append({
+            "id": receipt_id,
+            "filename": filename,
+            "createdAt": created_at.isoformat() if created_at else None,
+        })
+    return [{"sha256": sha256, "receipts": receipts} for sha256, receipts in groups.items()]
+
+
+def existing_receipt(db: Session, sha256: str, user_id: int, company_id: int | None) -> Receipt | None:
+    """An earlier receipt with the same content in the same company (or the user's own, without one)."""
+    scope = Receipt.company_id == company_id if company_id is not None else Receipt.user_id == user_id
+    return db.query(Receipt).filter(Receipt.blob_sha256 == sha256, scope).order_by(Receipt.id).first()
@@ -0,0 +1,235 @@
+"""
+Edit lock scopes.
+
+The edit lock used to cover a whole company. A lock can now be taken on a
+narrower scope, so several accountants can work in one company at once:
+
+  company        everything (the original lock; conflicts with every scope)
+  series:<S>     vouchers in series S
+  year:<YYYY>    vouchers dated in the fiscal year that starts in YYYY
+  billing        invoice runs
+  payroll        payroll runs
+
+Two locks conflict only if they are on the same scope or one of them is
+the company scope. A write is checked against the scopes of what it
+changes: a SIE save against the vouchers that differ between the old and
+the new text (compared as whole #VER blocks), so editing series B does
+not wait for whoever holds series A.
+
+Clients save the whole SIE text, read before the others' latest saves. A
+save by someone holding only series/year scopes is therefore merged
+(merge_scoped_save): their vouchers inside those scopes replace the
+server's, every other voucher stays as on the server.
+"""
+
+import re
+from collections import Counter
+from datetime import date
+from typing import Iterable, NamedTuple
+
+from fastapi import HTTPException
+
+from ledger import fiscal_year_bounds
+from models import Company
+from sie_import import parse_sie_line
+
+COMPANY_SCOPE = "company"
+MODULE_SCOPES = ("billing", "payroll")
+
+_SCOPE_RE = re.compile(r"^(?:series:[A-Za-z0-9]{1,16}|year:\d{4})$")
+
+
+class ScopeChange(NamedTuple):
+    # non-voucher lines (accounts, company info, balances) differ
+    header_changed: bool
+    # for each changed voucher, the scopes that cover it (company is implied)
+    units: set[tuple[str, ...]]
+
+
+def normalize_scope(scope: str | None) -> str:
+    scope = (scope or COMPANY_SCOPE).strip()
+    if scope == COMPANY_SCOPE or scope in MODULE_SCOPES or _SCOPE_RE.match(scope):
+        return scope
+    raise HTTPException(
+        status_code=400,
+        detail="scope must be company, billing, payroll, series:<series> or year:<YYYY>",
+    )
+
+
+def scopes_conflict(a: str, b: str) -> bool:
+    return a == b or COMPANY_SCOPE in (a, b)
+
+
+def series_scope(series: str) -> str:
+    return f"series:{series}"
+
+
+def fiscal_year_scope(company: Company | None, day: date) -> str:
+    """year:<YYYY> for the fiscal year containing `day`, named by the year it starts in."""
+    year = day.year
+    if company is not None and day < fiscal_year_bounds(company, year)[0]:
+        year -= 1
+    return f"year:{year}"
+
+
+class _VoucherBlock(NamedTuple):
+    series: str
+    day: str
+    # trimmed lines, for comparing
+    key: str
+    lines: list[str]
+
+
+def _sie_parts(content: str) -> tuple[list[str], list[_VoucherBlock]]:
+    """Lines outside #VER blocks, and the #VER blocks in file order."""
+    header: list[str] = []
+    blocks: list[_VoucherBlock] = []
+    block: list[str] | None = None
+    key = None
+
+    def close() -> None:
+        blocks.append(_VoucherBlock(*key, "\n".join(line.strip().strip("\ufeff") for line in block), block))
+
+    for line in content.splitlines():
+        trimmed = line.strip().strip("\ufeff")
+        if block is not None:
+            block.append(line)
+            if trimmed == "}":
+                close()
+                block = None
+            continue
+        if trimmed.startswith("#VER"):
+            parsed = parse_sie_line(trimmed)
+            values = parsed[1] if parsed else []
+            key = (values[0] if values else "", values[2] if len(values) > 2 else "")
+            block = [line]
+        elif trimmed:
+            header.append(line)
+    if block is not None:
+        close()
+    return header, blocks
+
+
+def _voucher_blocks(content: str) -> tuple[list[str], Counter]:
+    """Trimmed lines outside #VER blocks, and a multiset of (series, date, block text)."""
+    header, blocks = _sie_parts(content)
+    return (
+        [line.strip().strip("\ufeff") for line in header],
+        Counter((block.series, block.day, block.key) for block in blocks),
+    )
+
+
+# how many leading values name what a header line describes: the save's
+# #KONTO 1930 replaces the server's #KONTO 1930, #IB 0 1930 its #IB 0 1930;
+# 0 for lines that occur once per file
+_HEADER_KEY_VALUES = {
+    "FLAGGA": 0, "PROGRAM": 0, "FORMAT": 0, "GEN": 0, "SIETYP": 0, "PROSA": 0,
+    "FTYP": 0, "FNR": 0, "ORGNR": 0, "BKOD": 0, "ADRESS": 0, "FNAMN": 0,
+    "TAXAR": 0, "OMFATTN": 0, "KPTYP": 0, "VALUTA": 0,
+    "RAR": 1, "KONTO": 1, "KTYP": 1, "ENHET": 1, "SRU": 1, "DIM": 1, "UNDERDIM": 1,
+    "OBJEKT": 2, "IB": 2, "UB": 2, "RES": 2,
+    "OIB": 3, "OUB": 3,
+    "PSALDO": 4, "PBUDGET": 4,
+}
+
+
+def _header_key(line: str) -> tuple[str, ...]:
+    """What a header line describes; unknown lines are only equal to themselves."""
+    trimmed = line.strip().strip("\ufeff")
+    parsed = parse_sie_line(trimmed)
+    if parsed is None or parsed[0] not in _HEADER_KEY_VALUES:
+        return ("", trimmed)
+    command, values = parsed
+    return (command, *values[: _HEADER_KEY_VALUES[command]])
+
+
+def _parse_day(value: str) -> date | None:
+    try:
+        return date(int(value[0:4]), int(value[4:6]), int(value[6:8])) if len(value) == 8 else None
+    except ValueError:
+        return None
+
+
+def changed_scopes(company: Company | None, previous: str, content: str) -> ScopeChange:
+    """What a save from `previous` to `content` touches, for the lock check."""
+    old_header, old_blocks = _voucher_blocks(previous)
+    new_header, new_blocks = _voucher_blocks(content)
+    units: set[tuple[str, ...]] = set()
+    # vouchers added, removed or edited; an edit shows up as both, so a
+    # voucher moved to another series or year touches both scopes
+    for series, day_text, _ in (old_blocks - new_blocks) + (new_blocks - old_blocks):
+        day = _parse_day(day_text)
+        if day is None:
+            units.add((series_scope(series),))
+        else:
+            units.add((series_scope(series), fiscal_year_scope(company, day)))
+    return ScopeChange(old_header != new_header, units)
+
+
+def module_units(company: Company | None, module: str, series: str, days: Iterable[date]) -> set[tuple[str, ...]]:
+    """Scopes covering vouchers a module (billing, payroll) books in `series` on `days`."""
+    return {(module, series_scope(series), fiscal_year_scope(company, day)) for day in days}
+
+
+def merge_scoped_save(company: Company | None, current: str, content: str, held: set[str]) -> tuple[str, int]:
+    """
+    Merge a save by someone whose locks are the series/year scopes `held`
+    onto the `current` server text: vouchers inside those scopes come from
+    `content`, the others stay as they are on the server. A header line in
+    the save replaces the server's lines for the same thing (#KONTO 1930,
+    #IB 0 1930, ...) or is added; server lines the save has nothing for
+    are kept (removing one needs the company lock). Returns the merged text
+    and the number of voucher changes outside `held` left out.
+    """
+
+    def inside(block: _VoucherBlock) -> bool:
+        day = _parse_day(block.day)
+        return series_scope(block.series) in held or (day is not None and fiscal_year_scope(company, day) in held)
+
+    current_header, current_blocks = _sie_parts(current)
+    header, blocks = _sie_parts(content)
+    mine = [block for block in blocks if inside(block)]
+
+    skipped = Counter(block.key for block in blocks if not inside(block))
+    skipped.subtract(block.key for block in current_blocks if not inside(block))
+    left_out = sum(abs(count) for count in skipped.values())
+
+    saved: dict[tuple[str, ...], list[str] | None] = {}
+    for line in header:
+        saved.setdefault(_header_key(line), []).append(line)
+    lines: list[str] = []
+    for line in current_header:
+        key = _header_key(line)
+        if key not in saved:
+            lines.append(line)
+        elif saved[key] is not None:
+            # in the place of the server's first line for it
+            lines.extend(saved[key])
+            saved[key] = None
+    # new ones go after the last line of the same kind (#KONTO with the accounts)
+    added: dict[str, list[str]] = {}
+    for key, own in saved.items():
+        if own is not None:
+            added.setdefault(key[0], []).extend(own)
+    last = {_header_key(line)[0]: index for index, line in enumerate(lines)}
+    last.pop("", None)
+    after: dict[int, list[str]] = {}
+    for command, own in added.items():
+        after.setdefault(last.get(command, len(lines) - 1), []).extend(own)
+    # -1: the server has no header lines at all
+    merged = after.get(-1, [])
+    for index, line in enumerate(lines):
+        merged.append(line)
+        merged.extend(after.get(index, ()))
+    lines = merged
+    # the save's vouchers go where the server had the first voucher in the held scopes
+    placed = False
+    for block in current_blocks:
+        if not inside(block):
+            lines.extend(block.lines)
+        elif not placed:
+            lines.extend(line for own in mine for line in own.lines)
+            placed = True
+    if not placed:
+        lines.extend(line for own in mine for line in own.lines)
+    return "\n".join(lines) + "\n", left_out
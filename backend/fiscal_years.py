@@ -0,0 +1,104 @@
+"""
+Fiscal year closing.
+
+Closing a year stores its closing balances as the next year's opening
+balances (#IB) and a digest of its vouchers. From then on balance queries
+start from the stored opening balances (ledger.opening_base_date) and SIE
+saves that would change the closed year are rejected.
+"""
+
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from ledger import account_balances, account_type, fiscal_year_bounds, ledger_digest
+from models import Company, FiscalYear, LedgerLine, OpeningBalance
+
+# The year's result (revenue and cost accounts) is carried into equity here.
+RESULT_ACCOUNT = "2099"
+
+
+def closing_balances(db: Session, company_id: int, start: date, end: date) -> dict[str, int]:
+    """Balances to open the following year with (öre): balance sheet accounts carry over, the result goes to 2099."""
+    closing: dict[str, int] = {}
+    result = 0
+    for account, prev, curr in account_balances(db, company_id, start, end):
+        if account_type(account) in ("T", "S"):
+            closing[account] = closing.get(account, 0) + prev + curr
+        else:
+            result += curr
+    if result:
+        closing[RESULT_ACCOUNT] = closing.get(RESULT_ACCOUNT, 0) + result
+    return {account: amount for account, amount in closing.items() if amount}
+
+
+def close_fiscal_year(db: Session, company: Company, year: int, user_id: int) -> FiscalYear:
+    """
+    Close `year` (caller commits, then calls ledger.invalidate_opening_cache).
+    The ledger must be up to date (ensure_ledger).
+    """
+    start, end = fiscal_year_bounds(company, year)
+    if end >= datetime.utcnow().date():
+        raise HTTPException(status_code=400, detail=f"Cannot close {year}, the fiscal year has not ended")
+
+    closed = {fy.year for fy in db.query(FiscalYear).filter(FiscalYear.company_id == company.id).all()}
+    if year in closed:
+        raise HTTPException(status_code=409, detail=f"Fiscal year {year} is already closed")
+    if year - 1 not in closed:
+        has_earlier = (
+            db.query(LedgerLine.id)
+            .filter(LedgerLine.company_id == company.id, LedgerLine.date < start)
+            .first()
+        )
+        if has_earlier:
+            raise HTTPException(status_code=409, detail=f"Close {year - 1} before closing {year}")
+
+    next_start = end + timedelta(days=1)
+    db.query(OpeningBalance).filter(
+        OpeningBalance.company_id == company.id,
+        OpeningBalance.year == year + 1,
+    ).delete(synchronize_session=False)
+    for account, amount in sorted(closing_balances(db, company.id, start, end).items()):
+        db.add(OpeningBalance(
+            company_id=company.id,
+            year=year + 1,
+            start_date=next_start,
+            account=account,
+            amount_ore=amount,
+        ))
+
+    fiscal_year = FiscalYear(
+        company_id=company.id,
+        year=year,
+        start_date=start,
+        end_date=end,
+        digest=ledger_digest(db, company.id, start, end),
+        closed_by_user_id=user_id,
+    )
+    db.add(fiscal_year)
+    return fiscal_year
+
+
+def reopen_fiscal_year(db: Session, company_id: int, year: int) -> None:
+    """Reopen the latest closed year (caller commits)."""
+    fiscal_year = (
+        db.query(FiscalYear)
+        .filter(FiscalYear.company_id == company_id, FiscalYear.year == year)
+        .first()
+    )
+    if not fiscal_year:
+        raise HTTPException(status_code=404, detail=f"Fiscal year {year} is not closed")
+    later = (
+        db.query(FiscalYear.id)
+        .filter(FiscalYear.company_id == company_id, FiscalYear.year > year)
+        .first()
+    )
+    if later:
+        raise HTTPException(status_code=409, detail=f"Reopen later years before reopening {year}")
+
+    db.query(OpeningBalance).filter(
+        OpeningBalance.company_id == company_id,
+        OpeningBalance.year == year + 1,
+    ).delete(synchronize_session=False)
+    db.delete(fiscal_year)
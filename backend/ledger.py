@@ -0,0 +1,734 @@
+"""
+Server-side ledger.
+
+CompanySIEState.sie_content stays the source of truth (the browser writes
+it); sync_ledger() projects it into ledger_accounts / ledger_vouchers /
+ledger_lines so exports and reports can use SQL instead of parsing text.
+"""
+
+import calendar
+import hashlib
+import re
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator, NamedTuple, Sequence
+
+import numpy as np
+from sqlalchemy import case, exists, func, literal_column, tuple_
+from sqlalchemy.orm import Session
+
+from database import bulk_insert
+from money import format_ore, group_sums, to_ore
+from models import Company, CompanySIEState, LedgerAccount, LedgerLine, LedgerMonthlyTotal, LedgerVoucher, OpeningBalance
+from sie_import import iter_sie_records
+
+# Rows per COPY / INSERT batch while rebuilding the ledger.
+LEDGER_BATCH_SIZE = 5000
+
+# Export output is flushed to the client in pieces of roughly this size.
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Opening balances kept in memory, keyed by ledger version so saves invalidate them.
+OPENING_BALANCE_CACHE_SIZE = 4096
+
+
+# "2025" (year), "2025-Q1" (quarter) or "2025-03" (month), as used by the VAT pages
+_PERIOD_RE = re.compile(r"^(\d{4})(?:-Q([1-4])|-(0[1-9]|1[0-2]))?$")
+
+
+def period_bounds(period_key: str) -> tuple[date, date] | None:
+    """First and last day of a period key; None if it is not one."""
+    match = _PERIOD_RE.match(period_key or "")
+    if not match:
+        return None
+    year = int(match.group(1))
+    if match.group(2):
+        first_month = (int(match.group(2)) - 1) * 3 + 1
+        last_month = first_month + 2
+    elif match.group(3):
+        first_month = last_month = int(match.group(3))
+    else:
+        first_month, last_month = 1, 12
+    return date(year, first_month, 1), date(year, last_month, calendar.monthrange(year, last_month)[1])
+
+
+def voucher_digest(series: str, number: int, voucher_date: date, description: str | None, lines) -> bytes:
+    """Fingerprint of one voucher; `lines` are (account, amount_ore) in line order."""
+    text = "\x1f".join([series, str(number), voucher_date.isoformat(), description or ""])
+    text += "".join(f"\x1e{account}\x1f{amount}" for account, amount in lines)
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def voucher_fingerprint(voucher_date: date, lines) -> str:
+    """
+    Content key for duplicate detection: the date and the net amount per
+    account, so re-imports match whatever their series, number, text or
+    line order.
+    """
+    net: dict[str, int] = {}
+    for account, amount_ore in lines:
+        net[account] = net.get(account, 0) + amount_ore
+    pairs = ";".join(f"{account}:{amount}" for account, amount in sorted(net.items()) if amount)
+    return hashlib.sha256(f"{voucher_date.isoformat()}|{pairs}".encode()).hexdigest()
+
+
+class LedgerSync(NamedTuple):
+    # digest of the vouchers within each frozen range, in order
+    frozen_digests: list[str]
+    # (series, number, first series, first number) for each voucher with the same fingerprint as an earlier one
+    duplicates: list[tuple[str, int, str, int]]
+
+
+def combine_digests(digests: list[bytes]) -> str:
+    # order independent, so re-sorting vouchers in the SIE text is not a change
+    h = hashlib.sha256()
+    for digest in sorted(digests):
+        h.update(digest)
+    return h.hexdigest()
+
+
+def sync_ledger(
+    db: Session,
+    company_id: int,
+    sie_content: str,
+    frozen_ranges: Sequence[tuple[date, date]] = (),
+) -> LedgerSync:
+    """
+    Rebuild the ledger tables (and the monthly totals) for a company
+    (caller commits). Returns the digest of the new content's vouchers
+    within each of `frozen_ranges` (closed years, locked VAT periods), so
+    the caller can reject edits there, and the duplicate vouchers found.
+    """
+    db.query(LedgerLine).filter(LedgerLine.company_id == company_id).delete(synchronize_session=False)
+    db.query(LedgerVoucher).filter(LedgerVoucher.company_id == company_id).delete(synchronize_session=False)
+    db.query(LedgerAccount).filter(LedgerAccount.company_id == company_id).delete(synchronize_session=False)
+    db.query(LedgerMonthlyTotal).filter(LedgerMonthlyTotal.company_id == company_id).delete(synchronize_session=False)
+
+    accounts: dict[str, str] = {}
+    # every line's (month << 20 | account index) and amount, summed with NumPy at the end
+    account_index: dict[str, int] = {}
+    line_keys = array("q")
+    line_amounts = array("q")
+    vouchers: list[dict] = []
+    lines: list[dict] = []
+    seq = 0
+    frozen_digests: list[list[bytes]] = [[] for _ in frozen_ranges]
+    first_by_fingerprint: dict[str, tuple[int, str, int]] = {}
+    duplicates: list[tuple[str, int, str, int]] = []
+
+    for record in iter_sie_records(sie_content.splitlines()):
+        kind = record[0]
+        if kind == "account":
+            accounts.setdefault(record[1]["number"], record[1]["name"])
+        elif kind == "voucher":
+            voucher = record[1]
+            seq += 1
+            voucher_date = date.fromisoformat(voucher["date"])
+            voucher_lines = [(line["accountNumber"], to_ore(line["debit"] - line["credit"])) for line in voucher["lines"]]
+            month_key = (voucher_date.year * 12 + voucher_date.month - 1) << 20
+            fingerprint = voucher_fingerprint(voucher_date, voucher_lines)
+            first = first_by_fingerprint.setdefault(fingerprint, (seq, voucher["series"], voucher["number"]))
+            if first[0] != seq:
+                duplicates.append((voucher["series"], voucher["number"], first[1], first[2]))
+            vouchers.append({
+                "company_id": company_id,
+                "seq": seq,
+                "series": voucher["series"],
+                "number": voucher["number"],
+                "date": voucher_date,
+                "description": voucher["description"],
+                "fingerprint": fingerprint,
+            })
+            for line_no, (account, amount_ore) in enumerate(voucher_lines, start=1):
+                lines.append({
+                    "company_id": company_id,
+                    "voucher_seq": seq,
+                    "line_no": line_no,
+                    "account": account,
+                    "date": voucher_date,
+                    "amount_ore": amount_ore,
+                })
+                line_keys.append(month_key | account_index.setdefault(account, len(account_index)))
+                line_amounts.append(amount_ore)
+            digest = None
+            for index, (start, end) in enumerate(frozen_ranges):
+                if start <= voucher_date <= end:
+                    digest = digest or voucher_digest(
+                        voucher["series"], voucher["number"], voucher_date, voucher["description"], voucher_lines,
+                    )
+                    frozen_digests[index].append(digest)
+            if len(lines) >= LEDGER_BATCH_SIZE:
+                bulk_insert(db, LedgerVoucher, vouchers)
+                bulk_insert(db, LedgerLine, lines)
+                vouchers, lines = [], []
+
+    bulk_insert(db, LedgerVoucher, vouchers)
+    bulk_insert(db, LedgerLine, lines)
+    bulk_insert(db, LedgerAccount, [
+        {"company_id": company_id, "number": number, "name": name} for number, name in accounts.items()
+    ])
+    bulk_insert(db, LedgerMonthlyTotal, monthly_total_rows(company_id, account_index, line_keys, line_amounts))
+    return LedgerSync([combine_digests(digests) for digests in frozen_digests], duplicates)
+
+
+def monthly_total_rows(company_id: int, account_index: dict[str, int], line_keys: array, line_amounts: array) -> list[dict]:
+    """ledger_monthly_totals rows from per-line (month << 20 | account index) keys and amounts."""
+    amounts = np.frombuffer(line_amounts, dtype=np.int64)
+    keys, totals = group_sums(
+        np.frombuffer(line_keys, dtype=np.int64),
+        np.column_stack((np.maximum(amounts, 0), np.maximum(-amounts, 0))),
+    )
+    accounts = list(account_index)
+    months = (keys >> 20).tolist()
+    return [
+        {
+            "company_id": company_id,
+            "month": date(month // 12, month % 12 + 1, 1),
+            "account": accounts[index],
+            "debit_ore": debit,
+            "credit_ore": credit,
+        }
+        for month, index, (debit, credit) in zip(months, (keys & 0xFFFFF).tolist(), totals.tolist())
+    ]
+
+
+def ledger_digest(db: Session, company_id: int, start: date, end: date) -> str:
+    """Same fingerprint as sync_ledger() computes, read back from the ledger tables."""
+    rows = (
+        db.query(
+            LedgerVoucher.seq,
+            LedgerVoucher.series,
+            LedgerVoucher.number,
+            LedgerVoucher.date,
+            LedgerVoucher.description,
+            LedgerLine.account,
+            LedgerLine.amount_ore,
+        )
+        .outerjoin(
+            LedgerLine,
+            (LedgerLine.company_id == LedgerVoucher.company_id) & (LedgerLine.voucher_seq == LedgerVoucher.seq),
+        )
+        .filter(LedgerVoucher.company_id == company_id, LedgerVoucher.date >= start, LedgerVoucher.date <= end)
+        .order_by(LedgerVoucher.seq, LedgerLine.line_no)
+        .execution_options(stream_results=True)
+        .yield_per(2000)
+    )
+    digests = []
+    current = None
+    voucher_lines: list[tuple[str, int]] = []
+    for seq, series, number, voucher_date, description, account, amount_ore in rows:
+        if current is None or current[0] != seq:
+            if current is not None:
+                digests.append(voucher_digest(*current[1:], voucher_lines))
+            current = (seq, series, number, voucher_date, description)
+            voucher_lines = []
+        if account is not None:
+            voucher_lines.append((account, amount_ore))
+    if current is not None:
+        digests.append(voucher_digest(*current[1:], voucher_lines))
+    return combine_digests(digests)
+
+
+def opening_base_date(db: Session, company_id: int, before: date) -> date | None:
+    """
+    Start of the latest fiscal year (on or before `before`) whose opening
+    balances were stored by a year close. Balances as of `before` are then
+    those opening balances plus lines from that date on; no older history
+    needs to be read.
+    """
+    return (
+        db.query(func.max(OpeningBalance.start_date))
+        .filter(OpeningBalance.company_id == company_id, OpeningBalance.start_date <= before)
+        .scalar()
+    )
+
+
+def ensure_ledger(db: Session, company_id: int) -> CompanySIEState | None:
+    """Bring the ledger tables up to date with the stored SIE state (commits if it had to)."""
+    state = db.query(CompanySIEState).filter(CompanySIEState.company_id == company_id).first()
+    if state and state.ledger_version != state.version:
+        sync_ledger(db, company_id, state.sie_content)
+        state.ledger_version = state.version
+        db.commit()
+    return state
+
+
+# ------------------------------------------------------------
+# Account statements
+# ------------------------------------------------------------
+_opening_cache: OrderedDict = OrderedDict()
+_opening_cache_lock = threading.Lock()
+
+
+def debit_normal(account: str) -> bool:
+    """Assets and expenses grow with debit, like calculateBalance() in bas-accounts.ts."""
+    return account_type(account) in ("T", "K")
+
+
+def opening_balance(db: Session, company_id: int, ledger_version: int | None, account: str, before: date | None) -> int:
+    """Sum (debit - credit, öre) of `account` before `before`, cached per ledger version."""
+    if before is None:
+        return 0
+    key = (company_id, ledger_version, account, before)
+    with _opening_cache_lock:
+        if key in _opening_cache:
+            _opening_cache.move_to_end(key)
+            return _opening_cache[key]
+
+    query = db.query(func.coalesce(func.sum(LedgerLine.amount_ore), 0)).filter(
+        LedgerLine.company_id == company_id,
+        LedgerLine.account == account,
+        LedgerLine.date < before,
+    )
+    stored = 0
+    base_date = opening_base_date(db, company_id, before)
+    if base_date:
+        query = query.filter(LedgerLine.date >= base_date)
+        stored = (
+            db.query(OpeningBalance.amount_ore)
+            .filter(
+                OpeningBalance.company_id == company_id,
+                OpeningBalance.start_date == base_date,
+                OpeningBalance.account == account,
+            )
+            .scalar()
+        ) or 0
+    total = int(stored) + int(query.scalar() or 0)
+    with _opening_cache_lock:
+        _opening_cache[key] = total
+        while len(_opening_cache) > OPENING_BALANCE_CACHE_SIZE:
+            _opening_cache.popitem(last=False)
+    return total
+
+
+def invalidate_opening_cache(company_id: int) -> None:
+    """Drop cached opening balances of a company (year close changes them without a new version)."""
+    with _opening_cache_lock:
+        for key in [k for k in _opening_cache if k[0] == company_id]:
+            del _opening_cache[key]
+
+
+def encode_statement_cursor(row_date: date, voucher_seq: int, line_no: int, balance_ore: int) -> str:
+    return f"{row_date.isoformat()}_{voucher_seq}_{line_no}_{balance_ore}"
+
+
+def decode_statement_cursor(cursor: str) -> tuple[date, int, int, int]:
+    """Raises ValueError for malformed cursors."""
+    raw_date, voucher_seq, line_no, balance = cursor.split("_")
+    return date.fromisoformat(raw_date), int(voucher_seq), int(line_no), int(balance)
+
+
+def account_statement(
+    db: Session,
+    company_id: int,
+    ledger_version: int | None,
+    account: str,
+    start: date | None,
+    end: date | None,
+    cursor: str | None,
+    limit: int,
+) -> dict:
+    """
+    One page of an account statement in (date, voucher, line) order. The
+    running balance (debit - credit, öre) comes from a window function over
+    the page, seeded by the opening balance before `start` on the first page
+    and by the balance carried in the cursor on later pages.
+    """
+    position = decode_statement_cursor(cursor) if cursor else None
+    seed = position[3] if position else opening_balance(db, company_id, ledger_version, account, start)
+
+    order = (LedgerLine.date, LedgerLine.voucher_seq, LedgerLine.line_no)
+    query = db.query(
+        LedgerLine.date,
+        LedgerLine.voucher_seq,
+        LedgerLine.line_no,
+        LedgerLine.amount_ore,
+        func.sum(LedgerLine.amount_ore).over(order_by=order).label("running"),
+    ).filter(LedgerLine.company_id == company_id, LedgerLine.account == account)
+    if start:
+        query = query.filter(LedgerLine.date >= start)
+    if end:
+        query = query.filter(LedgerLine.date <= end)
+    if position:
+        query = query.filter(tuple_(*order) > position[:3])
+    page = query.order_by(*order).limit(limit + 1).subquery()
+
+    # vouchers are joined after LIMIT, so at most one page of lookups
+    rows = (
+        db.query(page, LedgerVoucher.series, LedgerVoucher.number, LedgerVoucher.description)
+        .join(
+            LedgerVoucher,
+            (LedgerVoucher.company_id == company_id) & (LedgerVoucher.seq == page.c.voucher_seq),
+        )
+        .order_by(page.c.date, page.c.voucher_seq, page.c.line_no)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    sign = 1 if debit_normal(account) else -1
+    entries = []
+    for row_date, voucher_seq, line_no, amount_ore, running, series, number, description in rows:
+        balance = seed + int(running)
+        entries.append({
+            "date": row_date.isoformat(),
+            "series": series,
+            "voucherNumber": number,
+            "description": description,
+            "debit": amount_ore / 100 if amount_ore > 0 else 0,
+            "credit": -amount_ore / 100 if amount_ore < 0 else 0,
+            "balance": sign * balance / 100,
+        })
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_statement_cursor(last[0], last[1], last[2], seed + int(last[4]))
+    return {
+        "openingBalance": sign * seed / 100,
+        "entries": entries,
+        "nextCursor": next_cursor,
+    }
+
+
+# ------------------------------------------------------------
+# Voucher search
+# ------------------------------------------------------------
+def search_vouchers(
+    db: Session,
+    company_id: int,
+    q: str | None,
+    amount_ore: int | None,
+    account: str | None,
+    offset: int,
+    limit: int,
+) -> dict:
+    """
+    Vouchers whose description matches `q` and that have a line with the
+    given amount (debit or credit) and/or on the given account. On Postgres
+    `q` is a websearch query against the GIN-indexed search_vector and hits
+    are ranked by ts_rank; elsewhere every word must occur in the
+    description. Ties (and searches without `q`) are newest first.
+    """
+    query = db.query(
+        LedgerVoucher.seq, LedgerVoucher.series, LedgerVoucher.number, LedgerVoucher.date, LedgerVoucher.description,
+    ).filter(LedgerVoucher.company_id == company_id)
+    order = []
+
+    terms = (q or "").split()
+    if terms:
+        if db.get_bind().dialect.name == "postgresql":
+            ts_query = func.websearch_to_tsquery("simple", q)
+            vector = literal_column("ledger_vouchers.search_vector")
+            query = query.filter(vector.op("@@")(ts_query))
+            order.append(func.ts_rank(vector, ts_query).desc())
+        else:
+            for term in terms:
+                query = query.filter(LedgerVoucher.description.ilike(f"%{term}%"))
+
+    if amount_ore is not None or account:
+        line = LedgerLine.__table__.alias("search_line")
+        matching = [line.c.company_id == company_id, line.c.voucher_seq == LedgerVoucher.seq]
+        if amount_ore is not None:
+            matching.append(line.c.amount_ore.in_({amount_ore, -amount_ore}))
+        if account:
+            matching.append(line.c.account == account)
+        query = query.filter(exists().where(*matching))
+
+    rows = query.order_by(*order, LedgerVoucher.date.desc(), LedgerVoucher.seq.desc()).offset(offset).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    lines_by_seq: dict[int, list[dict]] = {}
+    if rows:
+        for voucher_seq, line_account, line_amount in (
+            db.query(LedgerLine.voucher_seq, LedgerLine.account, LedgerLine.amount_ore)
+            .filter(LedgerLine.company_id == company_id, LedgerLine.voucher_seq.in_([row[0] for row in rows]))
+            .order_by(LedgerLine.voucher_seq, LedgerLine.line_no)
+        ):
+            lines_by_seq.setdefault(voucher_seq, []).append({
+                "accountNumber": line_account,
+                "debit": line_amount / 100 if line_amount > 0 else 0,
+                "credit": -line_amount / 100 if line_amount < 0 else 0,
+            })
+
+    return {
+        "vouchers": [
+            {
+                "series": series,
+                "voucherNumber": number,
+                "date": voucher_date.isoformat(),
+                "description": description,
+                "lines": lines_by_seq.get(voucher_seq, []),
+            }
+            for voucher_seq, series, number, voucher_date, description in rows
+        ],
+        "nextOffset": offset + limit if has_more else None,
+    }
+
+
+# ------------------------------------------------------------
+# SIE4 export
+# ------------------------------------------------------------
+def _general_ledger_ore(db: Session, company_id: int, start: date | None, end: date | None) -> list[tuple[str, str, int, int, int]]:
+    """(account, name, debit, credit, balance) in öre, balance signed by the account's normal side."""
+    debit = func.sum(case((LedgerLine.amount_ore > 0, LedgerLine.amount_ore), else_=0))
+    credit = func.sum(case((LedgerLine.amount_ore < 0, -LedgerLine.amount_ore), else_=0))
+    query = db.query(LedgerLine.account, debit, credit).filter(LedgerLine.company_id == company_id)
+    if start:
+        query = query.filter(LedgerLine.date >= start)
+    if end:
+        query = query.filter(LedgerLine.date <= end)
+    names = dict(
+        db.query(LedgerAccount.number, LedgerAccount.name)
+        .filter(LedgerAccount.company_id == company_id)
+        .all()
+    )
+
+    rows = []
+    for account, debit_ore, credit_ore in query.group_by(LedgerLine.account).order_by(LedgerLine.account):
+        debit_ore, credit_ore = int(debit_ore or 0), int(credit_ore or 0)
+        balance = debit_ore - credit_ore if debit_normal(account) else credit_ore - debit_ore
+        rows.append((account, names.get(account) or "Unknown", debit_ore, credit_ore, balance))
+    return rows
+
+
+def _ledger_entry(row: tuple[str, str, int, int, int]) -> dict:
+    account, name, debit_ore, credit_ore, balance = row
+    return {
+        "accountNumber": account,
+        "accountName": name,
+        "totalDebit": debit_ore / 100,
+        "totalCredit": credit_ore / 100,
+        "balance": balance / 100,
+    }
+
+
+def general_ledger(db: Session, company_id: int, start: date | None, end: date | None) -> list[dict]:
+    """Per account debit/credit totals and balance (SEK), like getGeneralLedger() in the browser."""
+    return [_ledger_entry(row) for row in _general_ledger_ore(db, company_id, start, end)]
+
+
+def income_statement(db: Session, company_id: int, start: date | None, end: date | None) -> dict:
+    rows = _general_ledger_ore(db, company_id, start, end)
+    revenues = [row for row in rows if row[0].startswith("3") or row[0] == "8310"]
+    expenses = [
+        row for row in rows
+        if row[0][:1] in ("4", "5", "6", "7")
+        or (row[0].startswith("8") and row[0] not in ("8310", "8999"))
+    ]
+    net_result = sum(row[4] for row in revenues) - sum(row[4] for row in expenses)
+    return {
+        "revenues": [_ledger_entry(row) for row in revenues],
+        "expenses": [_ledger_entry(row) for row in expenses],
+        "netResult": net_result / 100,
+    }
+
+
+def balance_sheet(db: Session, company_id: int, as_of: date | None) -> dict:
+    rows = _general_ledger_ore(db, company_id, None, as_of)
+    assets = [row for row in rows if row[0].startswith("1")]
+    equity_liabilities = [row for row in rows if row[0].startswith("2")]
+    total_assets = sum(row[4] for row in assets)
+    total_equity_liabilities = sum(row[4] for row in equity_liabilities)
+    return {
+        "assets": [_ledger_entry(row) for row in assets],
+        "equityLiabilities": [_ledger_entry(row) for row in equity_liabilities],
+        "totalAssets": total_assets / 100,
+        "totalEquityLiabilities": total_equity_liabilities / 100,
+        "isBalanced": total_assets == total_equity_liabilities,
+    }
+
+
+def fiscal_year_bounds(company: Company, year: int) -> tuple[date, date]:
+    """Fiscal year starting in `year`. fiscal_year_start is "MM-DD" (or a full ISO date)."""
+    start_mmdd = (company.fiscal_year_start or "01-01")[-5:]
+    try:
+        start = date(year, int(start_mmdd[0:2]), int(start_mmdd[3:5]))
+    except ValueError:
+        start = date(year, 1, 1)
+    try:
+        next_start = start.replace(year=year + 1)
+    except ValueError:
+        # 29 February start
+        next_start = date(year + 1, 3, 1)
+    return start, next_start - timedelta(days=1)
+
+
+def account_type(number: str) -> str:
+    first = number[:1]
+    if first == "1":
+        return "T"
+    if first == "2":
+        return "S"
+    if first == "3":
+        return "I"
+    if first in ("4", "5", "6", "7", "8"):
+        return "K"
+    return "T"
+
+
+def _sie_date(value: date) -> str:
+    return value.strftime("%Y%m%d")
+
+
+def _quote(text: str | None) -> str:
+    return '"' + (text or "").replace('"', '\\"') + '"'
+
+
+def format_voucher(series: str, number: int, voucher_date: date, description: str | None, lines) -> list[str]:
+    """SIE text of one voucher; `lines` are (account, amount_ore), debit positive."""
+    out = [f"#VER {series} {number} {_sie_date(voucher_date)} {_quote(description)}", "{"]
+    out.extend(f"   #TRANS {account} {{}} {format_ore(amount)}" for account, amount in lines)
+    out.append("}")
+    return out
+
+
+def _format_orgnr(orgnr: str | None) -> str:
+    digits = "".join(ch for ch in (orgnr or "") if ch.isdigit())
+    if len(digits) == 10:
+        return f"{digits[:6]}-{digits[6:]}"
+    return orgnr or ""
+
+
+def account_balances(db: Session, company_id: int, start: date, end: date) -> list[tuple[str, int, int]]:
+    """
+    One aggregate over ledger_lines up to `end`: per account the balance
+    before `start` and the movement within [start, end], both in öre.
+    If a closed year stored opening balances, the scan starts there.
+    """
+    before = func.sum(case((LedgerLine.date < start, LedgerLine.amount_ore), else_=0))
+    during = func.sum(case((LedgerLine.date >= start, LedgerLine.amount_ore), else_=0))
+    query = db.query(LedgerLine.account, before, during).filter(
+        LedgerLine.company_id == company_id,
+        LedgerLine.date <= end,
+    )
+
+    totals: dict[str, list[int]] = {}
+    base_date = opening_base_date(db, company_id, start)
+    if base_date:
+        query = query.filter(LedgerLine.date >= base_date)
+        stored = (
+            db.query(OpeningBalance.account, OpeningBalance.amount_ore)
+            .filter(OpeningBalance.company_id == company_id, OpeningBalance.start_date == base_date)
+            .all()
+        )
+        totals = {account: [int(amount), 0] for account, amount in stored}
+
+    for account, prev, curr in query.group_by(LedgerLine.account).all():
+        entry = totals.setdefault(account, [0, 0])
+        entry[0] += int(prev or 0)
+        entry[1] += int(curr or 0)
+    return [(account, prev, curr) for account, (prev, curr) in sorted(totals.items())]
+
+
+def _header_lines(company: Company, start: date, end: date) -> list[str]:
+    prev_start = fiscal_year_bounds(company, start.year - 1)[0]
+    lines = [
+        "#FLAGGA 0",
+        "#FORMAT PC8",
+        "#SIETYP 4",
+        '#PROGRAM "AccountPro" 1.0',
+        f"#GEN {_sie_date(datetime.utcnow().date())}",
+        f"#FNAMN {_quote(company.company_name)}",
+    ]
+    if company.organization_number:
+        lines.append(f"#ORGNR {_format_orgnr(company.organization_number)}")
+    postal_city = f"{company.postal_code} {company.city}" if company.postal_code and company.city else ""
+    lines.append(f"#ADRESS {_quote(company.address)} {_quote(postal_city)}")
+    lines.append(f"#RAR 0 {_sie_date(start)} {_sie_date(end)}")
+    lines.append(f"#RAR -1 {_sie_date(prev_start)} {_sie_date(start - timedelta(days=1))}")
+    lines.append("#VALUTA SEK")
+    lines.append("#KPTYP EUBAS97")
+    return lines
+
+
+def iter_sie4_export(db: Session, company: Company, year: int) -> Iterator[str]:
+    """
+    Yield SIE4 text lines for one fiscal year. Balances come from a single
+    GROUP BY (one row per account); vouchers are streamed from a server-side
+    cursor, so memory stays bounded by the chart of accounts.
+    """
+    start, end = fiscal_year_bounds(company, year)
+    yield from _header_lines(company, start, end)
+
+    names = dict(
+        db.query(LedgerAccount.number, LedgerAccount.name)
+        .filter(LedgerAccount.company_id == company.id)
+        .all()
+    )
+    balances = account_balances(db, company.id, start, end)
+
+    # Balance sheet accounts carry #IB/#UB, result accounts only #RES for the year
+    closing = []
+    for account, prev, curr in balances:
+        kind = account_type(account)
+        yield f"#KONTO {account} {_quote(names.get(account) or f'Account {account}')}"
+        yield f"#KTYP {account} {kind}"
+        if kind in ("T", "S"):
+            yield f"#IB 0 {account} {format_ore(prev)}"
+            yield f"#UB -1 {account} {format_ore(prev)}"
+            closing.append(f"#UB 0 {account} {format_ore(prev + curr)}")
+        else:
+            closing.append(f"#RES 0 {account} {format_ore(curr)}")
+    yield from closing
+
+    rows = (
+        db.query(
+            LedgerVoucher.seq,
+            LedgerVoucher.series,
+            LedgerVoucher.number,
+            LedgerVoucher.date,
+            LedgerVoucher.description,
+            LedgerLine.account,
+            LedgerLine.amount_ore,
+        )
+        .join(
+            LedgerLine,
+            (LedgerLine.company_id == LedgerVoucher.company_id) & (LedgerLine.voucher_seq == LedgerVoucher.seq),
+        )
+        .filter(
+            LedgerVoucher.company_id == company.id,
+            LedgerVoucher.date >= start,
+            LedgerVoucher.date <= end,
+        )
+        .order_by(LedgerVoucher.date, LedgerVoucher.number, LedgerVoucher.seq, LedgerLine.line_no)
+        .execution_options(stream_results=True)
+        .yield_per(2000)
+    )
+
+    current_seq = None
+    for seq, series, number, voucher_date, description, account, amount_ore in rows:
+        if seq != current_seq:
+            if current_seq is not None:
+                yield "}"
+            current_seq = seq
+            yield f"#VER {series} {number} {_sie_date(voucher_date)} {_quote(description)}"
+            yield "{"
+        yield f"   #TRANS {account} {{}} {format_ore(amount_ore)}"
+    if current_seq is not None:
+        yield "}"
+
+
+def encode_export(lines: Iterable[str], compress: bool = False) -> Iterator[bytes]:
+    """Encode lines as PC8 (CP437) bytes in ~64 KB pieces, optionally gzip'ed on the fly."""
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer: list[str] = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line) + 1
+        if size >= EXPORT_CHUNK_BYTES:
+            data = ("\n".join(buffer) + "\n").encode("cp437", errors="replace")
+            buffer, size = [], 0
+            data = gzip.compress(data) if gzip else data
+            if data:
+                yield data
+    data = ("\n".join(buffer) + "\n").encode("cp437", errors="replace") if buffer else b""
+    if gzip:
+        data = gzip.compress(data) + gzip.flush()
+    if data:
+        yield data
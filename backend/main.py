@@ -1,22 +1,89 @@
 import os
+import io
+import json
 import logging
+import re
+import tempfile
 import time
 from pathlib import Path
-from datetime import datetime
+from typing import Iterable
+from datetime import date, datetime
 from datetime import timedelta
 
-from fastapi import FastAPI, Depends, Header, HTTPException, Request
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import text
+from sqlalchemy import func, text, tuple_, update
 
 from alembic import command
 from alembic.config import Config
 
-from database import get_db, SessionLocal, DATABASE_URL
+from database import get_db, engine, SessionLocal, DATABASE_URL
+from bulk_import import detect_format, run_import
+from sie_import import detect_encoding, iter_decoded_lines, summarize_sie, parse_sie_file, shutdown_parse_pool
+from uploads import receive_upload, iter_file_chunks
+from ledger import (
+    account_statement,
+    balance_sheet,
+    encode_export,
+    ensure_ledger,
+    income_statement,
+    invalidate_opening_cache,
+    iter_sie4_export,
+    period_bounds,
+    search_vouchers,
+    sync_ledger,
+    to_ore,
+)
+from fiscal_years import close_fiscal_year, reopen_fiscal_year
+from summary import company_summary
+from duplicates import duplicate_receipt_groups, duplicate_voucher_groups, existing_receipt
+from company_reports import REPORTS, iter_company_reports, shutdown_report_pool
+from vat_periods import lock_vat_period, unlock_vat_period, vat_period_report
+from bank import (
+    BANK_UPLOAD_DIR,
+    DEFAULT_BANK_ACCOUNT,
+    MATCH_WINDOW_DAYS,
+    confirm_match,
+    import_statement,
+    reconcile,
+    transactions_out,
+    unmatch,
+    unmatched_ledger_lines,
+)
+from billing import InvoiceRunCreate, create_invoice_run, invoice_out
+from payroll import PayrollRunCreate, agi_summary, create_payroll_run, payroll_line_out, payroll_run_out
+from pdf_render import balance_sheet_pdf, income_statement_pdf, invoice_filename, invoice_pdf, iter_invoice_zip, shutdown_render_pool
+from sie_history import load_version, record_version
+from edit_scopes import (
+    COMPANY_SCOPE,
+    MODULE_SCOPES,
+    changed_scopes,
+    merge_scoped_save,
+    module_units,
+    normalize_scope,
+    scopes_conflict,
+)
+from audit import audit_log, flush_audit_log
+from autosave import AUTOSAVE_FLUSH_MS, SieAutosave
+from single_flight import ReadCoalescer
+from rate_limit import make_polling_guard, polling_company, retry_after
+from session_tokens import (
+    REQUIRE_SESSION_TOKEN,
+    bearer_token,
+    current_session,
+    issue_tokens,
+    password_stamp,
+    reset_current_session,
+    set_current_session,
+    verify_access_token,
+    verify_refresh_token,
+)
+from blob_store import BLOB_UPLOAD_DIR, blob_path, blob_response, put_blob, release_blob
 from passlib.context import CryptContext
 from models import (
     User,
@@ -27,6 +94,19 @@ from models import (
     Customer,
     Product,
     CompanySIEState,
+    CompanySIEVersion,
+    AuditLogEntry,
+    LedgerAccount,
+    FiscalYear,
+    OpeningBalance,
+    VatPeriodLock,
+    LedgerVoucher,
+    Invoice,
+    InvoiceLine,
+    PayrollRun,
+    PayrollLine,
+    BankStatement,
+    BankTransaction,
     CompanyLock,
     CompanyJoinRequest,
     CompanyJoinRequestStatus,
@@ -52,12 +132,90 @@ async def log_login_request(request: Request, call_next):
     return response
 
 
+read_coalescer = ReadCoalescer()
+
+_COMPANY_PATH_RE = re.compile(r"^/companies/(\d+)(?:/|$)")
+
+
+@app.middleware("http")
+async def invalidate_coalesced_reads(request: Request, call_next):
+    """Any write under /companies/<id> ends the coalescing of that company's reads (see single_flight)."""
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        match = _COMPANY_PATH_RE.match(request.url.path)
+        if match:
+            read_coalescer.invalidate(int(match.group(1)))
+    return response
+
+
+polling_guard = make_polling_guard(engine)
+
+
+@app.middleware("http")
+async def limit_polling(request: Request, call_next):
+    """Shed polls while the DB pool is congested, and rate limit them per caller and company (see rate_limit)."""
+    company_id = polling_company(request.method, request.url.path)
+    if company_id is None:
+        return await call_next(request)
+
+    wait = polling_guard.shed()
+    if wait:
+        return JSONResponse(status_code=503, content={"detail": "Server busy"}, headers={"Retry-After": retry_after(wait)})
+
+    # user_id is unverified: without a token the caller is its address, and
+    # the company is only charged once the route has confirmed membership
+    claims = current_session()
+    if claims is not None:
+        caller_key = f"user:{claims.user_id}"
+        member = claims.companies is not None and company_id in claims.companies
+    else:
+        caller_key = f"ip:{request.client.host if request.client else 'unknown'}"
+        member = False
+    if polling_guard.queries:
+        wait = await run_in_threadpool(polling_guard.check, caller_key, company_id, member)
+    else:
+        wait = polling_guard.check(caller_key, company_id, member)
+    if wait:
+        return JSONResponse(
+            status_code=429, content={"detail": "Too many requests"}, headers={"Retry-After": retry_after(wait)}
+        )
+    response = await call_next(request)
+    if not member and response.status_code < 400:
+        if polling_guard.queries:
+            await run_in_threadpool(polling_guard.charge_company, company_id)
+        else:
+            polling_guard.charge_company(company_id)
+    return response
+
+
+@app.middleware("http")
+async def session_token(request: Request, call_next):
+    """Verify `Authorization: Bearer <access token>` once per request; see session_tokens."""
+    token = bearer_token(request.headers.get("authorization"))
+    if token is None or request.url.path.startswith("/auth/"):
+        return await call_next(request)
+    try:
+        claims = verify_access_token(token)
+    except HTTPException as exc:
+        return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        # writes check the membership in the database: a removed member cannot write with an old token
+        claims = claims._replace(companies=None)
+    reset = set_current_session(claims)
+    try:
+        return await call_next(request)
+    finally:
+        reset_current_session(reset)
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # sie-state versions, for If-Match writes
+    expose_headers=["ETag"],
 )
 
 # ------------------------------------------------------------
@@ -88,6 +246,10 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
 class RoleUpdateRequest(BaseModel):
     role: str
 
@@ -154,10 +316,50 @@ class CompanySIEStateUpsert(BaseModel):
 
 class CompanyLockRequest(BaseModel):
     user_id: int
+    # company (default), billing, payroll, series:<series> or year:<YYYY>
+    scope: str | None = None
+
+
+class FiscalYearAction(BaseModel):
+    user_id: int
+
+
+class VatPeriodLockCreate(BaseModel):
+    user_id: int
+    # report box -> amount (SEK), e.g. {"05": 1000.0, "10": 250.0, "49": 250.0}
+    boxes: dict[str, float] = {}
+
+
+class VatPeriodUnlock(BaseModel):
+    user_id: int
+
+
+class BankMatchRequest(BaseModel):
+    user_id: int
+    # omit to confirm the suggested match
+    series: str | None = None
+    voucher_number: int | None = None
+    line_no: int | None = None
+
+
+class BankUnmatchRequest(BaseModel):
+    user_id: int
+
+
+class BankReconcileRequest(BaseModel):
+    user_id: int
+    account: str = "1930"
+    window_days: int | None = None
+
+
+class AuditEntryCreate(BaseModel):
+    user_id: int
+    description: str
     
     
 class CompanyUnlockRequest(BaseModel):
     user_id: int
+    scope: str | None = None
 
 
 class CustomerCreate(BaseModel):
@@ -299,11 +501,34 @@ def on_startup():
         run_migrations_to_head()
     except Exception:
         logger.exception("Startup migrations failed (API will error until fixed).")
+    # autosaves acknowledged before a crash
+    sie_autosave.replay()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_parse_pool()
+    shutdown_render_pool()
+    shutdown_report_pool()
+    sie_autosave.flush_all()
+    flush_audit_log()
 
 
 # ------------------------------------------------------------
 # Health
 # ------------------------------------------------------------
+@app.get("/health/coalescing")
+def coalescing_stats():
+    """How many polling reads were folded into another request's query or served from the micro-cache."""
+    return read_coalescer.stats()
+
+
+@app.get("/health/limits")
+def rate_limit_stats():
+    """Polls refused by the rate limits or shed while the connection pool was congested."""
+    return polling_guard.stats()
+
+
 @app.get("/health")
 def health():
     try:
@@ -343,7 +568,30 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == payload.email).first()
     if not user or not verify_password(payload.password, user.password):
         return {"success": False, "error": "Invalid email or password"}
-    return {"success": True, "user": {"id": user.id, "email": user.email, "name": user.name, "role": user.role}}
+    return {
+        "success": True,
+        "user": {"id": user.id, "email": user.email, "name": user.name, "role": user.role},
+        **_session_tokens(db, user),
+    }
+
+
+def _session_tokens(db: Session, user: User) -> dict:
+    company_roles = dict(
+        db.query(CompanyMember.company_id, CompanyMember.role)
+        .filter(CompanyMember.user_id == user.id, CompanyMember.status == "ACTIVE")
+        .all()
+    )
+    return issue_tokens(user.id, user.role, user.password, company_roles)
+
+
+@app.post("/auth/refresh")
+def refresh_session(payload: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """New access and refresh tokens, with the user's current role and company roles."""
+    user_id, stamp = verify_refresh_token(payload.refresh_token)
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user or stamp != password_stamp(user.password):
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    return {"success": True, **_session_tokens(db, user)}
 
 
 @app.post("/auth/reset")
@@ -406,10 +654,226 @@ def create_receipt(payload: ReceiptCreate, db: Session = Depends(get_db)):
     return {"id": receipt.id}
 
 
+def _check_company_access(company_id: int, user_id: int) -> None:
+    db = SessionLocal()
+    try:
+        require_company_access(db, company_id, user_id)
+    finally:
+        db.close()
+
+
+def _require_file_access(db: Session, owner_user_id: int, company_id: int | None, user_id: int) -> None:
+    if company_id is not None:
+        require_company_access(db, company_id, user_id)
+    elif owner_user_id != user_id:
+        raise HTTPException(status_code=403, detail="No access to this file")
+
+
+def _store_sie_upload(upload, user_id: int, company_id: int | None, period: str | None):
+    db = SessionLocal()
+    try:
+        scope = SIEFile.company_id == company_id if company_id is not None else SIEFile.user_id == user_id
+        existing = db.query(SIEFile).filter(SIEFile.sha256 == upload.sha256, scope).first()
+        if existing:
+            upload.discard()
+            return {
+                "id": existing.id,
+                "duplicate": True,
+                "sha256": existing.sha256,
+                "sizeBytes": existing.size_bytes,
+                "encoding": existing.encoding,
+            }
+
+        # identical content uploaded elsewhere shares the same blob file
+        put_blob(db, upload)
+        path = blob_path(upload.sha256)
+
+        encoding = detect_encoding(upload.head)
+        summary = summarize_sie(iter_decoded_lines(iter_file_chunks(path), encoding))
+        fiscal_year_start = summary["metadata"].get("fiscalYearStart")
+
+        sie_file = SIEFile(
+            user_id=user_id,
+            company_id=company_id,
+            filename=upload.filename or f"{upload.sha256[:12]}.se",
+            storage_path=str(path),
+            period=period or (fiscal_year_start[:4] if fiscal_year_start else None),
+            sha256=upload.sha256,
+            size_bytes=upload.size,
+            encoding=encoding,
+        )
+        db.add(sie_file)
+        db.commit()
+        db.refresh(sie_file)
+        return {
+            "id": sie_file.id,
+            "duplicate": False,
+            "sha256": sie_file.sha256,
+            "sizeBytes": sie_file.size_bytes,
+            "encoding": encoding,
+            "period": sie_file.period,
+            "summary": summary,
+        }
+    finally:
+        db.close()
+
+
+@app.post("/sie-files/upload")
+async def upload_sie_file(
+    request: Request,
+    user_id: int,
+    company_id: int | None = None,
+    filename: str | None = None,
+    period: str | None = None,
+):
+    # Raw body or multipart/form-data; written to disk in chunks while hashing,
+    # then parsed line by line from disk (constant memory for any file size).
+    if company_id is not None:
+        await run_in_threadpool(_check_company_access, company_id, user_id)
+    upload = await receive_upload(request, BLOB_UPLOAD_DIR, filename=filename)
+    return await run_in_threadpool(_store_sie_upload, upload, user_id, company_id, period)
+
+
+@app.get("/sie-files/{file_id}/content")
+def download_sie_file(file_id: int, user_id: int, request: Request, db: Session = Depends(get_db)):
+    sie_file = db.query(SIEFile).filter(SIEFile.id == file_id).first()
+    if not sie_file or not sie_file.sha256:
+        raise HTTPException(status_code=404, detail="SIE file not found")
+    _require_file_access(db, sie_file.user_id, sie_file.company_id, user_id)
+    media_type = "text/plain; charset=cp437" if sie_file.encoding == "cp437" else "text/plain; charset=utf-8"
+    return blob_response(request, sie_file.sha256, media_type, sie_file.filename)
+
+
+@app.delete("/sie-files/{file_id}")
+def delete_sie_file(file_id: int, user_id: int, db: Session = Depends(get_db)):
+    sie_file = db.query(SIEFile).filter(SIEFile.id == file_id).first()
+    if not sie_file:
+        raise HTTPException(status_code=404, detail="SIE file not found")
+    _require_file_access(db, sie_file.user_id, sie_file.company_id, user_id)
+    release_blob(db, sie_file.sha256)
+    db.delete(sie_file)
+    db.commit()
+    return {"success": True}
+
+
+def _store_receipt_upload(upload, user_id: int, company_id: int | None, note: str | None):
+    db = SessionLocal()
+    try:
+        duplicate_of = existing_receipt(db, upload.sha256, user_id, company_id)
+        put_blob(db, upload)
+        receipt = Receipt(
+            user_id=user_id,
+            company_id=company_id,
+            filename=upload.filename or upload.sha256[:12],
+            storage_path=str(blob_path(upload.sha256)),
+            note=note,
+            blob_sha256=upload.sha256,
+            size_bytes=upload.size,
+            content_type=upload.content_type,
+        )
+        db.add(receipt)
+        db.commit()
+        db.refresh(receipt)
+        return {
+            "id": receipt.id,
+            "sha256": receipt.blob_sha256,
+            "sizeBytes": receipt.size_bytes,
+            # saved anyway; the client decides whether to keep it
+            "duplicateOf": duplicate_of.id if duplicate_of else None,
+        }
+    finally:
+        db.close()
+
+
+@app.post("/receipts/upload")
+async def upload_receipt(
+    request: Request,
+    user_id: int,
+    company_id: int | None = None,
+    filename: str | None = None,
+    note: str | None = None,
+):
+    if company_id is not None:
+        await run_in_threadpool(_check_company_access, company_id, user_id)
+    upload = await receive_upload(request, BLOB_UPLOAD_DIR, filename=filename)
+    return await run_in_threadpool(_store_receipt_upload, upload, user_id, company_id, note)
+
+
+@app.get("/receipts/{receipt_id}/content")
+def download_receipt(receipt_id: int, user_id: int, request: Request, db: Session = Depends(get_db)):
+    receipt = db.query(Receipt).filter(Receipt.id == receipt_id).first()
+    if not receipt or not receipt.blob_sha256:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    _require_file_access(db, receipt.user_id, receipt.company_id, user_id)
+    # Range + zero-copy capable response; the file is never read into Python memory
+    return blob_response(request, receipt.blob_sha256, receipt.content_type, receipt.filename)
+
+
+@app.delete("/receipts/{receipt_id}")
+def delete_receipt(receipt_id: int, user_id: int, db: Session = Depends(get_db)):
+    receipt = db.query(Receipt).filter(Receipt.id == receipt_id).first()
+    if not receipt:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    _require_file_access(db, receipt.user_id, receipt.company_id, user_id)
+    release_blob(db, receipt.blob_sha256)
+    db.delete(receipt)
+    db.commit()
+    return {"success": True}
+
+
+def _parse_stored_sie_file(file_id: int, user_id: int):
+    db = SessionLocal()
+    try:
+        sie_file = db.query(SIEFile).filter(SIEFile.id == file_id).first()
+        if not sie_file or not sie_file.sha256:
+            raise HTTPException(status_code=404, detail="SIE file not found")
+        _require_file_access(db, sie_file.user_id, sie_file.company_id, user_id)
+        path, encoding = Path(sie_file.storage_path), sie_file.encoding
+    finally:
+        db.close()
+
+    # large files are split at #VER boundaries and parsed across processes
+    result = parse_sie_file(path, encoding=encoding)
+    result["fileId"] = file_id
+    return result
+
+
+@app.get("/sie-files/{file_id}/parsed")
+async def get_parsed_sie_file(file_id: int, user_id: int):
+    return await run_in_threadpool(_parse_stored_sie_file, file_id, user_id)
+
+
 # ------------------------------------------------------------
 # Membership helpers
 # ------------------------------------------------------------
-def require_company_access(db: Session, company_id: int, user_id: int) -> CompanyMember:
+def require_session_user(user_id: int):
+    """
+    Check the caller is `user_id`: with a bearer token it must be the
+    token's user; without one the bare user_id is accepted unless
+    REQUIRE_SESSION_TOKEN is set. Returns the token's claims, if any.
+    """
+    claims = current_session()
+    if claims is not None:
+        if claims.user_id != int(user_id):
+            raise HTTPException(status_code=403, detail="Token does not belong to this user")
+    elif REQUIRE_SESSION_TOKEN:
+        raise HTTPException(status_code=401, detail="Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+
+def require_company_access(db: Session, company_id: int, user_id: int, fresh: bool = False) -> CompanyMember:
+    """
+    The caller's active membership. With a bearer token the user_id must be
+    the token's, and on reads the company role signed into the token is used
+    without a query (unless `fresh`); the returned member is then not in the
+    session.
+    """
+    claims = require_session_user(user_id)
+    if claims is not None:
+        role = claims.companies.get(company_id) if claims.companies is not None and not fresh else None
+        if role is not None:
+            return CompanyMember(company_id=company_id, user_id=claims.user_id, role=role, status="ACTIVE")
+
     membership = (
         db.query(CompanyMember)
         .filter(
@@ -425,7 +889,8 @@ def require_company_access(db: Session, company_id: int, user_id: int) -> Compan
 
 
 def require_company_admin(db: Session, company_id: int, user_id: int) -> CompanyMember:
-    membership = require_company_access(db, company_id, user_id)
+    # admin rights are always read from the database, never from a token
+    membership = require_company_access(db, company_id, user_id, fresh=True)
     if membership.role not in ("OWNER", "ADMIN"):
         raise HTTPException(status_code=403, detail="Admin access required")
     return membership
@@ -445,33 +910,106 @@ def _lock_expires_at():
     return _now_utc() + timedelta(minutes=_lock_ttl_minutes())
 
 
-def _cleanup_expired_lock(db: Session, company_id: int):
-    lock = db.query(CompanyLock).filter(CompanyLock.company_id == company_id).first()
-    if not lock:
-        return None
-    if lock.expires_at <= _now_utc():
-        db.delete(lock)
+def _active_locks(db: Session, company_id: int) -> list[CompanyLock]:
+    """Unexpired locks of the company, all scopes; expired ones are deleted (caller commits)."""
+    now = _now_utc()
+    locks = []
+    for lock in db.query(CompanyLock).filter(CompanyLock.company_id == company_id).all():
+        if lock.expires_at <= now:
+            db.delete(lock)
+        else:
+            locks.append(lock)
+    return locks
+
+
+def _locked_by(db: Session, lock: CompanyLock) -> dict:
+    u = db.query(User).filter(User.id == lock.locked_by_user_id).first()
+    return {"id": u.id, "email": u.email, "name": u.name} if u else {"id": lock.locked_by_user_id}
+
+
+def _take_lock(db: Session, company_id: int, user_id: int, scope: str) -> tuple[CompanyLock, str]:
+    """
+    Acquire or extend `user_id`'s lock on `scope`. Returns the lock and
+    "created", "extended" or "conflict" (the lock is then the other user's).
+    """
+    # row lock on the company: overlapping scopes (company vs series:A) are not one primary key
+    db.query(Company.id).filter(Company.id == company_id).with_for_update().first()
+    locks = _active_locks(db, company_id)
+    conflict = next(
+        (lock for lock in locks if lock.locked_by_user_id != user_id and scopes_conflict(lock.scope, scope)),
+        None,
+    )
+    if conflict:
         db.commit()
-        return None
-    return lock
+        return conflict, "conflict"
+
+    lock = next((lock for lock in locks if lock.scope == scope), None)
+    if lock:
+        lock.expires_at = _lock_expires_at()
+        db.commit()
+        return lock, "extended"
+
+    lock = CompanyLock(
+        company_id=company_id,
+        scope=scope,
+        locked_by_user_id=user_id,
+        locked_at=_now_utc(),
+        expires_at=_lock_expires_at(),
+    )
+    db.add(lock)
+    db.commit()
+    audit_log(
+        company_id,
+        user_id,
+        "lock.acquire",
+        "Locked company for editing" if scope == COMPANY_SCOPE else f"Locked {scope} for editing",
+    )
+    return lock, "created"
+
+
+def _lock_conflict_response(db: Session, company_id: int, scope: str, lock: CompanyLock) -> dict:
+    return {
+        "success": False,
+        "companyId": company_id,
+        "scope": scope,
+        "locked": True,
+        "lockedScope": lock.scope,
+        "lockedBy": _locked_by(db, lock),
+        "expiresAt": lock.expires_at.isoformat(),
+    }
 
 
 @app.get("/companies/{company_id}/lock")
-def get_company_lock(company_id: int, user_id: int, db: Session = Depends(get_db)):
+def get_company_lock(company_id: int, user_id: int, scope: str | None = None, db: Session = Depends(get_db)):
+    """Whether `scope` (default the whole company) is locked, by the lock on it or one overlapping it."""
     # must have access to view lock
     require_company_access(db, company_id, user_id)
+    scope = normalize_scope(scope)
+    # every open tab polls this: concurrent identical reads share one query
+    return read_coalescer.do("lock", company_id, (scope,), lambda: _company_lock_status(db, company_id, scope))
 
-    lock = _cleanup_expired_lock(db, company_id)
+
+def _company_lock_status(db: Session, company_id: int, scope: str) -> dict:
+    locks = _active_locks(db, company_id)
+    db.commit()
+    lock = next((lock for lock in locks if lock.scope == scope), None) or next(
+        (lock for lock in locks if scopes_conflict(lock.scope, scope)), None
+    )
     if not lock:
-        return {"locked": False}
+        return {"locked": False, "scope": scope}
 
-    u = db.query(User).filter(User.id == lock.locked_by_user_id).first()
     return {
         "locked": True,
         "companyId": company_id,
-        "lockedBy": {"id": u.id, "email": u.email, "name": u.name} if u else {"id": lock.locked_by_user_id},
+        "scope": lock.scope,
+        "lockedBy": _locked_by(db, lock),
         "expiresAt": lock.expires_at.isoformat(),
         "lockedAt": lock.locked_at.isoformat() if lock.locked_at else None,
+        # every scope currently held in the company
+        "locks": [
+            {"scope": held.scope, "lockedByUserId": held.locked_by_user_id, "expiresAt": held.expires_at.isoformat()}
+            for held in locks
+        ],
     }
 
 
@@ -479,36 +1017,15 @@ def get_company_lock(company_id: int, user_id: int, db: Session = Depends(get_db
 def lock_company(company_id: int, payload: CompanyLockRequest, db: Session = Depends(get_db)):
     # must have access to lock
     require_company_access(db, company_id, payload.user_id)
+    scope = normalize_scope(payload.scope)
 
-    lock = _cleanup_expired_lock(db, company_id)
-
-    # No lock -> create lock for this user
-    if not lock:
-        new_lock = CompanyLock(
-            company_id=company_id,
-            locked_by_user_id=payload.user_id,
-            locked_at=_now_utc(),
-            expires_at=_lock_expires_at(),
-        )
-        db.add(new_lock)
-        db.commit()
-        return {"success": True, "companyId": company_id, "locked": True}
-
-    # Lock exists and owned by same user -> extend TTL
-    if lock.locked_by_user_id == payload.user_id:
-        lock.expires_at = _lock_expires_at()
-        db.commit()
-        return {"success": True, "companyId": company_id, "locked": True, "alreadyOwned": True}
-
-    # Lock exists and owned by someone else -> return info for popup
-    u = db.query(User).filter(User.id == lock.locked_by_user_id).first()
-    return {
-        "success": False,
-        "companyId": company_id,
-        "locked": True,
-        "lockedBy": {"id": u.id, "email": u.email, "name": u.name} if u else {"id": lock.locked_by_user_id},
-        "expiresAt": lock.expires_at.isoformat(),
-    }
+    lock, status = _take_lock(db, company_id, payload.user_id, scope)
+    if status == "conflict":
+        # owned by someone else -> return info for popup
+        return _lock_conflict_response(db, company_id, scope, lock)
+    if status == "extended":
+        return {"success": True, "companyId": company_id, "scope": scope, "locked": True, "alreadyOwned": True}
+    return {"success": True, "companyId": company_id, "scope": scope, "locked": True}
 
 
 TAKEOVER_REQUEST_SECONDS = 30
@@ -530,7 +1047,11 @@ def create_takeover_request(company_id: int, payload: CompanyLockPayload, db: Se
         raise HTTPException(status_code=403, detail="No access to this company")
     user_id = int(payload.user_id)
 
-    lock = db.query(CompanyLock).filter(CompanyLock.company_id == company_id).first()
+    lock = (
+        db.query(CompanyLock)
+        .filter(CompanyLock.company_id == company_id, CompanyLock.scope == COMPANY_SCOPE)
+        .first()
+    )
 
     if not lock:
         return {"success": False, "message": "Company is not locked"}
@@ -575,6 +1096,10 @@ def create_takeover_request(company_id: int, payload: CompanyLockPayload, db: Se
 
 @app.get("/companies/{company_id}/takeover-requests")
 def list_takeover_requests(company_id: int, db: Session = Depends(get_db)):
+    return read_coalescer.do("takeover-requests", company_id, (), lambda: _pending_takeover_requests(db, company_id))
+
+
+def _pending_takeover_requests(db: Session, company_id: int) -> list[dict]:
     now = datetime.utcnow()
 
     requests = (
@@ -619,7 +1144,11 @@ def approve_takeover(request_id: int, payload: CompanyLockPayload, db: Session =
     if req.status != CompanyLockTakeoverStatus.PENDING:
         return {"success": False}
 
-    lock = db.query(CompanyLock).filter(CompanyLock.company_id == req.company_id).first()
+    lock = (
+        db.query(CompanyLock)
+        .filter(CompanyLock.company_id == req.company_id, CompanyLock.scope == COMPANY_SCOPE)
+        .first()
+    )
 
     if not lock:
         raise HTTPException(status_code=400, detail="Company not locked")
@@ -637,6 +1166,8 @@ def approve_takeover(request_id: int, payload: CompanyLockPayload, db: Session =
     lock.expires_at = datetime.utcnow() + timedelta(seconds=60)
 
     db.commit()
+    read_coalescer.invalidate(req.company_id)
+    audit_log(req.company_id, user_id, "lock.takeover", f"Handed over editing lock to user {req.requested_by_user_id}")
 
     return {"success": True}
     
@@ -653,7 +1184,11 @@ def reject_takeover(request_id: int, payload: CompanyLockPayload, db: Session =
     if req.status != CompanyLockTakeoverStatus.PENDING:
         return {"success": False}
 
-    lock = db.query(CompanyLock).filter(CompanyLock.company_id == req.company_id).first()
+    lock = (
+        db.query(CompanyLock)
+        .filter(CompanyLock.company_id == req.company_id, CompanyLock.scope == COMPANY_SCOPE)
+        .first()
+    )
 
     if not lock:
         raise HTTPException(status_code=400, detail="Company not locked")
@@ -666,6 +1201,7 @@ def reject_takeover(request_id: int, payload: CompanyLockPayload, db: Session =
     req.decided_at = datetime.utcnow()
 
     db.commit()
+    read_coalescer.invalidate(req.company_id)
 
     return {"success": True}
 
@@ -674,43 +1210,28 @@ def reject_takeover(request_id: int, payload: CompanyLockPayload, db: Session =
 def lock_heartbeat(company_id: int, payload: CompanyLockRequest, db: Session = Depends(get_db)):
     # must have access
     require_company_access(db, company_id, payload.user_id)
+    scope = normalize_scope(payload.scope)
 
-    lock = _cleanup_expired_lock(db, company_id)
-    if not lock:
-        # If no lock, heartbeat behaves like "try lock"
-        new_lock = CompanyLock(
-            company_id=company_id,
-            locked_by_user_id=payload.user_id,
-            locked_at=_now_utc(),
-            expires_at=_lock_expires_at(),
-        )
-        db.add(new_lock)
-        db.commit()
-        return {"success": True, "companyId": company_id, "locked": True, "created": True}
-
-    if lock.locked_by_user_id != payload.user_id:
-        u = db.query(User).filter(User.id == lock.locked_by_user_id).first()
-        return {
-            "success": False,
-            "companyId": company_id,
-            "locked": True,
-            "lockedBy": {"id": u.id, "email": u.email, "name": u.name} if u else {"id": lock.locked_by_user_id},
-            "expiresAt": lock.expires_at.isoformat(),
-        }
-
-    lock.expires_at = _lock_expires_at()
-    db.commit()
-    return {"success": True, "companyId": company_id, "locked": True, "extended": True}
+    # If no lock, heartbeat behaves like "try lock"
+    lock, status = _take_lock(db, company_id, payload.user_id, scope)
+    if status == "conflict":
+        return _lock_conflict_response(db, company_id, scope, lock)
+    return {"success": True, "companyId": company_id, "scope": scope, "locked": True, status: True}
 
 
 @app.post("/companies/{company_id}/unlock")
 def unlock_company(company_id: int, payload: CompanyUnlockRequest, db: Session = Depends(get_db)):
     # must have access
     require_company_access(db, company_id, payload.user_id)
+    scope = normalize_scope(payload.scope)
 
-    lock = db.query(CompanyLock).filter(CompanyLock.company_id == company_id).first()
+    lock = (
+        db.query(CompanyLock)
+        .filter(CompanyLock.company_id == company_id, CompanyLock.scope == scope)
+        .first()
+    )
     if not lock:
-        return {"success": True, "companyId": company_id, "locked": False}
+        return {"success": True, "companyId": company_id, "scope": scope, "locked": False}
 
     # only owner of lock (or admin/owner) can unlock
     if lock.locked_by_user_id != payload.user_id:
@@ -721,31 +1242,198 @@ def unlock_company(company_id: int, payload: CompanyUnlockRequest, db: Session =
             CompanyMember.status == "ACTIVE",
         ).first()
         if not membership or membership.role not in ("OWNER", "ADMIN"):
-            u = db.query(User).filter(User.id == lock.locked_by_user_id).first()
-            return {
-                "success": False,
-                "companyId": company_id,
-                "locked": True,
-                "lockedBy": {"id": u.id, "email": u.email, "name": u.name} if u else {"id": lock.locked_by_user_id},
-                "expiresAt": lock.expires_at.isoformat(),
-                "detail": "Locked by another user",
-            }
+            return {**_lock_conflict_response(db, company_id, scope, lock), "detail": "Locked by another user"}
 
+    # autosaves accepted under this lock are written before it goes
+    sie_autosave.flush_company(company_id)
+    forced = lock.locked_by_user_id != payload.user_id
     db.delete(lock)
     db.commit()
-    return {"success": True, "companyId": company_id, "locked": False}
+    what = "editing lock" if scope == COMPANY_SCOPE else f"editing lock on {scope}"
+    audit_log(
+        company_id,
+        payload.user_id,
+        "lock.release",
+        f"Broke {what} held by user {lock.locked_by_user_id}" if forced else f"Released {what}",
+    )
+    return {"success": True, "companyId": company_id, "scope": scope, "locked": False}
 
 
 # ------------------------------------------------------------
 # Company SIE State
 # ------------------------------------------------------------
+# duplicate vouchers listed in a save response (the count is always complete)
+DUPLICATE_WARNINGS_MAX = 50
+
+
+def _sync_ledger_checked(db: Session, company_id: int, sie_content: str) -> list[tuple[str, int, str, int]]:
+    """
+    Rebuild the ledger; 409 if the new content changes a closed year or a
+    locked VAT period. Returns the duplicate vouchers found.
+    """
+    frozen = [
+        (fy.start_date, fy.end_date, fy.digest, {"message": f"Fiscal year {fy.year} is closed", "year": fy.year})
+        for fy in db.query(FiscalYear).filter(FiscalYear.company_id == company_id).order_by(FiscalYear.year)
+    ] + [
+        (lock.start_date, lock.end_date, lock.digest, {"message": f"VAT period {lock.period_key} is locked", "period": lock.period_key})
+        for lock in db.query(VatPeriodLock).filter(VatPeriodLock.company_id == company_id).order_by(VatPeriodLock.start_date)
+    ]
+    synced = sync_ledger(db, company_id, sie_content, [(start, end) for start, end, _, _ in frozen])
+    for (_, _, expected, detail), digest in zip(frozen, synced.frozen_digests):
+        if digest != expected:
+            raise HTTPException(status_code=409, detail=detail)
+    return synced.duplicates
+
+
+def _lock_sie_state(db: Session, company_id: int) -> CompanySIEState | None:
+    """
+    Row-lock the SIE state (the same lock sie-state saves take) and bring
+    the ledger up to date, before freezing a period.
+    """
+    # a buffered autosave goes first; flushed later it would overwrite this write
+    sie_autosave.flush_company(company_id)
+    state = db.query(CompanySIEState).filter(CompanySIEState.company_id == company_id).with_for_update().first()
+    if state and state.ledger_version != state.version:
+        sync_ledger(db, company_id, state.sie_content)
+        state.ledger_version = state.version
+    return state
+
+
+def _next_voucher_number(db: Session, company_id: int, state: CompanySIEState | None, series: str = "A") -> int:
+    """Next number in `series`; call with the SIE state locked (_lock_sie_state)."""
+    last_number = None
+    if state:
+        last_number = (
+            db.query(func.max(LedgerVoucher.number))
+            .filter(LedgerVoucher.company_id == company_id, LedgerVoucher.series == series)
+            .scalar()
+        )
+    return (last_number or 0) + 1
+
+
+def _append_vouchers(
+    db: Session,
+    company_id: int,
+    state: CompanySIEState | None,
+    vouchers: list[str],
+    user_id: int,
+) -> CompanySIEState:
+    """Append #VER blocks to the locked SIE state as a new version (caller commits)."""
+    previous_content = state.sie_content if state else None
+    content = (previous_content.rstrip("\n") + "\n" if previous_content else "") + "\n".join(vouchers) + "\n"
+    state, _ = _store_sie_content(db, company_id, state, content, user_id)
+    return state
+
+
+def _store_sie_content(
+    db: Session,
+    company_id: int,
+    state: CompanySIEState | None,
+    content: str,
+    user_id: int,
+) -> tuple[CompanySIEState, list]:
+    """Write `content` to the locked SIE state as a new version and sync the ledger (caller commits)."""
+    previous_content = state.sie_content if state else None
+    if not state:
+        state = CompanySIEState(company_id=company_id, sie_content=content, version=1, updated_by_user_id=user_id)
+        db.add(state)
+    else:
+        state.sie_content = content
+        state.version = (state.version or 1) + 1
+        state.updated_by_user_id = user_id
+    record_version(db, company_id, state.version, previous_content, content, user_id)
+    duplicates = _sync_ledger_checked(db, company_id, content)
+    state.ledger_version = state.version
+    return state, duplicates
+
+
+def _write_autosave(company_id: int, user_id: int, content: str) -> int:
+    """Commit one coalesced autosave; its lock was checked when it was accepted."""
+    db = SessionLocal()
+    try:
+        state = db.query(CompanySIEState).filter(CompanySIEState.company_id == company_id).with_for_update().first()
+        state, _ = _store_sie_content(db, company_id, state, content, user_id)
+        db.commit()
+        version = state.version
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    read_coalescer.invalidate(company_id)
+    audit_log(company_id, user_id, "sie_state.update", f"Saved accounting data (version {version}, autosave)")
+    return version
+
+
+sie_autosave = SieAutosave(_write_autosave)
+
+
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _parse_if_match(value: str) -> int | None:
+    """The version in an If-Match header ("7", W/"7" or 7); None for *."""
+    value = value.strip()
+    if value == "*":
+        return None
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be a sie-state version") from None
+
+
+def _version_conflict(current_version: int | None) -> HTTPException:
+    return HTTPException(
+        status_code=412,
+        detail={"message": "The SIE state has changed since it was read", "currentVersion": current_version},
+        headers={"ETag": _etag(current_version)} if current_version is not None else None,
+    )
+
+
 @app.get("/companies/{company_id}/sie-state")
-def get_company_sie_state(company_id: int, user_id: int, db: Session = Depends(get_db)):
+def get_company_sie_state(
+    company_id: int,
+    user_id: int,
+    response: Response,
+    version: int | None = None,
+    db: Session = Depends(get_db),
+):
     require_company_access(db, company_id, user_id)
+    # read your own writes: buffered autosaves are written first
+    sie_autosave.flush_company(company_id)
+    body = read_coalescer.do("sie-state", company_id, (version,), lambda: _sie_state_body(db, company_id, version))
+    current_version = body.get("currentVersion", body["version"])
+    if current_version is not None:
+        response.headers["ETag"] = _etag(current_version)
+    return body
+
+
+def _sie_state_body(db: Session, company_id: int, version: int | None) -> dict:
     state = db.query(CompanySIEState).filter(CompanySIEState.company_id == company_id).first()
     if not state:
+        if version is not None:
+            raise HTTPException(status_code=404, detail="Version not found")
         return {"companyId": company_id, "sieContent": None, "version": None, "updatedAt": None}
 
+    if version is not None and version != state.version:
+        # time travel: rebuild from the nearest snapshot + diffs
+        loaded = load_version(db, company_id, version)
+        if not loaded:
+            raise HTTPException(status_code=404, detail="Version not found")
+        row, content = loaded
+        return {
+            "id": state.id,
+            "companyId": company_id,
+            "sieContent": content,
+            "version": row.version,
+            "currentVersion": state.version,
+            "updatedAt": row.created_at.isoformat() if row.created_at else None,
+            "updatedByUserId": row.created_by_user_id,
+        }
+
     return {
         "id": state.id,
         "companyId": state.company_id,
@@ -756,52 +1444,1014 @@ def get_company_sie_state(company_id: int, user_id: int, db: Session = Depends(g
     }
 
 
-@app.put("/companies/{company_id}/sie-state")
-def upsert_company_sie_state(company_id: int, payload: CompanySIEStateUpsert, db: Session = Depends(get_db)):
-    # must have access
-    membership = require_company_access(db, company_id, payload.user_id)
-
-    # require lock (or allow OWNER/ADMIN to break)
-    lock = _cleanup_expired_lock(db, company_id)
-    if lock:
-        if lock.locked_by_user_id != payload.user_id:
+def _require_edit_lock(
+    db: Session,
+    company_id: int,
+    membership: CompanyMember,
+    required: bool = True,
+    units: Iterable[tuple[str, ...]] | None = None,
+    locks: list[CompanyLock] | None = None,
+) -> None:
+    """
+    Writes need an edit lock covering what they change (OWNER/ADMIN may
+    override someone else's lock). `units` lists, per changed voucher or
+    module run, the scopes that cover it besides the company scope; None
+    means only the company lock will do. With required=False (If-Match
+    writes) no lock is needed, but another user's lock is still respected.
+    """
+    if locks is None:
+        locks = _active_locks(db, company_id)
+    own = {lock.scope for lock in locks if lock.locked_by_user_id == membership.user_id}
+    others = [lock for lock in locks if lock.locked_by_user_id != membership.user_id]
+
+    for unit in [()] if units is None else units:
+        covering = (COMPANY_SCOPE, *unit)
+        lock = next((lock for lock in others if lock.scope in covering), None)
+        if lock:
             # allow OWNER/ADMIN to force update (optional, but useful)
             if membership.role not in ("OWNER", "ADMIN"):
-                u = db.query(User).filter(User.id == lock.locked_by_user_id).first()
                 raise HTTPException(
                     status_code=409,
                     detail={
                         "message": "Company is locked by another user",
-                        "lockedBy": {"id": u.id, "email": u.email, "name": u.name} if u else {"id": lock.locked_by_user_id},
+                        "scope": lock.scope,
+                        "lockedBy": _locked_by(db, lock),
                         "expiresAt": lock.expires_at.isoformat(),
                     },
                 )
+        elif required and own.isdisjoint(covering):
+            # no lock at all -> require user to lock first
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "message": (
+                        "Company is not locked. Lock it before updating SIE."
+                        if not own
+                        else f"Not locked for this change. Lock one of: {', '.join(covering)}."
+                    ),
+                    "scopes": list(covering),
+                },
+            )
+
+
+def _require_sie_edit_lock(
+    db: Session,
+    company_id: int,
+    membership: CompanyMember,
+    previous_content: str | None,
+    content: str,
+    required: bool,
+) -> None:
+    """_require_edit_lock for a SIE save, limited to the scopes of the vouchers it changes."""
+    locks = _active_locks(db, company_id)
+    own = {lock.scope for lock in locks if lock.locked_by_user_id == membership.user_id}
+    if COMPANY_SCOPE in own or (not required and len(own) == len(locks)):
+        # the whole company is ours, or nobody else holds anything: no need to diff
+        return
+    if not locks:
+        _require_edit_lock(db, company_id, membership, required, locks=locks)
+        return
+
+    change = changed_scopes(db.get(Company, company_id), previous_content or "", content)
+    units = set(change.units)
+    if change.header_changed or not units:
+        # accounts and company details are shared: any lock of ours will do
+        # unless someone else holds the whole company; without one, any
+        # lock in the company stands in the way (OWNER/ADMIN may override)
+        units.add(tuple(sorted(own or {lock.scope for lock in locks})))
+    _require_edit_lock(db, company_id, membership, required, units=units, locks=locks)
+
+
+def _merge_scoped_sie_save(
+    db: Session, company_id: int, user_id: int, current_content: str | None, content: str
+) -> tuple[str, int]:
+    """
+    A save by someone holding only series/year locks carries the whole text
+    as they last read it: keep their vouchers in those scopes and everyone
+    else's as on the server (see edit_scopes.merge_scoped_save).
+    """
+    own = {
+        lock.scope
+        for lock in _active_locks(db, company_id)
+        if lock.locked_by_user_id == user_id and lock.scope not in MODULE_SCOPES
+    }
+    if current_content is None or not own or COMPANY_SCOPE in own:
+        return content, 0
+    return merge_scoped_save(db.get(Company, company_id), current_content, content, own)
+
+
+@app.put("/companies/{company_id}/sie-state")
+def upsert_company_sie_state(
+    company_id: int,
+    payload: CompanySIEStateUpsert,
+    response: Response,
+    if_match: str | None = Header(default=None, alias="If-Match"),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    db: Session = Depends(get_db),
+):
+    """
+    Two write modes. Without If-Match the caller must hold an edit lock
+    (lock, heartbeat, unlock) on the company or on every voucher series or
+    fiscal year the save changes; with only series/year locks, just the
+    vouchers in those scopes are taken from the save. With If-Match:
+    <version> no lock is needed: the write is a compare-and-swap on the
+    version and fails with 412 and the current version when someone saved
+    in between.
+    `If-None-Match: *` creates the state only if there is none yet.
+    """
+    # must have access
+    membership = require_company_access(db, company_id, payload.user_id)
+    # a buffered autosave is older than this save, so it is written first
+    sie_autosave.flush_company(company_id)
+
+    conditional = if_match is not None or if_none_match is not None
+    content, out_of_scope = payload.sie_content, 0
+
+    if if_match is not None:
+        expected_version = _parse_if_match(if_match)
+        state = db.query(CompanySIEState).filter(CompanySIEState.company_id == company_id).first()
+        if not state or (expected_version is not None and state.version != expected_version):
+            raise _version_conflict(state.version if state else None)
+        previous_content = state.sie_content
+        # conditional writes only respect someone else's lock on what they change
+        _require_sie_edit_lock(db, company_id, membership, previous_content, payload.sie_content, required=False)
+        # the WHERE on version is the compare-and-swap; it also row-locks the state until commit
+        swapped = db.execute(
+            update(CompanySIEState)
+            .where(CompanySIEState.company_id == company_id, CompanySIEState.version == state.version)
+            .values(
+                sie_content=payload.sie_content,
+                version=state.version + 1,
+                updated_by_user_id=payload.user_id,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if swapped != 1:
+            db.rollback()
+            current = db.query(CompanySIEState.version).filter(CompanySIEState.company_id == company_id).scalar()
+            raise _version_conflict(current)
+        db.refresh(state)
     else:
-        # no lock at all -> require user to lock first
-        raise HTTPException(
-            status_code=409,
-            detail={"message": "Company is not locked. Lock it before updating SIE."},
+        # row lock serializes saves with fiscal year closing
+        state = db.query(CompanySIEState).filter(CompanySIEState.company_id == company_id).with_for_update().first()
+        if state and if_none_match is not None and if_none_match.strip() == "*":
+            raise _version_conflict(state.version)
+        content, out_of_scope = _merge_scoped_sie_save(
+            db, company_id, payload.user_id, state.sie_content if state else None, payload.sie_content
+        )
+        # require lock (or allow OWNER/ADMIN to break)
+        _require_sie_edit_lock(
+            db, company_id, membership, state.sie_content if state else None, content, required=not conditional
         )
+        previous_content = None
+        if not state:
+            state = CompanySIEState(
+                company_id=company_id,
+                sie_content=content,
+                version=1,
+                updated_by_user_id=payload.user_id,
+            )
+            db.add(state)
+            if conditional:
+                # without the edit lock two creators can race; the unique company_id decides
+                try:
+                    db.flush()
+                except IntegrityError:
+                    db.rollback()
+                    current = db.query(CompanySIEState.version).filter(CompanySIEState.company_id == company_id).scalar()
+                    raise _version_conflict(current) from None
+        else:
+            previous_content = state.sie_content
+            state.sie_content = content
+            state.version = (state.version or 1) + 1
+            state.updated_by_user_id = payload.user_id
+
+    record_version(db, company_id, state.version, previous_content, content, payload.user_id)
+
+    # keep the relational ledger in the same transaction as the SIE text
+    duplicates = _sync_ledger_checked(db, company_id, content)
+    state.ledger_version = state.version
+    db.commit()
+    db.refresh(state)
+    audit_log(company_id, payload.user_id, "sie_state.update", f"Saved accounting data (version {state.version})")
+    response.headers["ETag"] = _etag(state.version)
+    return {
+        "id": state.id,
+        "companyId": state.company_id,
+        "version": state.version,
+        # warning only: same date and amounts per account as an earlier voucher
+        "duplicateVouchers": [
+            {"series": series, "voucherNumber": number, "duplicateOf": {"series": first_series, "voucherNumber": first_number}}
+            for series, number, first_series, first_number in duplicates[:DUPLICATE_WARNINGS_MAX]
+        ],
+        "duplicateVoucherCount": len(duplicates),
+        # voucher changes outside the caller's series/year locks, left as on the server
+        "outOfScopeChanges": out_of_scope,
+    }
 
-    state = db.query(CompanySIEState).filter(CompanySIEState.company_id == company_id).first()
-    if not state:
-        state = CompanySIEState(
-            company_id=company_id,
-            sie_content=payload.sie_content,
-            version=1,
-            updated_by_user_id=payload.user_id,
+
+@app.put("/companies/{company_id}/sie-state/autosave", status_code=202)
+def autosave_company_sie_state(company_id: int, payload: CompanySIEStateUpsert, db: Session = Depends(get_db)):
+    """
+    Write-behind save for editors that save often. Checked against the edit
+    lock like a plain save, then journaled and acknowledged at once; a burst
+    of autosaves is written as one version AUTOSAVE_FLUSH_MS after its first
+    save, on unlock or on shutdown (see autosave.py).
+    """
+    membership = require_company_access(db, company_id, payload.user_id)
+
+    # the lock check covers what changed since the last accepted save
+    previous_content = sie_autosave.pending_content(company_id)
+    if previous_content is None:
+        previous_content = (
+            db.query(CompanySIEState.sie_content).filter(CompanySIEState.company_id == company_id).scalar()
         )
-        db.add(state)
+    content, out_of_scope = _merge_scoped_sie_save(db, company_id, payload.user_id, previous_content, payload.sie_content)
+    _require_sie_edit_lock(db, company_id, membership, previous_content, content, required=True)
+    db.commit()
+
+    sie_autosave.save(company_id, payload.user_id, content)
+    # AUTOSAVE_FLUSH_MS=0 turns the buffer off: written before answering
+    version = sie_autosave.flush_company(company_id) if AUTOSAVE_FLUSH_MS <= 0 else None
+    return {
+        "companyId": company_id,
+        "accepted": True,
+        "pending": version is None,
+        "version": version,
+        "flushAfterMs": max(AUTOSAVE_FLUSH_MS, 0),
+        "outOfScopeChanges": out_of_scope,
+    }
+
+
+@app.get("/companies/{company_id}/sie-state/autosave")
+def get_company_sie_autosave(company_id: int, user_id: int, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    return {
+        "companyId": company_id,
+        "pending": sie_autosave.pending_content(company_id) is not None,
+        # set while the last buffered save is failing to write (it stays buffered and is retried)
+        # or after it was rejected (its journal file is kept as .failed, never replayed)
+        "error": sie_autosave.failure(company_id),
+    }
+
+
+@app.get("/companies/{company_id}/sie-versions")
+def list_company_sie_versions(company_id: int, user_id: int, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    rows = (
+        db.query(
+            CompanySIEVersion.version,
+            CompanySIEVersion.kind,
+            func.length(CompanySIEVersion.payload),
+            CompanySIEVersion.content_length,
+            CompanySIEVersion.created_by_user_id,
+            CompanySIEVersion.created_at,
+        )
+        .filter(CompanySIEVersion.company_id == company_id)
+        .order_by(CompanySIEVersion.version.desc())
+        .all()
+    )
+    return [
+        {
+            "version": version,
+            "kind": kind,
+            "storedBytes": stored,
+            "contentLength": length,
+            "createdByUserId": created_by,
+            "createdAt": created_at.isoformat() if created_at else None,
+        }
+        for version, kind, stored, length, created_by, created_at in rows
+    ]
+
+
+@app.get("/companies/{company_id}/sie-export")
+def export_company_sie(
+    company_id: int,
+    user_id: int,
+    request: Request,
+    year: int | None = None,
+    compress: bool = False,
+    db: Session = Depends(get_db),
+):
+    require_company_access(db, company_id, user_id)
+    company = db.query(Company).filter(Company.id == company_id).first()
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    ensure_ledger(db, company_id)
+
+    year = year or datetime.utcnow().year
+    filename = f"{(company.organization_number or str(company_id)).replace('-', '')}_{year}.se"
+    # compress=true -> .se.gz download; otherwise gzip transfer encoding when the client accepts it
+    gzip_transfer = not compress and "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.gz"' if compress else f'attachment; filename="{filename}"'}
+    if gzip_transfer:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    def body():
+        # own session: the request-scoped one is closed before streaming ends
+        stream_db = SessionLocal()
+        try:
+            stream_company = stream_db.get(Company, company_id)
+            yield from encode_export(iter_sie4_export(stream_db, stream_company, year), compress=compress or gzip_transfer)
+        finally:
+            stream_db.close()
+
+    media_type = "application/gzip" if compress else "text/plain; charset=cp437"
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+
+STATEMENT_PAGE_MAX = 5000
+
+
+@app.get("/companies/{company_id}/accounts/{account}/statement")
+def get_account_statement(
+    company_id: int,
+    account: str,
+    user_id: int,
+    from_date: date | None = Query(None, alias="from"),
+    to_date: date | None = Query(None, alias="to"),
+    cursor: str | None = None,
+    limit: int = 500,
+    db: Session = Depends(get_db),
+):
+    require_company_access(db, company_id, user_id)
+    state = ensure_ledger(db, company_id)
+    ledger_version = state.ledger_version if state else None
+
+    name = (
+        db.query(LedgerAccount.name)
+        .filter(LedgerAccount.company_id == company_id, LedgerAccount.number == account)
+        .scalar()
+    )
+    try:
+        page = account_statement(
+            db,
+            company_id,
+            ledger_version,
+            account,
+            from_date,
+            to_date,
+            cursor,
+            max(1, min(limit, STATEMENT_PAGE_MAX)),
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return {"accountNumber": account, "accountName": name, **page}
+
+
+SEARCH_PAGE_MAX = 200
+
+
+@app.get("/companies/{company_id}/vouchers/search")
+def search_company_vouchers(
+    company_id: int,
+    user_id: int,
+    q: str | None = None,
+    amount: float | None = None,
+    account: str | None = None,
+    offset: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+):
+    require_company_access(db, company_id, user_id)
+    if not (q or "").strip() and amount is None and not account:
+        raise HTTPException(status_code=400, detail="Give q, amount or account to search for")
+    ensure_ledger(db, company_id)
+    return search_vouchers(
+        db,
+        company_id,
+        q,
+        abs(to_ore(amount)) if amount is not None else None,
+        account,
+        max(0, offset),
+        max(1, min(limit, SEARCH_PAGE_MAX)),
+    )
+
+
+@app.get("/companies/{company_id}/duplicates")
+def get_company_duplicates(company_id: int, user_id: int, db: Session = Depends(get_db)):
+    """Groups of vouchers with the same fingerprint and of receipts with the same content."""
+    require_company_access(db, company_id, user_id)
+    ensure_ledger(db, company_id)
+    return {
+        "vouchers": duplicate_voucher_groups(db, company_id),
+        "receipts": duplicate_receipt_groups(db, company_id),
+    }
+
+
+@app.get("/companies/{company_id}/summary")
+def get_company_summary(company_id: int, user_id: int, period: str | None = None, db: Session = Depends(get_db)):
+    """Dashboard key figures for a year, quarter or month ("2025", "2025-Q1", "2025-03"); defaults to this year."""
+    require_company_access(db, company_id, user_id)
+    bounds = period_bounds(period or str(datetime.utcnow().year))
+    if not bounds:
+        raise HTTPException(status_code=400, detail="Invalid period")
+    state = ensure_ledger(db, company_id)
+    start, end = bounds
+    return company_summary(db, company_id, state.ledger_version if state else None, start, end, datetime.utcnow().date())
+
+
+# ------------------------------------------------------------
+# Report PDFs
+# ------------------------------------------------------------
+def _company_pdf_info(db: Session, company_id: int) -> dict:
+    company = db.query(Company).filter(Company.id == company_id).first()
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    return {"companyName": company.company_name, "organizationNumber": company.organization_number}
+
+
+def _pdf_response(content: bytes, filename: str) -> Response:
+    return Response(
+        content,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/companies/{company_id}/reports/income-statement.pdf")
+def get_income_statement_pdf(company_id: int, user_id: int, start: date, end: date, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    company = _company_pdf_info(db, company_id)
+    ensure_ledger(db, company_id)
+    statement = income_statement(db, company_id, start, end)
+    return _pdf_response(
+        income_statement_pdf(statement, company, start.isoformat(), end.isoformat()),
+        f"income-statement-{start.isoformat()}-{end.isoformat()}.pdf",
+    )
+
+
+@app.get("/companies/{company_id}/reports/balance-sheet.pdf")
+def get_balance_sheet_pdf(company_id: int, user_id: int, as_of: date, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    company = _company_pdf_info(db, company_id)
+    ensure_ledger(db, company_id)
+    sheet = balance_sheet(db, company_id, as_of)
+    return _pdf_response(balance_sheet_pdf(sheet, company, as_of.isoformat()), f"balance-sheet-{as_of.isoformat()}.pdf")
+
+
+# ------------------------------------------------------------
+# Fiscal years
+# ------------------------------------------------------------
+def _fiscal_year_out(fiscal_year: FiscalYear) -> dict:
+    return {
+        "year": fiscal_year.year,
+        "startDate": fiscal_year.start_date.isoformat(),
+        "endDate": fiscal_year.end_date.isoformat(),
+        "closedAt": fiscal_year.closed_at.isoformat() if fiscal_year.closed_at else None,
+        "closedByUserId": fiscal_year.closed_by_user_id,
+    }
+
+
+@app.get("/companies/{company_id}/fiscal-years")
+def list_closed_fiscal_years(company_id: int, user_id: int, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    rows = db.query(FiscalYear).filter(FiscalYear.company_id == company_id).order_by(FiscalYear.year).all()
+    return [_fiscal_year_out(fy) for fy in rows]
+
+
+@app.post("/companies/{company_id}/fiscal-years/{year}/close")
+def close_company_fiscal_year(company_id: int, year: int, payload: FiscalYearAction, db: Session = Depends(get_db)):
+    require_company_admin(db, company_id, payload.user_id)
+    company = db.query(Company).filter(Company.id == company_id).first()
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+
+    _lock_sie_state(db, company_id)
+    fiscal_year = close_fiscal_year(db, company, year, payload.user_id)
+    db.commit()
+    invalidate_opening_cache(company_id)
+    audit_log(company_id, payload.user_id, "fiscal_year.close", f"Closed fiscal year {year}")
+    return {"success": True, **_fiscal_year_out(fiscal_year)}
+
+
+@app.post("/companies/{company_id}/fiscal-years/{year}/reopen")
+def reopen_company_fiscal_year(company_id: int, year: int, payload: FiscalYearAction, db: Session = Depends(get_db)):
+    require_company_admin(db, company_id, payload.user_id)
+    reopen_fiscal_year(db, company_id, year)
+    db.commit()
+    invalidate_opening_cache(company_id)
+    audit_log(company_id, payload.user_id, "fiscal_year.reopen", f"Reopened fiscal year {year}")
+    return {"success": True, "year": year}
+
+
+@app.get("/companies/{company_id}/fiscal-years/{year}/opening-balances")
+def get_opening_balances(company_id: int, year: int, user_id: int, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    rows = (
+        db.query(OpeningBalance)
+        .filter(OpeningBalance.company_id == company_id, OpeningBalance.year == year)
+        .order_by(OpeningBalance.account)
+        .all()
+    )
+    return [{"account": row.account, "amount": row.amount_ore / 100} for row in rows]
+
+
+# ------------------------------------------------------------
+# VAT periods
+# ------------------------------------------------------------
+@app.get("/companies/{company_id}/vat-periods")
+def list_locked_vat_periods(company_id: int, user_id: int, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    locks = db.query(VatPeriodLock).filter(VatPeriodLock.company_id == company_id).order_by(VatPeriodLock.start_date).all()
+    return [
+        {
+            "periodKey": lock.period_key,
+            "startDate": lock.start_date.isoformat(),
+            "endDate": lock.end_date.isoformat(),
+            "lockedAt": lock.locked_at.isoformat() if lock.locked_at else None,
+            "lockedByUserId": lock.locked_by_user_id,
+        }
+        for lock in locks
+    ]
+
+
+@app.post("/companies/{company_id}/vat-periods/{period_key}/lock")
+def lock_company_vat_period(company_id: int, period_key: str, payload: VatPeriodLockCreate, db: Session = Depends(get_db)):
+    require_company_admin(db, company_id, payload.user_id)
+    _lock_sie_state(db, company_id)
+    lock_vat_period(db, company_id, period_key, payload.boxes, payload.user_id)
+    db.commit()
+    audit_log(company_id, payload.user_id, "vat_period.lock", f"Locked VAT period {period_key}")
+    return {"success": True, **vat_period_report(db, company_id, period_key)}
+
+
+@app.post("/companies/{company_id}/vat-periods/{period_key}/unlock")
+def unlock_company_vat_period(company_id: int, period_key: str, payload: VatPeriodUnlock, db: Session = Depends(get_db)):
+    require_company_admin(db, company_id, payload.user_id)
+    unlock_vat_period(db, company_id, period_key)
+    db.commit()
+    audit_log(company_id, payload.user_id, "vat_period.unlock", f"Unlocked VAT period {period_key}")
+    return {"success": True, "periodKey": period_key}
+
+
+@app.get("/companies/{company_id}/vat-periods/{period_key}/report")
+def get_vat_period_report(company_id: int, period_key: str, user_id: int, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    report = vat_period_report(db, company_id, period_key)
+    if not report:
+        raise HTTPException(status_code=404, detail=f"VAT period {period_key} is not locked")
+    return report
+
+
+# ------------------------------------------------------------
+# Invoices
+# ------------------------------------------------------------
+INVOICE_PAGE_MAX = 1000
+
+
+@app.post("/companies/{company_id}/invoice-runs")
+def create_company_invoice_run(company_id: int, payload: InvoiceRunCreate, db: Session = Depends(get_db)):
+    membership = require_company_access(db, company_id, payload.user_id)
+    started = time.perf_counter()
+
+    state = None
+    first_voucher_number = None
+    if payload.template:
+        # vouchers are written into the SIE text, so this is a save like any other
+        _require_edit_lock(
+            db, company_id, membership, units=module_units(db.get(Company, company_id), "billing", "A", [payload.issue_date])
+        )
+        state = _lock_sie_state(db, company_id)
+        first_voucher_number = _next_voucher_number(db, company_id, state)
+
+    run, vouchers = create_invoice_run(db, company_id, payload, first_voucher_number)
+
+    if vouchers:
+        state = _append_vouchers(db, company_id, state, vouchers, payload.user_id)
+
+    db.commit()
+    elapsed = time.perf_counter() - started
+    audit_log(
+        company_id,
+        payload.user_id,
+        "invoice_run.create",
+        f"Created invoices #{run.first_number}-#{run.last_number} ({run.invoice_count} invoices)",
+    )
+    return {
+        "success": True,
+        "runId": run.id,
+        "firstNumber": run.first_number,
+        "lastNumber": run.last_number,
+        "invoiceCount": run.invoice_count,
+        "voucherCount": run.voucher_count,
+        "total": run.total_ore / 100,
+        "sieVersion": state.version if vouchers else None,
+        "elapsedMs": round(elapsed * 1000, 1),
+        "invoicesPerSecond": round(run.invoice_count / elapsed) if elapsed > 0 else None,
+    }
+
+
+@app.get("/companies/{company_id}/invoices")
+def list_company_invoices(
+    company_id: int,
+    user_id: int,
+    run_id: int | None = None,
+    after: int | None = None,
+    limit: int = Query(200, ge=1, le=INVOICE_PAGE_MAX),
+    db: Session = Depends(get_db),
+):
+    require_company_access(db, company_id, user_id)
+    query = db.query(Invoice).filter(Invoice.company_id == company_id)
+    if run_id is not None:
+        query = query.filter(Invoice.run_id == run_id)
+    if after is not None:
+        query = query.filter(Invoice.invoice_number > after)
+    invoices = query.order_by(Invoice.invoice_number).limit(limit + 1).all()
+    has_more = len(invoices) > limit
+    invoices = invoices[:limit]
+    return {
+        "invoices": [invoice_out(invoice) for invoice in invoices],
+        "nextAfter": invoices[-1].invoice_number if has_more else None,
+    }
+
+
+@app.get("/companies/{company_id}/invoices/{invoice_number}")
+def get_company_invoice(company_id: int, invoice_number: int, user_id: int, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    invoice = (
+        db.query(Invoice)
+        .filter(Invoice.company_id == company_id, Invoice.invoice_number == invoice_number)
+        .first()
+    )
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    lines = (
+        db.query(InvoiceLine)
+        .filter(InvoiceLine.company_id == company_id, InvoiceLine.invoice_number == invoice_number)
+        .order_by(InvoiceLine.line_no)
+        .all()
+    )
+    return invoice_out(invoice, lines)
+
+
+@app.get("/companies/{company_id}/invoices/{invoice_number}/pdf")
+def get_company_invoice_pdf(company_id: int, invoice_number: int, user_id: int, db: Session = Depends(get_db)):
+    invoice = get_company_invoice(company_id, invoice_number, user_id, db)
+    return _pdf_response(invoice_pdf(invoice, _company_pdf_info(db, company_id)), invoice_filename(invoice))
+
+
+INVOICE_PDF_BATCH_MAX = 20_000
+
+
+@app.get("/companies/{company_id}/invoice-pdfs")
+def get_company_invoice_pdfs(
+    company_id: int,
+    user_id: int,
+    run_id: int | None = None,
+    from_number: int | None = None,
+    to_number: int | None = None,
+    db: Session = Depends(get_db),
+):
+    """Zip with one PDF per invoice of a run or number range, streamed while it is rendered."""
+    require_company_access(db, company_id, user_id)
+    if run_id is None and from_number is None and to_number is None:
+        raise HTTPException(status_code=400, detail="Give run_id or from_number/to_number")
+    company = _company_pdf_info(db, company_id)
+
+    def scoped(query, model):
+        query = query.filter(model.company_id == company_id)
+        if from_number is not None:
+            query = query.filter(model.invoice_number >= from_number)
+        if to_number is not None:
+            query = query.filter(model.invoice_number <= to_number)
+        return query
+
+    invoice_query = scoped(db.query(Invoice), Invoice)
+    line_query = scoped(db.query(InvoiceLine), InvoiceLine)
+    if run_id is not None:
+        invoice_query = invoice_query.filter(Invoice.run_id == run_id)
+        line_query = line_query.join(
+            Invoice,
+            (Invoice.company_id == InvoiceLine.company_id) & (Invoice.invoice_number == InvoiceLine.invoice_number),
+        ).filter(Invoice.run_id == run_id)
+
+    invoices = invoice_query.order_by(Invoice.invoice_number).limit(INVOICE_PDF_BATCH_MAX + 1).all()
+    if not invoices:
+        raise HTTPException(status_code=404, detail="No invoices found")
+    if len(invoices) > INVOICE_PDF_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {INVOICE_PDF_BATCH_MAX} invoices per batch")
+
+    lines_by_number: dict[int, list] = {}
+    for line in line_query.order_by(InvoiceLine.invoice_number, InvoiceLine.line_no):
+        lines_by_number.setdefault(line.invoice_number, []).append(line)
+    # plain dicts, so the render workers get picklable data and no session
+    documents = [invoice_out(invoice, lines_by_number.get(invoice.invoice_number, [])) for invoice in invoices]
+
+    name = f"invoices-run-{run_id}.zip" if run_id is not None else f"invoices-{documents[0]['invoiceNumber']}-{documents[-1]['invoiceNumber']}.zip"
+    return StreamingResponse(
+        iter_invoice_zip(documents, company),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+
+# ------------------------------------------------------------
+# Payroll
+# ------------------------------------------------------------
+PAYROLL_PAGE_MAX = 500
+
+
+@app.post("/companies/{company_id}/payroll-runs")
+def create_company_payroll_run(company_id: int, payload: PayrollRunCreate, db: Session = Depends(get_db)):
+    membership = require_company_access(db, company_id, payload.user_id)
+    started = time.perf_counter()
+
+    state = None
+    voucher_number = None
+    if payload.book_voucher:
+        # the salary voucher is written into the SIE text, so this is a save like any other
+        _require_edit_lock(
+            db, company_id, membership, units=module_units(db.get(Company, company_id), "payroll", "A", [payload.pay_date])
+        )
+        state = _lock_sie_state(db, company_id)
+        voucher_number = _next_voucher_number(db, company_id, state)
+
+    run, vouchers = create_payroll_run(db, company_id, payload, voucher_number)
+    if vouchers:
+        state = _append_vouchers(db, company_id, state, vouchers, payload.user_id)
+
+    db.commit()
+    elapsed = time.perf_counter() - started
+    audit_log(
+        company_id,
+        payload.user_id,
+        "payroll_run.create",
+        f"Payroll {run.period} for {run.employee_count} employees"
+        + (f", voucher A{run.voucher_number}" if run.voucher_number else ""),
+    )
+    return {
+        "success": True,
+        **payroll_run_out(run),
+        "sieVersion": state.version if vouchers else None,
+        "elapsedMs": round(elapsed * 1000, 1),
+    }
+
+
+@app.get("/companies/{company_id}/payroll-runs")
+def list_company_payroll_runs(
+    company_id: int,
+    user_id: int,
+    period: str | None = None,
+    after: int | None = None,
+    limit: int = Query(100, ge=1, le=PAYROLL_PAGE_MAX),
+    db: Session = Depends(get_db),
+):
+    require_company_access(db, company_id, user_id)
+    query = db.query(PayrollRun).filter(PayrollRun.company_id == company_id)
+    if period is not None:
+        query = query.filter(PayrollRun.period == period)
+    if after is not None:
+        query = query.filter(PayrollRun.id > after)
+    runs = query.order_by(PayrollRun.id).limit(limit + 1).all()
+    has_more = len(runs) > limit
+    runs = runs[:limit]
+    return {
+        "runs": [payroll_run_out(run) for run in runs],
+        "nextAfter": runs[-1].id if has_more else None,
+    }
+
+
+@app.get("/companies/{company_id}/payroll-runs/{run_id}")
+def get_company_payroll_run(company_id: int, run_id: int, user_id: int, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    run = db.query(PayrollRun).filter(PayrollRun.company_id == company_id, PayrollRun.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Payroll run not found")
+    lines = db.query(PayrollLine).filter(PayrollLine.run_id == run.id).order_by(PayrollLine.id).all()
+    return {**payroll_run_out(run), "lines": [payroll_line_out(line) for line in lines]}
+
+
+@app.get("/companies/{company_id}/payroll/agi")
+def get_company_agi_summary(company_id: int, user_id: int, period: str, db: Session = Depends(get_db)):
+    """Employer declaration figures for a month, over all payroll runs of the period."""
+    require_company_access(db, company_id, user_id)
+    lines = (
+        db.query(PayrollLine)
+        .join(PayrollRun, PayrollRun.id == PayrollLine.run_id)
+        .filter(PayrollRun.company_id == company_id, PayrollRun.period == period)
+        .order_by(PayrollLine.id)
+        .all()
+    )
+    if not lines:
+        raise HTTPException(status_code=404, detail="No payroll runs for the period")
+    return agi_summary(period, lines)
+
+
+# ------------------------------------------------------------
+# Bank reconciliation
+# ------------------------------------------------------------
+BANK_PAGE_MAX = 1000
+BANK_STATUSES = ("unmatched", "suggested", "matched")
+
+
+def _import_bank_statement(upload, company_id: int, user_id: int, account: str):
+    db = SessionLocal()
+    try:
+        ensure_ledger(db, company_id)
+        result = import_statement(db, company_id, upload, account, user_id)
         db.commit()
-        db.refresh(state)
-        return {"id": state.id, "companyId": state.company_id, "version": state.version}
+    finally:
+        db.close()
+        upload.discard()
+    if not result["duplicate"]:
+        audit_log(company_id, user_id, "bank.import", f"Imported bank statement with {result['imported']} rows")
+    return result
 
-    state.sie_content = payload.sie_content
-    state.version = (state.version or 1) + 1
-    state.updated_by_user_id = payload.user_id
+
+@app.post("/companies/{company_id}/bank-statements/upload")
+async def upload_bank_statement(
+    company_id: int,
+    request: Request,
+    user_id: int,
+    account: str = DEFAULT_BANK_ACCOUNT,
+    filename: str | None = None,
+):
+    """CSV export or camt.054 file as the raw body or multipart/form-data; matching runs right after the import."""
+    await run_in_threadpool(_check_company_access, company_id, user_id)
+    upload = await receive_upload(request, BANK_UPLOAD_DIR, filename=filename)
+    return await run_in_threadpool(_import_bank_statement, upload, company_id, user_id, account)
+
+
+@app.get("/companies/{company_id}/bank-statements")
+def list_bank_statements(company_id: int, user_id: int, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, user_id)
+    statements = (
+        db.query(BankStatement)
+        .filter(BankStatement.company_id == company_id)
+        .order_by(BankStatement.id.desc())
+        .all()
+    )
+    return [
+        {
+            "id": s.id,
+            "filename": s.filename,
+            "format": s.format,
+            "account": s.account,
+            "rowCount": s.row_count,
+            "createdAt": s.created_at.isoformat() if s.created_at else None,
+            "createdByUserId": s.created_by_user_id,
+        }
+        for s in statements
+    ]
+
+
+@app.get("/companies/{company_id}/bank-transactions")
+def list_bank_transactions(
+    company_id: int,
+    user_id: int,
+    status: str | None = None,
+    statement_id: int | None = None,
+    after: int | None = None,
+    limit: int = Query(200, ge=1, le=BANK_PAGE_MAX),
+    db: Session = Depends(get_db),
+):
+    require_company_access(db, company_id, user_id)
+    if status is not None and status not in BANK_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(BANK_STATUSES)}")
+    query = db.query(BankTransaction).filter(BankTransaction.company_id == company_id)
+    if status is not None:
+        query = query.filter(BankTransaction.match_status == status)
+    if statement_id is not None:
+        query = query.filter(BankTransaction.statement_id == statement_id)
+    if after is not None:
+        query = query.filter(BankTransaction.id > after)
+    transactions = query.order_by(BankTransaction.id).limit(limit + 1).all()
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+    return {
+        "transactions": transactions_out(db, company_id, transactions),
+        "nextAfter": transactions[-1].id if has_more else None,
+    }
+
+
+def _bank_transaction(db: Session, company_id: int, transaction_id: int) -> tuple[BankTransaction, str]:
+    row = (
+        db.query(BankTransaction, BankStatement.account)
+        .join(BankStatement, BankStatement.id == BankTransaction.statement_id)
+        .filter(BankTransaction.company_id == company_id, BankTransaction.id == transaction_id)
+        .with_for_update(of=BankTransaction)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Bank transaction not found")
+    return row
+
+
+@app.post("/companies/{company_id}/bank-transactions/{transaction_id}/match")
+def match_bank_transaction(company_id: int, transaction_id: int, payload: BankMatchRequest, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, payload.user_id)
+    if payload.series is not None and (payload.voucher_number is None or payload.line_no is None):
+        raise HTTPException(status_code=400, detail="series, voucher_number and line_no go together")
+    ensure_ledger(db, company_id)
+    transaction, account = _bank_transaction(db, company_id, transaction_id)
+    confirm_match(db, company_id, transaction, account, payload.series, payload.voucher_number, payload.line_no)
     db.commit()
-    db.refresh(state)
-    return {"id": state.id, "companyId": state.company_id, "version": state.version}
+    return transactions_out(db, company_id, [transaction])[0]
+
+
+@app.post("/companies/{company_id}/bank-transactions/{transaction_id}/unmatch")
+def unmatch_bank_transaction(company_id: int, transaction_id: int, payload: BankUnmatchRequest, db: Session = Depends(get_db)):
+    require_company_access(db, company_id, payload.user_id)
+    transaction, _ = _bank_transaction(db, company_id, transaction_id)
+    unmatch(transaction)
+    db.commit()
+    return transactions_out(db, company_id, [transaction])[0]
+
+
+@app.post("/companies/{company_id}/bank-reconciliation/run")
+def run_bank_reconciliation(company_id: int, payload: BankReconcileRequest, db: Session = Depends(get_db)):
+    """Recompute suggestions, e.g. after vouchers were added; confirmed matches are kept."""
+    require_company_access(db, company_id, payload.user_id)
+    ensure_ledger(db, company_id)
+    window = MATCH_WINDOW_DAYS if payload.window_days is None else max(0, payload.window_days)
+    result = reconcile(db, company_id, payload.account, window)
+    db.commit()
+    return result
+
+
+@app.get("/companies/{company_id}/bank-reconciliation/unmatched-lines")
+def list_unmatched_ledger_lines(
+    company_id: int,
+    user_id: int,
+    account: str = DEFAULT_BANK_ACCOUNT,
+    offset: int = 0,
+    limit: int = Query(200, ge=1, le=BANK_PAGE_MAX),
+    db: Session = Depends(get_db),
+):
+    require_company_access(db, company_id, user_id)
+    ensure_ledger(db, company_id)
+    return unmatched_ledger_lines(db, company_id, account, max(0, offset), limit)
+
+
+# ------------------------------------------------------------
+# Audit trail
+# ------------------------------------------------------------
+AUDIT_PAGE_MAX = 200
+
+
+@app.post("/companies/{company_id}/audit")
+def add_audit_entry(company_id: int, payload: AuditEntryCreate, db: Session = Depends(get_db)):
+    # client-side actions (vouchers, invoices, ...) that the API does not see itself
+    require_company_access(db, company_id, payload.user_id)
+    description = payload.description.strip()
+    if not description:
+        raise HTTPException(status_code=400, detail="description is required")
+    audit_log(company_id, payload.user_id, "client", description[:1000])
+    return {"success": True}
+
+
+@app.get("/companies/{company_id}/audit")
+def list_audit_entries(
+    company_id: int,
+    user_id: int,
+    limit: int = 50,
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+):
+    require_company_access(db, company_id, user_id)
+    limit = max(1, min(limit, AUDIT_PAGE_MAX))
+
+    # make entries queued by this process visible (read-your-writes)
+    flush_audit_log()
+
+    query = (
+        db.query(AuditLogEntry, User.name, User.email)
+        .outerjoin(User, User.id == AuditLogEntry.user_id)
+        .filter(AuditLogEntry.company_id == company_id)
+    )
+    if cursor:
+        # keyset: strictly older than the last row of the previous page
+        try:
+            created_raw, entry_id = cursor.rsplit("_", 1)
+            before = (datetime.fromisoformat(created_raw), int(entry_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(AuditLogEntry.created_at, AuditLogEntry.id) < before)
+
+    rows = query.order_by(AuditLogEntry.created_at.desc(), AuditLogEntry.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    entries = [
+        {
+            "id": str(entry.id),
+            "timestamp": entry.created_at.isoformat(),
+            "userId": str(entry.user_id) if entry.user_id is not None else None,
+            "userName": name or email,
+            "companyId": str(entry.company_id),
+            "action": entry.action,
+            "description": entry.description,
+        }
+        for entry, name, email in rows
+    ]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1][0]
+        next_cursor = f"{last.created_at.isoformat()}_{last.id}"
+    return {"entries": entries, "nextCursor": next_cursor}
 
 
 # ------------------------------------------------------------
@@ -891,7 +2541,7 @@ def list_products(user_id: int, db: Session = Depends(get_db)):
             "company_id": p.company_id,
             "name": p.name,
             "description": p.description,
-            "price": p.price,
+            "price": p.price_ore / 100,
             "includesVat": p.includes_vat,
             "vatRate": p.vat_rate,
             "unit": p.unit,
@@ -907,7 +2557,7 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
         company_id=payload.company_id,
         name=payload.name,
         description=payload.description,
-        price=payload.price,
+        price_ore=to_ore(payload.price),
         includes_vat=payload.includes_vat,
         vat_rate=payload.vat_rate,
         unit=payload.unit,
@@ -925,7 +2575,7 @@ def update_product(product_id: int, payload: ProductUpdate, db: Session = Depend
         raise HTTPException(status_code=404, detail="Product not found")
     product.name = payload.name
     product.description = payload.description
-    product.price = payload.price
+    product.price_ore = to_ore(payload.price)
     product.includes_vat = payload.includes_vat
     product.vat_rate = payload.vat_rate
     product.unit = payload.unit
@@ -943,6 +2593,54 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
     return {"success": True}
 
 
+# ------------------------------------------------------------
+# Bulk import (customers + products)
+# ------------------------------------------------------------
+# Uploads are spooled to disk while streaming so a large register never
+# sits in memory; rows are then validated and loaded batch by batch.
+SPOOL_MAX_MEMORY_BYTES = 1024 * 1024
+
+
+async def _spool_request_body(request: Request):
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def _run_bulk_import(spool, target: str, fmt: str, user_id: int, company_id: int | None):
+    db = SessionLocal()
+    try:
+        if company_id is not None:
+            require_company_access(db, company_id, user_id)
+        text_stream = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+        try:
+            return run_import(db, target, text_stream, fmt, user_id, company_id)
+        except UnicodeDecodeError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    finally:
+        db.close()
+        spool.close()
+
+
+async def _bulk_import(request: Request, target: str, user_id: int, company_id: int | None):
+    fmt = detect_format(request.headers.get("content-type"))
+    spool = await _spool_request_body(request)
+    return await run_in_threadpool(_run_bulk_import, spool, target, fmt, user_id, company_id)
+
+
+@app.post("/customers/bulk-import")
+async def bulk_import_customers(request: Request, user_id: int, company_id: int | None = None):
+    return await _bulk_import(request, "customers", user_id, company_id)
+
+
+@app.post("/products/bulk-import")
+async def bulk_import_products(request: Request, user_id: int, company_id: int | None = None):
+    return await _bulk_import(request, "products", user_id, company_id)
+
+
 # ------------------------------------------------------------
 # Step 2 endpoints: join + members
 # ------------------------------------------------------------
@@ -967,6 +2665,7 @@ def join_company_by_orgnr(payload: JoinCompanyByOrgNumber, db: Session = Depends
     membership = CompanyMember(company_id=company.id, user_id=payload.user_id, role="MEMBER", status="ACTIVE")
     db.add(membership)
     db.commit()
+    audit_log(company.id, payload.user_id, "member.join", "Joined company by organization number")
     return {"success": True, "companyId": company.id, "alreadyMember": False}
 
 
@@ -1080,6 +2779,7 @@ def create_company(payload: CompanyCreate, db: Session = Depends(get_db)):
     membership = CompanyMember(company_id=company.id, user_id=payload.user_id, role="OWNER", status="ACTIVE")
     db.add(membership)
     db.commit()
+    audit_log(company.id, payload.user_id, "company.create", f"Created company {company.company_name}")
 
     return {"id": company.id}
     
@@ -1250,6 +2950,7 @@ def decide_company_join_request(request_id: int, payload: CompanyJoinRequestDeci
         req.decided_at = now
         req.decided_by_user_id = payload.user_id
         db.commit()
+        audit_log(req.company_id, payload.user_id, "member.approve", f"Approved join request from user {req.requester_user_id}")
 
         return {
             'success': True,
@@ -1263,6 +2964,7 @@ def decide_company_join_request(request_id: int, payload: CompanyJoinRequestDeci
     req.decided_at = now
     req.decided_by_user_id = payload.user_id
     db.commit()
+    audit_log(req.company_id, payload.user_id, "member.reject", f"Rejected join request from user {req.requester_user_id}")
 
     return {
         'success': True,
@@ -1302,6 +3004,41 @@ def list_companies_for_user(user_id: int, db: Session = Depends(get_db)):
     ]
 
 
+@app.get("/companies/for-user/reports")
+def stream_company_reports(user_id: int, report: str, period: str | None = None, db: Session = Depends(get_db)):
+    """
+    One report for every active company of the user, as NDJSON: one line per
+    company in the order they finish. `report` is vat_due (with the period's
+    lock status), result (to date) or unbalanced.
+    """
+    # the figures of every company the user is in: the caller must be that user
+    require_session_user(user_id)
+    if report not in REPORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown report, expected one of {', '.join(REPORTS)}")
+    today = datetime.utcnow().date()
+    period = period or str(today.year)
+    bounds = period_bounds(period)
+    if not bounds:
+        raise HTTPException(status_code=400, detail="Invalid period")
+
+    companies = [
+        {"id": c.id, "companyName": c.company_name, "organizationNumber": c.organization_number}
+        for c in (
+            db.query(Company)
+            .join(CompanyMember, CompanyMember.company_id == Company.id)
+            .filter(CompanyMember.user_id == user_id, CompanyMember.status == 'ACTIVE')
+            .order_by(Company.id)
+            .all()
+        )
+    ]
+
+    def body():
+        for row in iter_company_reports(companies, report, period, *bounds, today):
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers={"X-Company-Count": str(len(companies))})
+
+
 @app.put("/companies/{company_id}")
 def update_company(company_id: int, payload: CompanyUpdate, user_id: int, db: Session = Depends(get_db)):
     require_company_admin(db, company_id, user_id)
@@ -1336,6 +3073,21 @@ def delete_company(company_id: int, user_id: int, db: Session = Depends(get_db))
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
 
+    # ON DELETE CASCADE would drop receipts and SIE files without their blob references
+    refs: dict[str, int] = {}
+    for model, column in ((Receipt, Receipt.blob_sha256), (SIEFile, SIEFile.sha256)):
+        rows = (
+            db.query(column, func.count())
+            .filter(model.company_id == company_id, column.isnot(None))
+            .group_by(column)
+        )
+        for sha256, count in rows:
+            refs[sha256] = refs.get(sha256, 0) + count
+    # row locks in hash order, so two such deletes cannot deadlock
+    for sha256 in sorted(refs):
+        release_blob(db, sha256, refs[sha256])
+    db.query(Receipt).filter(Receipt.company_id == company_id).delete()
+    db.query(SIEFile).filter(SIEFile.company_id == company_id).delete()
     db.query(CompanySIEState).filter(CompanySIEState.company_id == company_id).delete()
     db.query(CompanyMember).filter(CompanyMember.company_id == company_id).delete()
     db.delete(company)
@@ -1374,6 +3126,7 @@ def approve_join_request(company_id: int, member_user_id: int, payload: dict, db
 
     membership.status = 'ACTIVE'
     db.commit()
+    audit_log(company_id, admin_user_id, 'member.approve', f'Approved membership for user {member_user_id}')
     return {'success': True}
 
 
@@ -1391,4 +3144,5 @@ def remove_member(company_id: int, member_user_id: int, user_id: int, db: Sessio
 
     db.delete(membership)
     db.commit()
-    return {'success': True}
\ No newline at end of file
+    audit_log(company_id, user_id, 'member.remove', f'Removed user {member_user_id} from company')
+    return {'success': True}
@@ -3,12 +3,16 @@ import enum
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
     String,
+    Date,
     DateTime,
     ForeignKey,
+    ForeignKeyConstraint,
     Text,
     Float,
     Boolean,
+    LargeBinary,
     UniqueConstraint,
     Index,
 )
@@ -67,7 +71,7 @@ class Company(Base):
     members = relationship("CompanyMember", back_populates="company")
 
     # optional: one lock per company
-    lock = relationship("CompanyLock", back_populates="company", uselist=False)
+    locks = relationship("CompanyLock", back_populates="company")
 
 
 # Roles and status are stored as strings for now (simple + easy).
@@ -97,25 +101,26 @@ class CompanyMember(Base):
 
 class CompanyLock(Base):
     """
-    One lock per company:
-    - Only one user can have the company open at a time (for conflict prevention).
+    One lock per company and scope (see edit_scopes):
+    - Only one user can hold a scope at a time (for conflict prevention);
+      the "company" scope conflicts with every other scope.
     - Lock has an expiry (TTL) so it releases automatically if user closes browser.
     """
     __tablename__ = "company_locks"
     __table_args__ = (
-        Index("ix_company_locks_company_id", "company_id", unique=True),
         Index("ix_company_locks_locked_by_user_id", "locked_by_user_id"),
         Index("ix_company_locks_expires_at", "expires_at"),
     )
 
-    # company_id is also the primary key -> exactly one lock row per company
+    # (company_id, scope) is the primary key -> exactly one lock row per scope
     company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    scope = Column(String(32), primary_key=True, default="company", server_default="company")
     locked_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     locked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     expires_at = Column(DateTime, nullable=False)
 
-    company = relationship("Company", back_populates="lock")
+    company = relationship("Company", back_populates="locks")
     locked_by_user = relationship("User", back_populates="locks")
     
     
@@ -185,12 +190,23 @@ class CompanyLockTakeoverRequest(Base):
 
 class SIEFile(Base):
     __tablename__ = "sie_files"
+    __table_args__ = (
+        Index("ix_sie_files_sha256", "sha256"),
+        Index("ix_sie_files_company_id", "company_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=True)
     filename = Column(String(255), nullable=False)
     storage_path = Column(String(512), nullable=False)
     period = Column(String(50), nullable=True)
+
+    # set for files uploaded through /sie-files/upload (used for dedup and as Blob key)
+    sha256 = Column(String(64), nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+    encoding = Column(String(20), nullable=True)
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="sie_files")
@@ -198,17 +214,42 @@ class SIEFile(Base):
 
 class Receipt(Base):
     __tablename__ = "receipts"
+    __table_args__ = (
+        Index("ix_receipts_blob_sha256", "blob_sha256"),
+        Index("ix_receipts_company_id", "company_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=True)
     filename = Column(String(255), nullable=False)
     storage_path = Column(String(512), nullable=False)
     note = Column(Text, nullable=True)
+
+    # set for files uploaded through /receipts/upload (see Blob)
+    blob_sha256 = Column(String(64), nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+    content_type = Column(String(255), nullable=True)
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="receipts")
 
 
+class Blob(Base):
+    """
+    One stored file in the content-addressed blob store (blob_store.py).
+    ref_count = number of receipts / SIE files pointing at it.
+    """
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    content_type = Column(String(255), nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Customer(Base):
     __tablename__ = "customers"
 
@@ -235,7 +276,7 @@ class Product(Base):
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=True)
     name = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
-    price = Column(Float, nullable=False)
+    price_ore = Column(BigInteger, nullable=False)
     includes_vat = Column(Boolean, nullable=False, default=False)
     vat_rate = Column(Float, nullable=False, default=25)
     unit = Column(String(20), nullable=True)
@@ -259,8 +300,51 @@ class CompanySIEState(Base):
     # optimistic version number (will be used later for conflict prevention)
     version = Column(Integer, nullable=False, default=1)
 
+    # version that the ledger_* tables were last rebuilt from (see ledger.py)
+    ledger_version = Column(Integer, nullable=True)
+
     updated_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CompanySIEVersion(Base):
+    """
+    Append-only history of CompanySIEState (see sie_history.py).
+    kind="snapshot": payload is the full SIE text; kind="delta": payload is a
+    line diff against version - 1. Both are zlib-compressed.
+    """
+    __tablename__ = "company_sie_versions"
+    __table_args__ = (
+        UniqueConstraint("company_id", "version", name="uq_company_sie_versions_company_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)
+    kind = Column(String(10), nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    # uncompressed length of the full SIE text at this version
+    content_length = Column(Integer, nullable=False)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AuditLogEntry(Base):
+    """
+    Append-only audit trail per company (written in batches by audit.py).
+    Paged newest first by keyset over (company_id, created_at, id).
+    """
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_company_created", "company_id", "created_at", "id"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    action = Column(String(50), nullable=False)
+    description = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     
     
 class CompanyJoinRequestStatus(str, enum.Enum):
@@ -295,4 +379,339 @@ class CompanyJoinRequest(Base):
         Index('ix_joinreq_company', 'company_id'),
         Index('ix_joinreq_requester', 'requester_user_id'),
         Index('ix_joinreq_status', 'status'),
-    )
\ No newline at end of file
+    )
+
+
+# ------------------------------------------------------------
+# Ledger: relational copy of CompanySIEState.sie_content
+# ------------------------------------------------------------
+# Rebuilt by ledger.sync_ledger() whenever the SIE state changes, so server
+# side reports and exports can query vouchers without parsing SIE text.
+# Amounts are integer öre (1 SEK = 100 öre), debit positive / credit negative.
+class LedgerAccount(Base):
+    __tablename__ = "ledger_accounts"
+    __table_args__ = (
+        UniqueConstraint("company_id", "number", name="uq_ledger_accounts_company_number"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    number = Column(String(20), nullable=False)
+    name = Column(String(255), nullable=False)
+
+
+class LedgerVoucher(Base):
+    __tablename__ = "ledger_vouchers"
+    __table_args__ = (
+        UniqueConstraint("company_id", "seq", name="uq_ledger_vouchers_company_seq"),
+        Index("ix_ledger_vouchers_company_date", "company_id", "date"),
+        Index("ix_ledger_vouchers_company_fingerprint", "company_id", "fingerprint"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    # position of the voucher in the SIE content (stable key for its lines)
+    seq = Column(Integer, nullable=False)
+    series = Column(String(20), nullable=False)
+    number = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False)
+    description = Column(Text, nullable=True)
+    # ledger.voucher_fingerprint(): date + net amount per account, for duplicate detection
+    fingerprint = Column(String(64), nullable=True)
+    # Postgres also has a generated tsvector column search_vector (GIN
+    # indexed, migration 0021) over the description, used by voucher search;
+    # it is left out of the model so other databases work without it.
+
+
+class LedgerLine(Base):
+    __tablename__ = "ledger_lines"
+    __table_args__ = (
+        Index("ix_ledger_lines_company_voucher", "company_id", "voucher_seq"),
+        # account statements: range scan in statement order, no sort needed
+        Index("ix_ledger_lines_company_account_date", "company_id", "account", "date", "voucher_seq", "line_no"),
+        # voucher search by amount (debit or credit)
+        Index("ix_ledger_lines_company_amount", "company_id", "amount_ore"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    voucher_seq = Column(Integer, nullable=False)
+    line_no = Column(Integer, nullable=False)
+    account = Column(String(20), nullable=False)
+    # copied from the voucher so per-account queries need no join
+    date = Column(Date, nullable=False)
+    amount_ore = Column(BigInteger, nullable=False)
+
+
+class LedgerMonthlyTotal(Base):
+    """Debit/credit per account and month (öre), rebuilt with the ledger for dashboard summaries."""
+    __tablename__ = "ledger_monthly_totals"
+    __table_args__ = (
+        UniqueConstraint("company_id", "month", "account", name="uq_ledger_monthly_totals_company_month_account"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    # first day of the month
+    month = Column(Date, nullable=False)
+    account = Column(String(20), nullable=False)
+    debit_ore = Column(BigInteger, nullable=False)
+    credit_ore = Column(BigInteger, nullable=False)
+
+
+class FiscalYear(Base):
+    """
+    A closed fiscal year (a row exists only once the year is closed).
+    `year` is the calendar year the fiscal year starts in; `digest` fingerprints
+    its vouchers so later SIE saves cannot change them.
+    """
+    __tablename__ = "fiscal_years"
+    __table_args__ = (
+        UniqueConstraint("company_id", "year", name="uq_fiscal_years_company_year"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    year = Column(Integer, nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    digest = Column(String(64), nullable=False)
+    closed_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    closed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class OpeningBalance(Base):
+    """#IB of a fiscal year, stored when the previous year is closed (öre)."""
+    __tablename__ = "opening_balances"
+    __table_args__ = (
+        UniqueConstraint("company_id", "year", "account", name="uq_opening_balances_company_year_account"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    year = Column(Integer, nullable=False)
+    # first day of `year`; balances are as of the start of this date
+    start_date = Column(Date, nullable=False)
+    account = Column(String(20), nullable=False)
+    amount_ore = Column(BigInteger, nullable=False)
+
+
+class VatPeriodLock(Base):
+    """
+    A locked VAT reporting period ("2025", "2025-Q1" or "2025-03"). Like a
+    closed fiscal year, `digest` fingerprints the period's vouchers.
+    """
+    __tablename__ = "vat_period_locks"
+    __table_args__ = (
+        UniqueConstraint("company_id", "period_key", name="uq_vat_period_locks_company_period"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    period_key = Column(String(10), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    digest = Column(String(64), nullable=False)
+    locked_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    locked_at = Column(DateTime, default=datetime.utcnow)
+
+
+class VatPeriodBox(Base):
+    """VAT report box total (öre) as it was when the period was locked."""
+    __tablename__ = "vat_period_boxes"
+    __table_args__ = (
+        UniqueConstraint("lock_id", "box", name="uq_vat_period_boxes_lock_box"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    lock_id = Column(Integer, ForeignKey("vat_period_locks.id", ondelete="CASCADE"), nullable=False)
+    box = Column(String(4), nullable=False)
+    amount_ore = Column(BigInteger, nullable=False)
+
+
+class InvoiceNumberSequence(Base):
+    """
+    Next invoice number per company. Taken with SELECT ... FOR UPDATE in the
+    same transaction as the invoices, so a rolled back run leaves no gap.
+    """
+    __tablename__ = "invoice_number_sequences"
+
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    next_number = Column(Integer, nullable=False, default=1)
+
+
+class InvoiceRun(Base):
+    __tablename__ = "invoice_runs"
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False, index=True)
+    first_number = Column(Integer, nullable=False)
+    last_number = Column(Integer, nullable=False)
+    invoice_count = Column(Integer, nullable=False)
+    voucher_count = Column(Integer, nullable=False, default=0)
+    total_ore = Column(BigInteger, nullable=False, default=0)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Invoice(Base):
+    """Server-side invoice (amounts in öre), numbered per company without gaps."""
+    __tablename__ = "invoices"
+    __table_args__ = (
+        UniqueConstraint("company_id", "invoice_number", name="uq_invoices_company_number"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    invoice_number = Column(Integer, nullable=False)
+    run_id = Column(Integer, ForeignKey("invoice_runs.id", ondelete="SET NULL"), nullable=True, index=True)
+    document_type = Column(String(20), nullable=False, default="invoice")
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="SET NULL"), nullable=True)
+    customer_name = Column(String(255), nullable=False)
+    customer_address = Column(String(255), nullable=False, default="")
+    issue_date = Column(Date, nullable=False)
+    due_date = Column(Date, nullable=False)
+    subtotal_ore = Column(BigInteger, nullable=False)
+    total_vat_ore = Column(BigInteger, nullable=False)
+    total_ore = Column(BigInteger, nullable=False)
+    status = Column(String(20), nullable=False, default="sent")
+    paid_date = Column(Date, nullable=True)
+    # voucher (series A) booked for the invoice, if any
+    voucher_number = Column(Integer, nullable=True)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class InvoiceLine(Base):
+    """
+    Invoice row, keyed by (company_id, invoice_number) rather than the
+    invoice id so a run can COPY invoices and lines without reading ids back.
+    """
+    __tablename__ = "invoice_lines"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["company_id", "invoice_number"],
+            ["invoices.company_id", "invoices.invoice_number"],
+            ondelete="CASCADE",
+        ),
+        UniqueConstraint("company_id", "invoice_number", "line_no", name="uq_invoice_lines_invoice_line"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, nullable=False)
+    invoice_number = Column(Integer, nullable=False)
+    line_no = Column(Integer, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True)
+    product_name = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    quantity = Column(Float, nullable=False)
+    unit_price_ore = Column(BigInteger, nullable=False)
+    vat_rate = Column(Float, nullable=False)
+    total_excl_vat_ore = Column(BigInteger, nullable=False)
+    vat_ore = Column(BigInteger, nullable=False)
+    total_incl_vat_ore = Column(BigInteger, nullable=False)
+
+
+class BankStatement(Base):
+    """One imported bank statement file (CSV or camt.054), reconciled against `account`."""
+    __tablename__ = "bank_statements"
+    __table_args__ = (
+        UniqueConstraint("company_id", "sha256", name="uq_bank_statements_company_sha256"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    filename = Column(String(255), nullable=True)
+    format = Column(String(20), nullable=False)
+    account = Column(String(20), nullable=False, default="1930")
+    sha256 = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False, default=0)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BankTransaction(Base):
+    """
+    A bank statement row and its match. The matched ledger line is kept as
+    (series, number, line_no) rather than the ledger row id, which changes
+    on every ledger rebuild. match_status: unmatched / suggested / matched.
+    """
+    __tablename__ = "bank_transactions"
+    __table_args__ = (
+        Index("ix_bank_transactions_company_status", "company_id", "match_status", "id"),
+        Index("ix_bank_transactions_statement", "statement_id"),
+        Index("ix_bank_transactions_voucher", "company_id", "voucher_series", "voucher_number", "voucher_line_no"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    statement_id = Column(Integer, ForeignKey("bank_statements.id", ondelete="CASCADE"), nullable=False)
+    row_no = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False)
+    amount_ore = Column(BigInteger, nullable=False)
+    text = Column(String(255), nullable=True)
+    reference = Column(String(255), nullable=True)
+    match_status = Column(String(20), nullable=False, default="unmatched")
+    voucher_series = Column(String(20), nullable=True)
+    voucher_number = Column(Integer, nullable=True)
+    voucher_line_no = Column(Integer, nullable=True)
+    # days between the bank date and the voucher date of a suggestion
+    match_day_diff = Column(Integer, nullable=True)
+
+
+class PayrollRun(Base):
+    """One salary payment for a period; totals in öre, the voucher when one was booked."""
+    __tablename__ = "payroll_runs"
+    __table_args__ = (
+        Index("ix_payroll_runs_company_period", "company_id", "period"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    period = Column(String(7), nullable=False)  # YYYY-MM
+    pay_date = Column(Date, nullable=False)
+    employee_count = Column(Integer, nullable=False)
+    gross_ore = Column(BigInteger, nullable=False, default=0)
+    tax_ore = Column(BigInteger, nullable=False, default=0)
+    net_ore = Column(BigInteger, nullable=False, default=0)
+    contributions_ore = Column(BigInteger, nullable=False, default=0)
+    vacation_ore = Column(BigInteger, nullable=False, default=0)
+    vacation_contributions_ore = Column(BigInteger, nullable=False, default=0)
+    voucher_series = Column(String(20), nullable=True)
+    voucher_number = Column(Integer, nullable=True)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PayrollLine(Base):
+    """One employee of a payroll run. Employees live in the browser, so name and personal number are copied here."""
+    __tablename__ = "payroll_lines"
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey("payroll_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    employee_id = Column(String(64), nullable=False)
+    name = Column(String(255), nullable=False)
+    personal_number = Column(String(20), nullable=False)
+    tax_table = Column(Integer, nullable=True)
+    tax_column = Column(Integer, nullable=True)
+    tax_percent = Column(Float, nullable=True)
+    gross_ore = Column(BigInteger, nullable=False)
+    tax_ore = Column(BigInteger, nullable=False)
+    net_ore = Column(BigInteger, nullable=False)
+    # basis points, 3142 = 31.42 %
+    contribution_rate_bp = Column(Integer, nullable=False)
+    contributions_ore = Column(BigInteger, nullable=False)
+    vacation_ore = Column(BigInteger, nullable=False)
+    vacation_contributions_ore = Column(BigInteger, nullable=False)
+
+
+class RateLimitBucket(Base):
+    """Token bucket shared by all workers when RATE_LIMIT_BACKEND=postgres (see rate_limit)."""
+    __tablename__ = "rate_limit_buckets"
+
+    # "user:<id>", "ip:<address>" or "company:<id>"
+    key = Column(String(128), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # whether the last check got a token
+    allowed = Column(Boolean, nullable=False, default=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
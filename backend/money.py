@@ -0,0 +1,35 @@
+"""
+Amounts in öre.
+
+Everything stored is a whole number of öre (BIGINT columns); SEK floats
+only exist at the edges (SIE text, JSON, request bodies). Each amount is
+rounded once on the way in, so sums and balance checks after that are
+exact integer arithmetic, in Python ints or NumPy int64 arrays.
+"""
+
+import numpy as np
+
+
+def to_ore(amount: float) -> int:
+    return int(round(amount * 100))
+
+
+def format_ore(ore: int) -> str:
+    """12345 -> "123.45", -5 -> "-0.05" (same as toFixed(2) without float error)."""
+    sign = "-" if ore < 0 else ""
+    whole, cents = divmod(abs(ore), 100)
+    return f"{sign}{whole}.{cents:02d}"
+
+
+def group_sums(keys: np.ndarray, amounts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exact int64 totals of `amounts` (one or more columns) per distinct key:
+    (keys ascending, totals). Sort + reduceat rather than bincount, whose
+    float64 weights would round large sums.
+    """
+    if not len(keys):
+        return keys[:0], amounts[:0]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+    return sorted_keys[starts], np.add.reduceat(amounts[order], starts, axis=0)
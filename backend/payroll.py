@@ -0,0 +1,507 @@
+"""
+Payroll runs: gross to net for all employees of a company in one batch.
+
+Preliminary tax comes from Skatteverket's monthly tax tables (the open data
+CSV "Skattetabeller för månadslön"). `python payroll.py build-tax-tables
+<csv>` converts a year once into .npy arrays under TAX_TABLE_DIR/<year>;
+at run time they are memory mapped, so a year's tables are shared by all
+workers and cost nothing until a page is touched. Every step of a run
+(gross, table lookup, employer contributions, vacation accrual) is one
+NumPy operation over all employees, so a 5 000 employee run is a few
+milliseconds of arithmetic. Amounts are öre (int64) throughout.
+
+The booked voucher and the AGI summary (arbetsgivardeklaration på
+individnivå) are built from the same arrays.
+"""
+
+import csv
+import io
+import os
+import re
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Literal, NamedTuple
+
+import numpy as np
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from database import bulk_insert
+from ledger import format_voucher
+from models import PayrollLine, PayrollRun
+from uploads import STORAGE_DIR
+
+TAX_TABLE_DIR = Path(os.getenv("TAX_TABLE_DIR", str(STORAGE_DIR / "tax-tables")))
+# used for employees without their own table (tabell 33 is the most common municipality range)
+DEFAULT_TAX_TABLE = int(os.getenv("PAYROLL_DEFAULT_TAX_TABLE", "33"))
+TAX_TABLE_COLUMNS = 6
+
+# Arbetsgivaravgifter: full rate, reduced rate (only ålderspensionsavgift) for
+# employees who have turned 66 by the start of the year, none for those born 1937 or earlier
+EMPLOYER_CONTRIBUTION_RATE = 0.3142
+SENIOR_CONTRIBUTION_RATE = 0.1021
+NO_CONTRIBUTION_BORN_BEFORE = 1938
+# semesterlöneskuld by the percentage rule
+VACATION_ACCRUAL_RATE = 0.12
+
+MAX_RUN_EMPLOYEES = 50_000
+
+# (account, debit) per amount of the salary voucher
+SALARY_ACCOUNTS = {
+    "gross": ("7210", True),
+    "tax": ("2710", False),
+    "net": ("1930", False),
+    "contributions": ("7510", True),
+    "contributions_liability": ("2731", False),
+    "vacation": ("7290", True),
+    "vacation_liability": ("2920", False),
+    "vacation_contributions": ("7519", True),
+    "vacation_contributions_liability": ("2940", False),
+}
+
+_TABLE_FILES = ("bounds", "tables", "amounts", "percent")
+_PERIOD = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+_PERSONAL_NUMBER = re.compile(r"^\s*(\d{2})?(\d{2})\d{4}\s*([-+]?)\s*\d{4}\s*$")
+
+_tax_tables: dict[int, "TaxTables"] = {}
+_tax_tables_lock = threading.Lock()
+
+
+class PayrollEmployee(BaseModel):
+    employee_id: str
+    name: str
+    personal_number: str
+    employment_type: Literal["full-time", "part-time", "seasonal", "hourly"] = "full-time"
+    # monthly salary, or the hourly rate for hourly employees
+    salary: float
+    hours: float | None = None
+    tax_table: int | None = None
+    tax_column: int = 1
+    # flat rate instead of the tables (e.g. 30 for a secondary employment)
+    tax_percent: float | None = None
+
+
+class PayrollRunCreate(BaseModel):
+    user_id: int
+    period: str  # YYYY-MM
+    pay_date: date
+    employees: list[PayrollEmployee]
+    # book the salary voucher (series A) on the pay date
+    book_voucher: bool = True
+
+
+class TaxTables(NamedTuple):
+    year: int
+    # lower income bound (SEK) of every bracket found in any table, ascending
+    bounds: np.ndarray
+    # table numbers, ascending
+    tables: np.ndarray
+    # [table, column, bracket] tax in SEK, and percent (0 for amount rows)
+    amounts: np.ndarray
+    percent: np.ndarray
+
+
+class PayrollBatch(NamedTuple):
+    gross: np.ndarray
+    tax: np.ndarray
+    net: np.ndarray
+    contribution_rate: np.ndarray
+    contributions: np.ndarray
+    vacation: np.ndarray
+    vacation_contributions: np.ndarray
+
+
+def _normalize_header(name: str) -> str:
+    return "".join(ch for ch in name.lower() if ch.isalnum())
+
+
+def _int(value: str) -> int:
+    value = (value or "").strip().replace(" ", "")
+    return int(value) if value else 0
+
+
+def parse_tax_table_csv(data: bytes) -> dict[int, list[tuple[int, int, int, list[int], bool]]]:
+    """Monthly rows (30B amounts, 30% percentages) per year: (table, from, to, columns, is_percent)."""
+    try:
+        content = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        content = data.decode("cp1252")
+    dialect = csv.Sniffer().sniff(content[:4096], delimiters=";,\t")
+    reader = csv.reader(io.StringIO(content), dialect)
+    header = [_normalize_header(name) for name in next(reader)]
+    try:
+        index = {key: header.index(key) for key in ("år", "antaldgr", "tabellnr", "inkomstfrom", "inkomsttom")}
+        columns = [header.index(f"kolumn{n}") for n in range(1, TAX_TABLE_COLUMNS + 1)]
+    except ValueError as exc:
+        raise ValueError(f"Not a monthly tax table file: {exc}") from exc
+
+    years: dict[int, list] = {}
+    for row in reader:
+        if len(row) < len(header):
+            continue
+        days = row[index["antaldgr"]].strip().upper()
+        if days not in ("30B", "30%"):
+            continue
+        years.setdefault(_int(row[index["år"]]), []).append((
+            _int(row[index["tabellnr"]]),
+            _int(row[index["inkomstfrom"]]),
+            _int(row[index["inkomsttom"]]),
+            [_int(row[i]) for i in columns],
+            days == "30%",
+        ))
+    return years
+
+
+def build_tax_tables(rows: list[tuple[int, int, int, list[int], bool]], year: int) -> TaxTables:
+    """
+    Dense arrays over the union of all bracket bounds: each table's row is
+    forward filled onto the brackets of the other tables, so one
+    searchsorted over `bounds` serves every table.
+    """
+    rows = sorted(rows, key=lambda row: (row[0], row[1]))
+    table_numbers = np.array(sorted({row[0] for row in rows}), dtype=np.int16)
+    bounds = np.unique(np.array([row[1] for row in rows], dtype=np.int64))
+    amounts = np.zeros((len(table_numbers), TAX_TABLE_COLUMNS, len(bounds)), dtype=np.int32)
+    percent = np.zeros_like(amounts, dtype=np.float32)
+
+    for t, table in enumerate(table_numbers):
+        table_rows = [row for row in rows if row[0] == table]
+        starts = np.array([row[1] for row in table_rows], dtype=np.int64)
+        values = np.array([row[3] for row in table_rows], dtype=np.int64).T
+        is_percent = np.array([row[4] for row in table_rows])
+        row_index = np.searchsorted(starts, bounds, side="right") - 1
+        covered = row_index >= 0
+        row_index = np.clip(row_index, 0, None)
+        amounts[t] = np.where(covered & ~is_percent[row_index], values[:, row_index], 0)
+        percent[t] = np.where(covered & is_percent[row_index], values[:, row_index], 0)
+    return TaxTables(year, bounds, table_numbers, amounts, percent)
+
+
+def save_tax_tables(tables: TaxTables, directory: Path = TAX_TABLE_DIR) -> Path:
+    target = directory / str(tables.year)
+    target.mkdir(parents=True, exist_ok=True)
+    for name in _TABLE_FILES:
+        np.save(target / f"{name}.npy", getattr(tables, name))
+    with _tax_tables_lock:
+        _tax_tables.pop(tables.year, None)
+    return target
+
+
+def load_tax_tables(year: int) -> TaxTables | None:
+    """The year's tables, memory mapped; None when they have not been built."""
+    with _tax_tables_lock:
+        tables = _tax_tables.get(year)
+        if tables is not None:
+            return tables
+        source = TAX_TABLE_DIR / str(year)
+        if not all((source / f"{name}.npy").exists() for name in _TABLE_FILES):
+            return None
+        arrays = {name: np.load(source / f"{name}.npy", mmap_mode="r") for name in _TABLE_FILES}
+        tables = _tax_tables[year] = TaxTables(year=year, **arrays)
+        return tables
+
+
+def table_tax(tables: TaxTables, income_sek: np.ndarray, table_no: np.ndarray, column: np.ndarray) -> np.ndarray:
+    """Monthly preliminary tax in SEK for each income, table and column (1-6)."""
+    t = np.searchsorted(tables.tables, table_no)
+    unknown = (t >= len(tables.tables)) | (tables.tables[np.minimum(t, len(tables.tables) - 1)] != table_no)
+    if unknown.any():
+        raise HTTPException(
+            status_code=400,
+            detail={"message": f"Unknown tax tables for {tables.year}", "tables": sorted(set(table_no[unknown].tolist()))},
+        )
+    bracket = np.searchsorted(tables.bounds, income_sek, side="right") - 1
+    covered = bracket >= 0
+    bracket = np.clip(bracket, 0, None)
+    c = column - 1
+    amount = tables.amounts[t, c, bracket].astype(np.int64)
+    pct = tables.percent[t, c, bracket]
+    tax = np.where(pct > 0, np.floor(income_sek * pct.astype(np.float64) / 100), amount)
+    return np.where(covered, tax, 0).astype(np.int64)
+
+
+def birth_year(personal_number: str, year: int) -> int:
+    if len(personal_number) == 13 and personal_number[8] == "-" and personal_number.replace("-", "", 1).isdigit():
+        return int(personal_number[:4])  # YYYYMMDD-XXXX, as SalaryPage stores it
+    match = _PERSONAL_NUMBER.match(personal_number)
+    if match is None:
+        raise HTTPException(status_code=400, detail=f"Invalid personal number: {personal_number}")
+    century, short_year, separator = match.groups()
+    if century:
+        return int(century + short_year)
+    # short form: the century that makes the person younger than 100, "+" marks 100 or older
+    born = (year // 100) * 100 + int(short_year)
+    if born > year:
+        born -= 100
+    return born - 100 if separator == "+" else born
+
+
+def contribution_rates(birth_years: np.ndarray, year: int) -> np.ndarray:
+    return np.select(
+        [birth_years < NO_CONTRIBUTION_BORN_BEFORE, birth_years <= year - 67],
+        [0.0, SENIOR_CONTRIBUTION_RATE],
+        EMPLOYER_CONTRIBUTION_RATE,
+    )
+
+
+def compute_payroll(employees: list[PayrollEmployee], year: int, tables: TaxTables | None) -> PayrollBatch:
+    missing_hours = [e.employee_id for e in employees if e.employment_type == "hourly" and e.hours is None]
+    if missing_hours:
+        raise HTTPException(status_code=400, detail={"message": "Hours are required for hourly employees", "employeeIds": missing_hours[:100]})
+    bad_columns = [e.employee_id for e in employees if not 1 <= e.tax_column <= TAX_TABLE_COLUMNS]
+    if bad_columns:
+        raise HTTPException(status_code=400, detail={"message": "Tax column must be 1-6", "employeeIds": bad_columns[:100]})
+
+    salary = np.array([e.salary for e in employees], dtype=np.float64)
+    hours = np.array([e.hours or 0 for e in employees], dtype=np.float64)
+    hourly = np.array([e.employment_type == "hourly" for e in employees], dtype=bool)
+    flat = np.array([np.nan if e.tax_percent is None else e.tax_percent for e in employees], dtype=np.float64)
+    born = np.array([birth_year(e.personal_number, year) for e in employees], dtype=np.int64)
+    gross = np.rint(np.where(hourly, salary * hours, salary) * 100).astype(np.int64)
+    if (gross < 0).any():
+        raise HTTPException(status_code=400, detail="Salaries must not be negative")
+
+    by_table = np.isnan(flat)
+    tax = np.rint(gross * np.nan_to_num(flat) / 100).astype(np.int64)
+    if by_table.any():
+        if tables is None:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Tax tables for {year} are not installed (python payroll.py build-tax-tables <csv>)",
+            )
+        table_no = np.array([e.tax_table or DEFAULT_TAX_TABLE for e in employees], dtype=np.int16)
+        column = np.array([e.tax_column for e in employees], dtype=np.int64)
+        tax[by_table] = table_tax(tables, gross[by_table] // 100, table_no[by_table], column[by_table]) * 100
+    tax = np.minimum(tax, gross)
+
+    rate = contribution_rates(born, year)
+    vacation = np.rint(gross * VACATION_ACCRUAL_RATE).astype(np.int64)
+    return PayrollBatch(
+        gross=gross,
+        tax=tax,
+        net=gross - tax,
+        contribution_rate=rate,
+        contributions=np.rint(gross * rate).astype(np.int64),
+        vacation=vacation,
+        vacation_contributions=np.rint(vacation * rate).astype(np.int64),
+    )
+
+
+def batch_totals(batch: PayrollBatch) -> dict[str, int]:
+    return {
+        name: int(getattr(batch, name).sum())
+        for name in ("gross", "tax", "net", "contributions", "vacation", "vacation_contributions")
+    }
+
+
+def salary_voucher_lines(totals: dict[str, int]) -> list[tuple[str, int]]:
+    """(account, amount_ore) of the salary voucher, debit positive; zero lines are dropped."""
+    amounts = {
+        "gross": totals["gross"],
+        "tax": totals["tax"],
+        "net": totals["net"],
+        "contributions": totals["contributions"],
+        "contributions_liability": totals["contributions"],
+        "vacation": totals["vacation"],
+        "vacation_liability": totals["vacation"],
+        "vacation_contributions": totals["vacation_contributions"],
+        "vacation_contributions_liability": totals["vacation_contributions"],
+    }
+    lines = []
+    for key, (account, debit) in SALARY_ACCOUNTS.items():
+        if amounts[key]:
+            lines.append((account, amounts[key] if debit else -amounts[key]))
+    return lines
+
+
+def create_payroll_run(
+    db: Session,
+    company_id: int,
+    payload: PayrollRunCreate,
+    voucher_number: int | None = None,
+) -> tuple[PayrollRun, list[str]]:
+    """
+    Compute and write a run with its lines (caller commits). With a
+    `voucher_number`, returns the SIE text of the salary voucher (series A)
+    for the caller to append to the SIE state.
+    """
+    if not _PERIOD.match(payload.period):
+        raise HTTPException(status_code=400, detail="period must be YYYY-MM")
+    if not payload.employees:
+        raise HTTPException(status_code=400, detail="No employees in run")
+    if len(payload.employees) > MAX_RUN_EMPLOYEES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RUN_EMPLOYEES} employees per run")
+
+    # the tables of the year the salary is paid
+    year = payload.pay_date.year
+    batch = compute_payroll(payload.employees, year, load_tax_tables(year))
+    totals = batch_totals(batch)
+
+    run = PayrollRun(
+        company_id=company_id,
+        period=payload.period,
+        pay_date=payload.pay_date,
+        employee_count=len(payload.employees),
+        gross_ore=totals["gross"],
+        tax_ore=totals["tax"],
+        net_ore=totals["net"],
+        contributions_ore=totals["contributions"],
+        vacation_ore=totals["vacation"],
+        vacation_contributions_ore=totals["vacation_contributions"],
+        created_by_user_id=payload.user_id,
+    )
+    db.add(run)
+    db.flush()
+
+    rate_bp = np.rint(batch.contribution_rate * 10_000).astype(np.int64).tolist()
+    columns = {name: getattr(batch, name).tolist() for name in ("gross", "tax", "net", "contributions", "vacation", "vacation_contributions")}
+    bulk_insert(db, PayrollLine, [
+        {
+            "run_id": run.id,
+            "employee_id": employee.employee_id,
+            "name": employee.name,
+            "personal_number": employee.personal_number,
+            "tax_table": None if employee.tax_percent is not None else employee.tax_table or DEFAULT_TAX_TABLE,
+            "tax_column": None if employee.tax_percent is not None else employee.tax_column,
+            "tax_percent": employee.tax_percent,
+            "gross_ore": columns["gross"][i],
+            "tax_ore": columns["tax"][i],
+            "net_ore": columns["net"][i],
+            "contribution_rate_bp": rate_bp[i],
+            "contributions_ore": columns["contributions"][i],
+            "vacation_ore": columns["vacation"][i],
+            "vacation_contributions_ore": columns["vacation_contributions"][i],
+        }
+        for i, employee in enumerate(payload.employees)
+    ])
+
+    vouchers: list[str] = []
+    voucher_lines = salary_voucher_lines(totals)
+    if voucher_number is not None and voucher_lines:
+        run.voucher_series = "A"
+        run.voucher_number = voucher_number
+        vouchers = format_voucher("A", voucher_number, payload.pay_date, f"Salaries {payload.period}", voucher_lines)
+    return run, vouchers
+
+
+def payroll_run_out(run: PayrollRun) -> dict:
+    return {
+        "id": run.id,
+        "period": run.period,
+        "payDate": run.pay_date.isoformat(),
+        "employeeCount": run.employee_count,
+        "gross": run.gross_ore / 100,
+        "tax": run.tax_ore / 100,
+        "net": run.net_ore / 100,
+        "employerContributions": run.contributions_ore / 100,
+        "vacationAccrual": run.vacation_ore / 100,
+        "vacationContributions": run.vacation_contributions_ore / 100,
+        "voucherSeries": run.voucher_series,
+        "voucherNumber": run.voucher_number,
+        "createdAt": run.created_at.isoformat() if run.created_at else None,
+    }
+
+
+def payroll_line_out(line: PayrollLine) -> dict:
+    return {
+        "employeeId": line.employee_id,
+        "name": line.name,
+        "personalNumber": line.personal_number,
+        "taxTable": line.tax_table,
+        "taxColumn": line.tax_column,
+        "taxPercent": line.tax_percent,
+        "gross": line.gross_ore / 100,
+        "tax": line.tax_ore / 100,
+        "net": line.net_ore / 100,
+        "contributionRate": line.contribution_rate_bp / 100,
+        "employerContributions": line.contributions_ore / 100,
+        "vacationAccrual": line.vacation_ore / 100,
+        "vacationContributions": line.vacation_contributions_ore / 100,
+    }
+
+
+def agi_summary(period: str, lines: list[PayrollLine]) -> dict:
+    """
+    Arbetsgivardeklaration figures for a period: per employee field 011
+    (kontant bruttolön) and 001 (avdragen skatt); for the employer 487
+    (summa arbetsgivaravgifter) and 497 (summa skatteavdrag), plus the
+    contribution base per rate. Several runs in a period add up.
+    """
+    individuals: dict[str, dict] = {}
+    by_rate: dict[int, dict] = {}
+    for line in lines:
+        person = individuals.setdefault(line.personal_number, {"name": line.name, "gross": 0, "tax": 0})
+        person["gross"] += line.gross_ore
+        person["tax"] += line.tax_ore
+        rate = by_rate.setdefault(line.contribution_rate_bp, {"base": 0, "contributions": 0})
+        rate["base"] += line.gross_ore
+        rate["contributions"] += line.contributions_ore
+    return {
+        "period": period,
+        "employer": {
+            "487": sum(rate["contributions"] for rate in by_rate.values()) / 100,
+            "497": sum(person["tax"] for person in individuals.values()) / 100,
+            "contributionBases": [
+                {"rate": bp / 100, "base": rate["base"] / 100, "contributions": rate["contributions"] / 100}
+                for bp, rate in sorted(by_rate.items(), reverse=True)
+            ],
+        },
+        "individuals": [
+            {"personalNumber": number, "name": person["name"], "011": person["gross"] / 100, "001": person["tax"] / 100}
+            for number, person in sorted(individuals.items())
+        ],
+    }
+
+
+def main() -> int:
+    # python payroll.py build-tax-tables <csv>  -> writes TAX_TABLE_DIR/<year>/*.npy
+    # python payroll.py [employees]             -> batch timing on synthetic tables (no database)
+    import random
+    import sys
+
+    if len(sys.argv) > 2 and sys.argv[1] == "build-tax-tables":
+        years = parse_tax_table_csv(Path(sys.argv[2]).read_bytes())
+        if not years:
+            print("No monthly rows (30B / 30%) found")
+            return 1
+        for year, rows in sorted(years.items()):
+            tables = build_tax_tables(rows, year)
+            target = save_tax_tables(tables)
+            print(f"{year}: {len(tables.tables)} tables x {len(tables.bounds)} brackets -> {target}")
+        return 0
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rows = []
+    for table in range(29, 43):
+        for start in range(1, 80_001, 200):
+            rows.append((table, start, start + 199, [int(start * (table - 10 + c) / 100) for c in range(6)], False))
+        rows.append((table, 80_001, 0, [table + 20 - c for c in range(6)], True))
+    tables = build_tax_tables(rows, 2025)
+    target = save_tax_tables(tables, TAX_TABLE_DIR / "benchmark")
+    mapped = TaxTables(2025, *(np.load(target / f"{name}.npy", mmap_mode="r") for name in _TABLE_FILES))
+
+    rng = random.Random(42)
+    employees = [
+        PayrollEmployee(
+            employee_id=str(n),
+            name=f"Employee {n}",
+            personal_number=f"{rng.randint(1940, 2005)}0101-{n % 10000:04d}",
+            salary=rng.randint(22_000, 120_000),
+            tax_table=rng.randint(29, 42),
+            tax_column=rng.randint(1, 6),
+        )
+        for n in range(count)
+    ]
+    started = time.perf_counter()
+    batch = compute_payroll(employees, 2025, mapped)
+    elapsed = time.perf_counter() - started
+    totals = batch_totals(batch)
+    print(f"{count} employees in {elapsed * 1000:.1f} ms: gross {totals['gross'] / 100:.2f}, tax {totals['tax'] / 100:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,717 @@
+"""
+Server-side PDF rendering of invoices and reports.
+
+Layouts are declarative templates (LAYOUTS) with the same look as
+src/lib/pdf-export.ts. compile_layout() turns one into pre-encoded content
+stream fragments for everything static (labels, table headers, fills) and
+a list of slots that are filled per document; compiled layouts are cached,
+so rendering a document only formats its own values. Output is a small
+PDF 1.4 using the standard Helvetica fonts, so nothing is embedded and no
+PDF library is needed. iter_invoice_zip() renders many invoices across a
+process pool and streams them back as a zip.
+"""
+
+import io
+import os
+import re
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from string import Formatter
+from typing import Iterable, Iterator
+
+# A4 in points; layouts are written in millimetres from the top left, like jsPDF.
+PAGE_WIDTH = 595.28
+PAGE_HEIGHT = 841.89
+MM = 72 / 25.4
+PAGE_WIDTH_MM = PAGE_WIDTH / MM
+PAGE_HEIGHT_MM = PAGE_HEIGHT / MM
+
+# Flowing content (tables) breaks to a new page below this line.
+BODY_BOTTOM_MM = PAGE_HEIGHT_MM - 25
+BODY_TOP_CONTINUED_MM = 20
+
+# Batches below this many invoices are rendered inline, pool start-up would dominate.
+PARALLEL_MIN_DOCS = int(os.getenv("PDF_PARALLEL_MIN_DOCS", "50"))
+RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(os.cpu_count() or 1)))
+# Invoices per pool task, keeps pickling overhead per document small.
+RENDER_CHUNK_SIZE = 25
+
+FONTS = {
+    "regular": ("F1", "Helvetica"),
+    "bold": ("F2", "Helvetica-Bold"),
+    "italic": ("F3", "Helvetica-Oblique"),
+}
+
+# Advance widths (1/1000 em) of WinAnsiEncoding bytes 32-255, from the Adobe core font metrics.
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584, 761,
+    556, 0, 222, 556, 333, 1000, 556, 556, 333, 1000, 667, 333, 1000, 0, 611, 0,
+    0, 222, 222, 333, 333, 350, 556, 1000, 333, 1000, 500, 333, 944, 0, 500, 667,
+    278, 333, 556, 556, 556, 556, 260, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 556, 537, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    667, 667, 667, 667, 667, 667, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 500, 556, 556, 556, 556, 278, 278, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 584, 611, 556, 556, 556, 556, 500, 556, 500,
+)
+_HELVETICA_BOLD_WIDTHS = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584, 761,
+    556, 0, 278, 556, 500, 1000, 556, 556, 333, 1000, 667, 333, 1000, 0, 611, 0,
+    0, 278, 278, 500, 500, 350, 556, 1000, 333, 1000, 556, 333, 944, 0, 500, 667,
+    278, 333, 556, 556, 556, 556, 280, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 611, 556, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    722, 722, 722, 722, 722, 722, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 556, 556, 556, 556, 556, 278, 278, 278, 278,
+    611, 611, 611, 611, 611, 611, 611, 584, 611, 611, 611, 611, 611, 556, 611, 556,
+)
+_WIDTHS = {"regular": _HELVETICA_WIDTHS, "bold": _HELVETICA_BOLD_WIDTHS, "italic": _HELVETICA_WIDTHS}
+
+_ESCAPE_RE = re.compile(rb"([\\()])")
+
+
+# ------------------------------------------------------------
+# Layout templates
+# ------------------------------------------------------------
+@dataclass(frozen=True)
+class Text:
+    """Text at (x, y) mm; `text` may use {field} placeholders. In a body, y is relative to the flow."""
+    x: float
+    y: float
+    text: str
+    font: str = "regular"
+    size: float = 10
+    align: str = "left"
+    color: tuple[int, int, int] = (0, 0, 0)
+
+
+@dataclass(frozen=True)
+class Box:
+    x: float
+    y: float
+    width: float
+    height: float
+    color: tuple[int, int, int]
+    # data field holding the fill colour instead of `color`
+    color_field: str | None = None
+
+
+@dataclass(frozen=True)
+class Column:
+    header: str
+    width: float
+    align: str = "left"
+    bold: bool = False
+
+
+@dataclass(frozen=True)
+class Table:
+    """Striped table over data[rows] (lists of cell strings); moves the flow to its end."""
+    rows: str
+    columns: tuple[Column, ...]
+    head_color: tuple[int, int, int]
+    font_size: float = 10
+    x: float = 14
+    empty_text: str | None = None
+    # the last row is a total and drawn bold
+    total_row: bool = False
+
+
+@dataclass(frozen=True)
+class Space:
+    height: float
+
+
+@dataclass(frozen=True)
+class Layout:
+    # first page, absolute positions
+    header: tuple
+    # flows from body_top, may continue on later pages
+    body: tuple
+    # every page, absolute positions; may use {page} and {pages}
+    footer: tuple
+    body_top: float
+
+
+_FOOTER = (
+    Text(14, PAGE_HEIGHT_MM - 15, "Generated: {generated}", size=8),
+    Text(PAGE_WIDTH_MM - 14, PAGE_HEIGHT_MM - 15, "Page {page} of {pages}", size=8, align="right"),
+)
+
+
+def _statement_header(title: str, swedish_title: str, period_label: str) -> tuple:
+    center = PAGE_WIDTH_MM / 2
+    return (
+        Text(center, 20, title, "bold", 20, "center"),
+        Text(center, 28, swedish_title, "bold", 20, "center"),
+        Text(center, 38, "{companyName}", size=12, align="center"),
+        Text(center, 45, "Org.nr: {organizationNumber}", size=12, align="center"),
+        Text(center, 52, period_label, size=12, align="center"),
+    )
+
+
+def _section(title: str, rows: str, columns: tuple, color: tuple, empty_text: str) -> tuple:
+    return (
+        Text(14, 0, title, "bold", 14),
+        Space(5),
+        Table(rows, columns, color, empty_text=empty_text, total_row=True),
+        Space(15),
+    )
+
+
+_STATEMENT_COLUMNS = (
+    Column("Account", 25),
+    Column("Name", 72),
+    Column("Debit", 29, "right"),
+    Column("Credit", 28, "right"),
+    Column("Balance", 28, "right", bold=True),
+)
+_BALANCE_COLUMNS = (Column("Account", 25), Column("Name", 112), Column("Balance", 45, "right", bold=True))
+
+LAYOUTS = {
+    "invoice": Layout(
+        header=(
+            Text(14, 22, "{docLabel}", "bold", 20),
+            Text(14, 30, "#{invoiceNumber}"),
+            Text(PAGE_WIDTH_MM - 14, 22, "{companyName}", "bold", align="right"),
+            Text(PAGE_WIDTH_MM - 14, 28, "{companyOrgLine}", align="right"),
+            Text(14, 42, "Customer:", "bold"),
+            Text(14, 48, "{customerName}"),
+            Text(14, 54, "{customerAddress}"),
+            Text(PAGE_WIDTH_MM - 14, 42, "Issue Date: {issueDate}", align="right"),
+            Text(PAGE_WIDTH_MM - 14, 48, "{dueLabel}: {dueDate}", align="right"),
+            Text(PAGE_WIDTH_MM - 14, 54, "Status: {statusLabel}", align="right"),
+        ),
+        body=(
+            Table(
+                "lines",
+                (
+                    Column("Product", 56),
+                    Column("Qty", 16, "right"),
+                    Column("Unit Price", 26, "right"),
+                    Column("VAT %", 18, "right"),
+                    Column("Total excl. VAT", 33, "right"),
+                    Column("Total incl. VAT", 33, "right"),
+                ),
+                (51, 51, 51),
+                font_size=9,
+            ),
+            Space(10),
+            Text(PAGE_WIDTH_MM - 80, 0, "Subtotal (excl. VAT):"),
+            Text(PAGE_WIDTH_MM - 14, 0, "{subtotal} SEK", align="right"),
+            Text(PAGE_WIDTH_MM - 80, 7, "Total VAT:"),
+            Text(PAGE_WIDTH_MM - 14, 7, "{totalVat} SEK", align="right"),
+            Text(PAGE_WIDTH_MM - 80, 16, "Total (incl. VAT):", "bold", 12),
+            Text(PAGE_WIDTH_MM - 14, 16, "{total} SEK", "bold", 12, "right"),
+        ),
+        footer=_FOOTER,
+        body_top=66,
+    ),
+    "income_statement": Layout(
+        header=_statement_header("Income Statement", "Resultaträkning", "Period: {startDate} - {endDate}"),
+        body=(
+            *_section("Revenue (Intäkter)", "revenues", _STATEMENT_COLUMNS, (34, 197, 94),
+                      "No revenue transactions in this period"),
+            *_section("Expenses (Kostnader)", "expenses", _STATEMENT_COLUMNS, (239, 68, 68),
+                      "No expense transactions in this period"),
+            Box(14, 0, PAGE_WIDTH_MM - 28, 25, (34, 197, 94), color_field="resultColor"),
+            Text(20, 10, "Net Result (Årets resultat)", "bold", 14, color=(255, 255, 255)),
+            Text(PAGE_WIDTH_MM - 20, 16, "{netResult} SEK", "bold", 16, "right", (255, 255, 255)),
+            Space(25),
+        ),
+        footer=_FOOTER,
+        body_top=65,
+    ),
+    "balance_sheet": Layout(
+        header=_statement_header("Balance Sheet", "Balansräkning", "As of: {asOfDate}"),
+        body=(
+            *_section("Assets (Tillgångar)", "assets", _BALANCE_COLUMNS, (59, 130, 246), "No asset transactions"),
+            *_section("Equity & Liabilities (Eget kapital & Skulder)", "equityLiabilities", _BALANCE_COLUMNS,
+                      (139, 92, 246), "No equity/liability transactions"),
+            Box(14, 0, PAGE_WIDTH_MM - 28, 20, (34, 197, 94), color_field="balanceColor"),
+            Text(PAGE_WIDTH_MM / 2, 12, "{balanceText}", "bold", 12, "center", (255, 255, 255)),
+            Space(20),
+        ),
+        footer=_FOOTER,
+        body_top=65,
+    ),
+}
+
+
+# ------------------------------------------------------------
+# Content stream primitives
+# ------------------------------------------------------------
+def _num(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _encode_text(text: str) -> bytes:
+    return _ESCAPE_RE.sub(rb"\\\1", text.encode("cp1252", errors="replace"))
+
+
+def text_width(text: str, font: str, size: float) -> float:
+    """Width in mm."""
+    widths = _WIDTHS[font]
+    total = 0
+    for byte in text.encode("cp1252", errors="replace"):
+        total += widths[byte - 32] if byte >= 32 else 0
+    return total * size / 1000 / MM
+
+
+def _text_op(x: float, y: float, text: str, font: str, size: float, align: str, color) -> bytes:
+    if align == "right":
+        x -= text_width(text, font, size)
+    elif align == "center":
+        x -= text_width(text, font, size) / 2
+    r, g, b = (c / 255 for c in color)
+    return (
+        f"BT {_num(r)} {_num(g)} {_num(b)} rg /{FONTS[font][0]} {_num(size)} Tf "
+        f"{_num(x * MM)} {_num(PAGE_HEIGHT - y * MM)} Td (".encode("ascii")
+        + _encode_text(text)
+        + b") Tj ET\n"
+    )
+
+
+def _rect_op(x: float, y: float, width: float, height: float, color) -> bytes:
+    r, g, b = (c / 255 for c in color)
+    return (
+        f"{_num(r)} {_num(g)} {_num(b)} rg {_num(x * MM)} {_num(PAGE_HEIGHT - (y + height) * MM)} "
+        f"{_num(width * MM)} {_num(height * MM)} re f\n"
+    ).encode("ascii")
+
+
+def _shift(fragment: bytes, dy: float) -> bytes:
+    """Draw a fragment compiled at flow position 0 at flow position dy (mm)."""
+    if not dy:
+        return fragment
+    return f"q 1 0 0 1 0 {_num(-dy * MM)} cm\n".encode("ascii") + fragment + b"Q\n"
+
+
+def _fields(text: str) -> tuple[str, ...]:
+    return tuple(name for _, name, _, _ in Formatter().parse(text) if name)
+
+
+# ------------------------------------------------------------
+# Compilation
+# ------------------------------------------------------------
+def _row_height(font_size: float, lines: int = 1) -> float:
+    return font_size * 1.15 * lines / MM + 3.5
+
+
+def _compile_elements(elements) -> list:
+    """Static text and boxes become bytes (merged when adjacent); the rest stay as slots."""
+    ops: list = []
+    for element in elements:
+        if isinstance(element, Text) and not _fields(element.text):
+            fragment = _text_op(element.x, element.y, element.text, element.font, element.size, element.align, element.color)
+        elif isinstance(element, Box) and element.color_field is None:
+            fragment = _rect_op(element.x, element.y, element.width, element.height, element.color)
+        elif isinstance(element, Table):
+            ops.append(("table", element, _compile_table_head(element)))
+            continue
+        elif isinstance(element, Space):
+            ops.append(("space", element.height))
+            continue
+        else:
+            ops.append(("slot", element))
+            continue
+        if ops and ops[-1][0] == "static":
+            ops[-1] = ("static", ops[-1][1] + fragment)
+        else:
+            ops.append(("static", fragment))
+    return ops
+
+
+def _compile_table_head(table: Table) -> bytes:
+    """Header row at flow position 0."""
+    height = _row_height(table.font_size)
+    out = [_rect_op(table.x, 0, sum(c.width for c in table.columns), height, table.head_color)]
+    x = table.x
+    for column in table.columns:
+        out.append(_cell_op(x, 0, column, column.header, table.font_size, "bold", (255, 255, 255)))
+        x += column.width
+    return b"".join(out)
+
+
+def _cell_op(x: float, y: float, column: Column, text: str, font_size: float, font: str, color) -> bytes:
+    baseline = y + 1.75 + font_size / MM * 0.85
+    if column.align == "right":
+        return _text_op(x + column.width - 1.75, baseline, text, font, font_size, "right", color)
+    return _text_op(x + 1.75, baseline, text, font, font_size, "left", color)
+
+
+@dataclass(frozen=True)
+class CompiledLayout:
+    header: list
+    body: list
+    footer: list
+    body_top: float
+
+
+@lru_cache(maxsize=None)
+def compile_layout(name: str) -> CompiledLayout:
+    layout = LAYOUTS[name]
+    return CompiledLayout(
+        header=_compile_elements(layout.header),
+        body=_compile_elements(layout.body),
+        footer=_compile_elements(layout.footer),
+        body_top=layout.body_top,
+    )
+
+
+# ------------------------------------------------------------
+# Rendering
+# ------------------------------------------------------------
+def _render_slot(element, data: dict, dy: float = 0) -> bytes:
+    if isinstance(element, Box):
+        color = data.get(element.color_field) or element.color
+        return _rect_op(element.x, element.y + dy, element.width, element.height, color)
+    text = element.text.format_map(data)
+    return _text_op(element.x, element.y + dy, text, element.font, element.size, element.align, element.color)
+
+
+def _render_absolute(ops: list, data: dict) -> bytes:
+    return b"".join(op[1] if op[0] == "static" else _render_slot(op[1], data) for op in ops)
+
+
+def _render_table(table: Table, head: bytes, rows: list, pages: list, cursor: float) -> float:
+    """Append the table to pages[-1] (adding pages as needed); returns the flow position after it."""
+    if not rows and table.empty_text:
+        pages[-1].append(_text_op(table.x, cursor + 5, table.empty_text, "italic", 10, "left", (0, 0, 0)))
+        return cursor + 5
+
+    head_height = _row_height(table.font_size)
+    if cursor + head_height * 2 > BODY_BOTTOM_MM:
+        pages.append([])
+        cursor = BODY_TOP_CONTINUED_MM
+    pages[-1].append(_shift(head, cursor))
+    cursor += head_height
+
+    width = sum(c.width for c in table.columns)
+    for index, row in enumerate(rows):
+        cells = [str(cell).split("\n") for cell in row]
+        height = _row_height(table.font_size, max(len(lines) for lines in cells))
+        if cursor + height > BODY_BOTTOM_MM:
+            pages.append([_shift(head, BODY_TOP_CONTINUED_MM)])
+            cursor = BODY_TOP_CONTINUED_MM + head_height
+        out = pages[-1]
+        if index % 2:
+            out.append(_rect_op(table.x, cursor, width, height, (245, 245, 245)))
+        is_total = table.total_row and index == len(rows) - 1
+        x = table.x
+        for column, lines in zip(table.columns, cells):
+            font = "bold" if column.bold or is_total else "regular"
+            for line_no, line in enumerate(lines):
+                if line:
+                    out.append(_cell_op(x, cursor + line_no * table.font_size * 1.15 / MM, column, line,
+                                        table.font_size, font, (0, 0, 0)))
+            x += column.width
+        cursor += height
+    return cursor
+
+
+def render_pdf(layout_name: str, data: dict) -> bytes:
+    """Render one document; `data` holds the layout's fields (formatted strings) and table rows."""
+    compiled = compile_layout(layout_name)
+    pages: list[list[bytes]] = [[_render_absolute(compiled.header, data)]]
+    cursor = compiled.body_top
+    for op in compiled.body:
+        kind = op[0]
+        if kind == "space":
+            cursor += op[1]
+        elif kind == "table":
+            cursor = _render_table(op[1], op[2], data.get(op[1].rows) or [], pages, cursor)
+        else:
+            if cursor > BODY_BOTTOM_MM - 20:
+                pages.append([])
+                cursor = BODY_TOP_CONTINUED_MM
+            pages[-1].append(_shift(op[1], cursor) if kind == "static" else _render_slot(op[1], data, cursor))
+
+    page_data = dict(data, pages=len(pages))
+    streams = []
+    for number, content in enumerate(pages, start=1):
+        page_data["page"] = number
+        content.append(_render_absolute(compiled.footer, page_data))
+        streams.append(b"".join(content))
+    return _write_pdf(streams)
+
+
+def _write_pdf(streams: list[bytes]) -> bytes:
+    font_ids = {key: 3 + index for index, key in enumerate(FONTS)}
+    first_page_id = 3 + len(FONTS)
+    page_ids = [first_page_id + 2 * index for index in range(len(streams))]
+
+    objects: list[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(streams)} >>".encode("ascii"),
+    ]
+    for key, (_, base_font) in FONTS.items():
+        objects.append(f"<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} /Encoding /WinAnsiEncoding >>".encode("ascii"))
+    resources = " ".join(f"/{alias} {font_ids[key]} 0 R" for key, (alias, _) in FONTS.items())
+    for page_id, stream in zip(page_ids, streams):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(PAGE_WIDTH)} {_num(PAGE_HEIGHT)}] "
+            f"/Resources << /Font << {resources} >> >> /Contents {page_id + 1} 0 R >>".encode("ascii")
+        )
+        packed = zlib.compress(stream, 6)
+        objects.append(f"<< /Length {len(packed)} /Filter /FlateDecode >>\nstream\n".encode("ascii") + packed + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    out += b"".join(f"{offset:010d} 00000 n \n".encode("ascii") for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    return bytes(out)
+
+
+# ------------------------------------------------------------
+# Documents
+# ------------------------------------------------------------
+def format_amount(amount: float) -> str:
+    """Like formatAmount() (sv-SE): 1234.5 -> "1 234,50"."""
+    text = f"{abs(amount):,.2f}".replace(",", " ").replace(".", ",")
+    return f"-{text}" if round(amount, 2) < 0 else text
+
+
+def _number(value: float) -> str:
+    # JS toString for quantities and VAT rates: 2.0 -> "2", 2.5 -> "2.5"
+    return f"{value:g}" if value != int(value) else str(int(value))
+
+
+def invoice_pdf(invoice: dict, company: dict | None = None, generated: str | None = None) -> bytes:
+    """`invoice` is billing.invoice_out() with lines."""
+    is_quote = invoice.get("documentType") == "quote"
+    status = invoice.get("status") or ""
+    data = {
+        "docLabel": "Quote" if is_quote else "Invoice",
+        "invoiceNumber": invoice["invoiceNumber"],
+        "companyName": company.get("companyName") or "" if company else "",
+        "companyOrgLine": f"Org.nr: {company.get('organizationNumber') or ''}" if company else "",
+        "customerName": invoice.get("customerName") or "",
+        "customerAddress": invoice.get("customerAddress") or "",
+        "issueDate": invoice["issueDate"],
+        "dueLabel": "Valid Until" if is_quote else "Due Date",
+        "dueDate": invoice["dueDate"],
+        "statusLabel": status[:1].upper() + status[1:],
+        "subtotal": format_amount(invoice["subtotal"]),
+        "totalVat": format_amount(invoice["totalVat"]),
+        "total": format_amount(invoice["total"]),
+        "generated": generated or date.today().isoformat(),
+        "lines": [
+            [
+                line["productName"] + (f"\n{line['description']}" if line.get("description") else ""),
+                _number(line["quantity"]),
+                format_amount(line["unitPrice"]),
+                f"{_number(line['vatRate'])}%",
+                format_amount(line["totalExclVat"]),
+                format_amount(line["totalInclVat"]),
+            ]
+            for line in invoice.get("lines") or []
+        ],
+    }
+    return render_pdf("invoice", data)
+
+
+def _statement_rows(entries: list[dict], total_label: str, total: float, detailed: bool) -> list:
+    if not entries:
+        return []
+    rows = [
+        [e["accountNumber"], e["accountName"], format_amount(e["totalDebit"]), format_amount(e["totalCredit"]), format_amount(e["balance"])]
+        if detailed else
+        [e["accountNumber"], e["accountName"], format_amount(e["balance"])]
+        for e in entries
+    ]
+    rows.append(["", total_label, "", "", format_amount(total)] if detailed else ["", total_label, format_amount(total)])
+    return rows
+
+
+def income_statement_pdf(statement: dict, company: dict, start: str, end: str) -> bytes:
+    revenues, expenses = statement["revenues"], statement["expenses"]
+    net_result = statement["netResult"]
+    return render_pdf("income_statement", {
+        "companyName": company.get("companyName") or "",
+        "organizationNumber": company.get("organizationNumber") or "",
+        "startDate": start,
+        "endDate": end,
+        "revenues": _statement_rows(revenues, "Total Revenue", sum(e["balance"] for e in revenues), True),
+        "expenses": _statement_rows(expenses, "Total Expenses", sum(e["balance"] for e in expenses), True),
+        "netResult": format_amount(net_result),
+        "resultColor": (34, 197, 94) if net_result >= 0 else (239, 68, 68),
+        "generated": date.today().isoformat(),
+    })
+
+
+def balance_sheet_pdf(sheet: dict, company: dict, as_of: str) -> bytes:
+    balanced = sheet["isBalanced"]
+    return render_pdf("balance_sheet", {
+        "companyName": company.get("companyName") or "",
+        "organizationNumber": company.get("organizationNumber") or "",
+        "asOfDate": as_of,
+        "assets": _statement_rows(sheet["assets"], "Total Assets", sheet["totalAssets"], False),
+        "equityLiabilities": _statement_rows(
+            sheet["equityLiabilities"], "Total Equity & Liabilities", sheet["totalEquityLiabilities"], False,
+        ),
+        # the standard fonts have no check marks, unlike the jsPDF version
+        "balanceText": "Balance Sheet is Balanced" if balanced else "Balance Sheet is NOT Balanced",
+        "balanceColor": (34, 197, 94) if balanced else (239, 68, 68),
+        "generated": date.today().isoformat(),
+    })
+
+
+def invoice_filename(invoice: dict) -> str:
+    label = "quote" if invoice.get("documentType") == "quote" else "invoice"
+    return f"{label}-{invoice['invoiceNumber']}.pdf"
+
+
+# ------------------------------------------------------------
+# Batch rendering
+# ------------------------------------------------------------
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+        return _pool
+
+
+def shutdown_render_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _render_invoice_chunk(invoices: list[dict], company: dict | None, generated: str) -> list[tuple[str, bytes]]:
+    """Worker: render a chunk of invoices (each process compiles the layout once)."""
+    return [(invoice_filename(invoice), invoice_pdf(invoice, company, generated)) for invoice in invoices]
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[list]:
+    chunk: list = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, unseekable target for ZipFile; the written bytes are taken out as they come."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def render_invoices(invoices: list[dict], company: dict | None, workers: int | None = None) -> Iterator[tuple[str, bytes]]:
+    """(filename, pdf) in input order; large batches are rendered across the process pool."""
+    generated = date.today().isoformat()
+    workers = workers or RENDER_WORKERS
+    if workers <= 1 or len(invoices) < PARALLEL_MIN_DOCS:
+        for invoice in invoices:
+            yield invoice_filename(invoice), invoice_pdf(invoice, company, generated)
+        return
+
+    chunks = list(_chunked(invoices, RENDER_CHUNK_SIZE))
+    pool = _get_pool() if workers == RENDER_WORKERS else ProcessPoolExecutor(max_workers=workers)
+    try:
+        for rendered in pool.map(_render_invoice_chunk, chunks, [company] * len(chunks), [generated] * len(chunks)):
+            yield from rendered
+    finally:
+        if pool is not _pool:
+            pool.shutdown()
+
+
+def iter_invoice_zip(invoices: list[dict], company: dict | None, workers: int | None = None) -> Iterator[bytes]:
+    """Zip of one PDF per invoice, yielded as each file is written."""
+    sink = _ZipSink()
+    # PDF content streams are already deflated
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+        for filename, pdf in render_invoices(invoices, company, workers):
+            archive.writestr(filename, pdf)
+            data = sink.take()
+            if data:
+                yield data
+    yield sink.take()
+
+
+def main() -> int:
+    # python pdf_render.py [invoices] -> render timings inline and across 1/2/4/8 workers
+    import sys
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    company = {"companyName": "Byrå Exempel AB", "organizationNumber": "556000-0000"}
+    invoices = [
+        {
+            "invoiceNumber": n,
+            "documentType": "invoice",
+            "customerName": f"Kund {n} AB",
+            "customerAddress": f"Storgatan {n}, 111 22 Stockholm",
+            "issueDate": "2025-03-01",
+            "dueDate": "2025-03-31",
+            "status": "sent",
+            "subtotal": 1500.0,
+            "totalVat": 375.0,
+            "total": 1875.0,
+            "lines": [
+                {"productName": "Abonnemang", "description": "Mars 2025", "quantity": 1, "unitPrice": 1000.0,
+                 "vatRate": 25, "totalExclVat": 1000.0, "totalInclVat": 1250.0},
+                {"productName": "Support", "quantity": 2, "unitPrice": 250.0,
+                 "vatRate": 25, "totalExclVat": 500.0, "totalInclVat": 625.0},
+            ],
+        }
+        for n in range(1, count + 1)
+    ]
+
+    started = time.perf_counter()
+    compile_layout.cache_clear()
+    compile_layout("invoice")
+    print(f"compile: {(time.perf_counter() - started) * 1000:.2f} ms")
+    for workers in (1, 2, 4, 8):
+        started = time.perf_counter()
+        size = sum(len(chunk) for chunk in iter_invoice_zip(invoices, company, workers=workers))
+        elapsed = time.perf_counter() - started
+        print(f"workers={workers}: {count} invoices in {elapsed:.2f}s ({count / elapsed:.0f}/s), zip {size / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,190 @@
+"""
+Rate limiting and load shedding for the polling routes.
+
+Open tabs poll the company lock, the heartbeat, the takeover requests and
+the SIE state. A client stuck in a loop on one of them can use up the
+database pool for everyone, so each poll takes a token from two buckets:
+one per caller and one per company. An empty bucket answers 429 with
+Retry-After.
+
+The caller is the user of a verified session token, else the client
+address; the user_id parameter is not trusted. A poll is charged to the
+company bucket up front only when the token shows a membership. Other
+polls only check that the company bucket is not empty and are charged
+once the route has answered successfully (so membership was confirmed).
+Requests with made-up user_ids therefore cannot drain a company's budget.
+
+Buckets live in memory by default, which is per worker. With
+RATE_LIMIT_BACKEND=postgres they are rows of rate_limit_buckets shared by
+every worker: one upsert per check, and every RATE_LIMIT_PRUNE_SECONDS a
+delete of the rows idle long enough to be full again (a full bucket and
+no row mean the same). RATE_LIMIT_BACKEND=off disables the limits.
+
+Polls are also shed with 503 and Retry-After while the average wait for a
+pooled database connection (database.pool_wait) is over
+LOAD_SHED_POOL_WAIT_MS. Saves and other writes are never shed.
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from database import pool_wait
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# requests per second, and how many may come at once after a quiet spell
+RATE_LIMIT_USER_RATE = float(os.getenv("RATE_LIMIT_USER_RATE", "5"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "20"))
+RATE_LIMIT_COMPANY_RATE = float(os.getenv("RATE_LIMIT_COMPANY_RATE", "50"))
+RATE_LIMIT_COMPANY_BURST = float(os.getenv("RATE_LIMIT_COMPANY_BURST", "100"))
+RATE_LIMIT_BUCKETS_MAX = int(os.getenv("RATE_LIMIT_BUCKETS_MAX", "100000"))
+RATE_LIMIT_PRUNE_SECONDS = float(os.getenv("RATE_LIMIT_PRUNE_SECONDS", "60"))
+LOAD_SHED_POOL_WAIT_MS = float(os.getenv("LOAD_SHED_POOL_WAIT_MS", "250"))
+
+_POLLING_RE = re.compile(r"^/companies/(\d+)/(lock|lock/heartbeat|takeover-requests|sie-state)$")
+
+
+def polling_company(method: str, path: str) -> int | None:
+    """Company id if this is one of the polled reads (or the heartbeat), else None."""
+    match = _POLLING_RE.match(path)
+    if not match:
+        return None
+    if method == "GET" and match.group(2) != "lock/heartbeat":
+        return int(match.group(1))
+    if method == "POST" and match.group(2) == "lock/heartbeat":
+        return int(match.group(1))
+    return None
+
+
+class MemoryRateLimiter:
+    """Token buckets in this process; idle buckets are dropped oldest first beyond max_buckets."""
+
+    def __init__(self, max_buckets: int = RATE_LIMIT_BUCKETS_MAX):
+        self.max_buckets = max_buckets
+        # key -> (tokens, time.monotonic() of the last update); least recently used first
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: int = 1) -> float:
+        """0 if a token was available (and `cost` of them taken), else seconds until one is."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= cost
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class PostgresRateLimiter:
+    """Token buckets in rate_limit_buckets, shared by all workers; each check is one upsert."""
+
+    _REFILLED = "LEAST(:burst, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at)::float8 * :rate)"
+    _TAKE = text(
+        f"""
+        INSERT INTO rate_limit_buckets AS b (key, tokens, allowed, updated_at)
+        VALUES (:key, :burst - :cost, TRUE, now())
+        ON CONFLICT (key) DO UPDATE SET
+            allowed = {_REFILLED} >= 1,
+            tokens = {_REFILLED} - CASE WHEN {_REFILLED} >= 1 THEN :cost ELSE 0 END,
+            updated_at = now()
+        RETURNING allowed, tokens
+        """
+    )
+    _PRUNE = text("DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => :idle)")
+
+    def __init__(self, engine: Engine, idle_seconds: float):
+        self.engine = engine
+        # a bucket untouched this long has refilled completely
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._next_prune = time.monotonic() + RATE_LIMIT_PRUNE_SECONDS
+
+    def take(self, key: str, rate: float, burst: float, cost: int = 1) -> float:
+        with self.engine.begin() as conn:
+            allowed, tokens = conn.execute(self._TAKE, {"key": key, "rate": rate, "burst": burst, "cost": cost}).one()
+        self._maybe_prune()
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def _maybe_prune(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_prune:
+                return
+            self._next_prune = now + RATE_LIMIT_PRUNE_SECONDS
+        with self.engine.begin() as conn:
+            conn.execute(self._PRUNE, {"idle": self.idle_seconds})
+
+
+class PollingGuard:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        # checks hit the database, so callers on the event loop should use a thread
+        self.queries = isinstance(limiter, PostgresRateLimiter)
+        self._lock = threading.Lock()
+        self._counters = {"rateLimited": 0, "shed": 0}
+
+    def shed(self) -> float:
+        """Seconds to ask the client to wait while the pool is congested, else 0."""
+        if pool_wait.current_ms() <= LOAD_SHED_POOL_WAIT_MS:
+            return 0.0
+        with self._lock:
+            self._counters["shed"] += 1
+        return 1.0
+
+    def check(self, caller_key: str, company_id: int, member: bool) -> float:
+        """
+        Take a token from the caller's bucket and, for a known `member`, the
+        company's; otherwise only check that the company's is not empty
+        (see charge_company). Seconds to wait if a bucket is empty, else 0.
+        """
+        if self.limiter is None:
+            return 0.0
+        wait = self.limiter.take(caller_key, RATE_LIMIT_USER_RATE, RATE_LIMIT_USER_BURST)
+        if not wait:
+            wait = self.limiter.take(
+                f"company:{company_id}", RATE_LIMIT_COMPANY_RATE, RATE_LIMIT_COMPANY_BURST, cost=1 if member else 0
+            )
+        if wait:
+            with self._lock:
+                self._counters["rateLimited"] += 1
+        return wait
+
+    def charge_company(self, company_id: int) -> None:
+        """Charge the company for a poll that turned out to come from a member."""
+        if self.limiter is not None:
+            self.limiter.take(f"company:{company_id}", RATE_LIMIT_COMPANY_RATE, RATE_LIMIT_COMPANY_BURST)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        counters["backend"] = RATE_LIMIT_BACKEND
+        counters["poolWaitMs"] = round(pool_wait.current_ms(), 1)
+        counters["poolWaiting"] = pool_wait.waiting
+        counters["shedAboveMs"] = LOAD_SHED_POOL_WAIT_MS
+        return counters
+
+
+def make_polling_guard(engine: Engine) -> PollingGuard:
+    if RATE_LIMIT_BACKEND == "postgres":
+        idle = max(RATE_LIMIT_USER_BURST / RATE_LIMIT_USER_RATE, RATE_LIMIT_COMPANY_BURST / RATE_LIMIT_COMPANY_RATE)
+        return PollingGuard(PostgresRateLimiter(engine, idle))
+    if RATE_LIMIT_BACKEND == "off":
+        return PollingGuard(None)
+    return PollingGuard(MemoryRateLimiter())
+
+
+def retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
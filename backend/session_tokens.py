@@ -0,0 +1,184 @@
+"""
+Signed session tokens.
+
+Login returns a short-lived access token and a long-lived refresh token,
+both <claims>.<signature>: base64url JSON and an HMAC-SHA256 of it keyed
+with SESSION_SECRET. Checking one is a hash and a JSON parse, with no
+database round trip.
+
+The access token carries the user id, the user role and the user's
+company roles, so require_company_access can skip its company_members
+query on reads. Writes still check the membership in the database, so a
+removed member loses write access at once but can keep reading until the
+token is refreshed, at most ACCESS_TOKEN_TTL seconds later. Refreshing
+re-reads the user and the memberships, and is refused once the password
+has changed.
+
+Every worker must sign with the same secret. Without SESSION_SECRET one is
+generated once and kept in STORAGE_DIR/session-secret, which works for
+workers sharing that directory; set SESSION_SECRET everywhere else.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from contextvars import ContextVar
+from typing import NamedTuple
+
+from fastapi import HTTPException
+
+from uploads import STORAGE_DIR
+
+logger = logging.getLogger("snug-api")
+
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", "900"))
+REFRESH_TOKEN_TTL = int(os.getenv("REFRESH_TOKEN_TTL", str(30 * 24 * 3600)))
+# users in more companies get tokens without company roles and are checked against the database
+TOKEN_COMPANIES_MAX = int(os.getenv("TOKEN_COMPANIES_MAX", "200"))
+# reject company requests that only carry a bare user_id
+REQUIRE_SESSION_TOKEN = os.getenv("REQUIRE_SESSION_TOKEN", "0") == "1"
+
+SESSION_SECRET_FILE = STORAGE_DIR / "session-secret"
+
+
+def _load_secret() -> bytes:
+    configured = os.getenv("SESSION_SECRET", "")
+    if configured:
+        return configured.encode("utf-8")
+    logger.warning("SESSION_SECRET is not set; using the secret in %s", SESSION_SECRET_FILE)
+    if not SESSION_SECRET_FILE.exists():
+        SESSION_SECRET_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = SESSION_SECRET_FILE.with_name(f"session-secret.{os.getpid()}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="ascii") as f:
+            f.write(secrets.token_hex(32))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # link fails if another worker got there first; everyone then reads the winner's
+            os.link(tmp_path, SESSION_SECRET_FILE)
+        except FileExistsError:
+            pass
+        finally:
+            tmp_path.unlink(missing_ok=True)
+    return SESSION_SECRET_FILE.read_text(encoding="ascii").strip().encode("ascii")
+
+
+_secret = _load_secret()
+
+
+class SessionClaims(NamedTuple):
+    user_id: int
+    role: str | None
+    # company id -> member role; None when the token does not list them
+    companies: dict[int, str] | None
+    expires_at: int
+
+
+_current_session: ContextVar[SessionClaims | None] = ContextVar("current_session", default=None)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _invalid(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def _sign(claims: dict) -> str:
+    body = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    signature = hmac.new(_secret, body.encode("ascii"), hashlib.sha256).digest()
+    return f"{body}.{_b64encode(signature)}"
+
+
+def _verify(token: str, kind: str) -> dict:
+    body, _, signature = token.partition(".")
+    expected = hmac.new(_secret, body.encode("ascii", "replace"), hashlib.sha256).digest()
+    try:
+        valid = hmac.compare_digest(_b64decode(signature), expected)
+        claims = json.loads(_b64decode(body)) if valid else None
+    except (binascii.Error, ValueError):
+        valid = False
+    if not valid or not isinstance(claims, dict) or claims.get("typ") != kind:
+        raise _invalid("Invalid token")
+    if claims.get("exp", 0) <= time.time():
+        raise _invalid("Token expired")
+    return claims
+
+
+def password_stamp(password_hash: str) -> str:
+    """Short fingerprint of the stored password hash; a password change invalidates refresh tokens."""
+    return hashlib.sha256(password_hash.encode("utf-8")).hexdigest()[:16]
+
+
+def issue_tokens(user_id: int, role: str | None, password_hash: str, company_roles: dict[int, str]) -> dict:
+    now = int(time.time())
+    companies = (
+        {str(company_id): member_role for company_id, member_role in company_roles.items()}
+        if len(company_roles) <= TOKEN_COMPANIES_MAX
+        else None
+    )
+    access_token = _sign({"typ": "access", "sub": user_id, "role": role, "cos": companies, "exp": now + ACCESS_TOKEN_TTL})
+    refresh_token = _sign(
+        {
+            "typ": "refresh",
+            "sub": user_id,
+            "pwd": password_stamp(password_hash),
+            "exp": now + REFRESH_TOKEN_TTL,
+            "jti": secrets.token_hex(8),
+        }
+    )
+    return {
+        "accessToken": access_token,
+        "refreshToken": refresh_token,
+        "tokenType": "Bearer",
+        "expiresIn": ACCESS_TOKEN_TTL,
+    }
+
+
+def verify_access_token(token: str) -> SessionClaims:
+    claims = _verify(token, "access")
+    companies = claims.get("cos")
+    return SessionClaims(
+        int(claims["sub"]),
+        claims.get("role"),
+        {int(company_id): member_role for company_id, member_role in companies.items()} if companies is not None else None,
+        int(claims["exp"]),
+    )
+
+
+def verify_refresh_token(token: str) -> tuple[int, str]:
+    """(user id, password stamp) of a valid refresh token."""
+    claims = _verify(token, "refresh")
+    return int(claims["sub"]), claims.get("pwd", "")
+
+
+def bearer_token(authorization: str | None) -> str | None:
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    return token.strip() or None if scheme.lower() == "bearer" else None
+
+
+def current_session() -> SessionClaims | None:
+    """Claims of the request's access token, set by the session middleware in main."""
+    return _current_session.get()
+
+
+def set_current_session(claims: SessionClaims | None):
+    return _current_session.set(claims)
+
+
+def reset_current_session(reset_token) -> None:
+    _current_session.reset(reset_token)
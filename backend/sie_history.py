@@ -0,0 +1,237 @@
+"""
+Versioned SIE history.
+
+Every save of CompanySIEState appends a row to company_sie_versions. Most
+rows are line diffs against the previous version; every
+SNAPSHOT_INTERVAL versions (or when a diff would not be much smaller) a full
+snapshot is stored instead. Rebuilding version N therefore reads one
+snapshot plus at most SNAPSHOT_INTERVAL - 1 diffs.
+"""
+
+import json
+import os
+import zlib
+from difflib import SequenceMatcher
+
+from sqlalchemy.orm import Session
+
+from models import CompanySIEVersion
+
+# Upper bound on the diff chain between two full snapshots.
+SNAPSHOT_INTERVAL = int(os.getenv("SIE_SNAPSHOT_INTERVAL", "32"))
+
+# A diff larger than this share of the text is stored as a snapshot instead.
+MAX_DELTA_RATIO = 0.1
+
+# Changed regions longer than this (in lines) are not diffed line by line,
+# SequenceMatcher gets slow on large rewrites; they become one replace op.
+DIFF_MAX_LINES = 20_000
+
+
+def _compress(data: bytes) -> bytes:
+    return zlib.compress(data, 6)
+
+
+def make_delta(old: str, new: str) -> list:
+    """
+    Ops turning `old` into `new`: [[start, end, [lines...]], ...], where
+    old lines [start, end) are replaced by the given lines. Line endings are
+    kept, so the text round-trips exactly.
+    """
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+
+    # SIE edits are mostly appends or local changes: trim the common ends first
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[len(a) - 1 - suffix] == b[len(b) - 1 - suffix]:
+        suffix += 1
+
+    mid_a = a[prefix:len(a) - suffix]
+    mid_b = b[prefix:len(b) - suffix]
+    if not mid_a and not mid_b:
+        return []
+    if not mid_a or not mid_b or len(mid_a) + len(mid_b) > DIFF_MAX_LINES:
+        return [[prefix, prefix + len(mid_a), mid_b]]
+
+    ops = []
+    matcher = SequenceMatcher(None, mid_a, mid_b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            ops.append([prefix + i1, prefix + i2, mid_b[j1:j2]])
+    return ops
+
+
+def apply_delta(lines: list[str], ops: list) -> list[str]:
+    out: list[str] = []
+    pos = 0
+    for start, end, replacement in ops:
+        out.extend(lines[pos:start])
+        out.extend(replacement)
+        pos = end
+    out.extend(lines[pos:])
+    return out
+
+
+def encode_version(old: str | None, new: str, since_snapshot: int | None) -> tuple[str, bytes]:
+    """
+    Pick the storage form for a new version. `since_snapshot` is the number
+    of versions since the last snapshot (None if there is no usable previous
+    version). Returns (kind, compressed payload).
+    """
+    if old is not None and since_snapshot is not None and since_snapshot < SNAPSHOT_INTERVAL:
+        payload = _compress(json.dumps(make_delta(old, new), ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        if len(payload) <= max(len(new) * MAX_DELTA_RATIO, 1024):
+            return "delta", payload
+    return "snapshot", _compress(new.encode("utf-8"))
+
+
+def record_version(
+    db: Session,
+    company_id: int,
+    version: int,
+    old_content: str | None,
+    new_content: str,
+    user_id: int | None,
+) -> CompanySIEVersion:
+    """Append `version` to the history (caller commits, same transaction as the state)."""
+    previous = (
+        db.query(CompanySIEVersion.version)
+        .filter(
+            CompanySIEVersion.company_id == company_id,
+            CompanySIEVersion.version == version - 1,
+        )
+        .first()
+    )
+    since_snapshot = None
+    if previous is not None:
+        last_snapshot = (
+            db.query(CompanySIEVersion.version)
+            .filter(
+                CompanySIEVersion.company_id == company_id,
+                CompanySIEVersion.kind == "snapshot",
+                CompanySIEVersion.version < version,
+            )
+            .order_by(CompanySIEVersion.version.desc())
+            .first()
+        )
+        if last_snapshot is not None:
+            since_snapshot = version - last_snapshot[0]
+
+    kind, payload = encode_version(old_content, new_content, since_snapshot)
+    row = CompanySIEVersion(
+        company_id=company_id,
+        version=version,
+        kind=kind,
+        payload=payload,
+        content_length=len(new_content),
+        created_by_user_id=user_id,
+    )
+    db.add(row)
+    return row
+
+
+def load_version(db: Session, company_id: int, version: int) -> tuple[CompanySIEVersion, str] | None:
+    """Rebuild the SIE text of `version`; None if it is not in the history."""
+    snapshot = (
+        db.query(CompanySIEVersion)
+        .filter(
+            CompanySIEVersion.company_id == company_id,
+            CompanySIEVersion.kind == "snapshot",
+            CompanySIEVersion.version <= version,
+        )
+        .order_by(CompanySIEVersion.version.desc())
+        .first()
+    )
+    if snapshot is None:
+        return None
+
+    deltas = []
+    if snapshot.version < version:
+        deltas = (
+            db.query(CompanySIEVersion)
+            .filter(
+                CompanySIEVersion.company_id == company_id,
+                CompanySIEVersion.version > snapshot.version,
+                CompanySIEVersion.version <= version,
+            )
+            .order_by(CompanySIEVersion.version)
+            .all()
+        )
+        if len(deltas) != version - snapshot.version:
+            return None
+
+    lines = zlib.decompress(snapshot.payload).decode("utf-8").splitlines(keepends=True)
+    for row in deltas:
+        lines = apply_delta(lines, json.loads(zlib.decompress(row.payload)))
+    return (deltas[-1] if deltas else snapshot), "".join(lines)
+
+
+def _benchmark_edits(base: str, edits: int) -> list[str]:
+    # mostly appended vouchers, every fifth edit rewrites an older description
+    versions = [base]
+    text = base
+    for n in range(1, edits + 1):
+        if n % 5 == 0:
+            text = text.replace(f'"Faktura {n * 7}"', f'"Faktura {n * 7} (rättad)"', 1)
+        else:
+            text += f'#VER A {100_000 + n} 20250301 "Tillägg {n}"\n{{\n#TRANS 1930 {{}} {n}.00\n#TRANS 3001 {{}} -{n}.00\n}}\n'
+        versions.append(text)
+    return versions
+
+
+def main() -> int:
+    # python sie_history.py [vouchers] [edits] -> storage per edit and rebuild latency
+    import sys
+    import time
+
+    vouchers = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    base = ['#FLAGGA 0\n#SIETYP 4\n#KONTO 1930 "Företagskonto"\n#KONTO 3001 "Försäljning"\n']
+    for n in range(1, vouchers + 1):
+        base.append(f'#VER A {n} 202501{1 + n % 28:02d} "Faktura {n}"\n{{\n#TRANS 1930 {{}} 1000.00\n#TRANS 3001 {{}} -1000.00\n}}\n')
+    versions = _benchmark_edits("".join(base), edits)
+
+    stored: list[tuple[str, bytes]] = []
+    last_snapshot = None
+    started = time.perf_counter()
+    for index, text in enumerate(versions):
+        old = versions[index - 1] if index else None
+        kind, payload = encode_version(old, text, None if last_snapshot is None else index - last_snapshot)
+        if kind == "snapshot":
+            last_snapshot = index
+        stored.append((kind, payload))
+    encode_ms = (time.perf_counter() - started) * 1000 / len(versions)
+
+    def rebuild(target: int) -> str:
+        base_index = max(i for i in range(target + 1) if stored[i][0] == "snapshot")
+        lines = zlib.decompress(stored[base_index][1]).decode("utf-8").splitlines(keepends=True)
+        for i in range(base_index + 1, target + 1):
+            lines = apply_delta(lines, json.loads(zlib.decompress(stored[i][1])))
+        return "".join(lines)
+
+    timings = []
+    for target in range(len(versions)):
+        started = time.perf_counter()
+        text = rebuild(target)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert text == versions[target], f"version {target} does not round-trip"
+    timings.sort()
+
+    full = sum(len(v.encode("utf-8")) for v in versions)
+    history = sum(len(p) for _, p in stored)
+    deltas = [len(p) for k, p in stored if k == "delta"]
+    print(f"{len(versions)} versions of ~{len(versions[-1]) / 1024 / 1024:.1f} MB, snapshot every {SNAPSHOT_INTERVAL}")
+    print(f"full copies: {full / 1024 / 1024:.1f} MB, history: {history / 1024 / 1024:.2f} MB "
+          f"({sum(1 for k, _ in stored if k == 'snapshot')} snapshots, avg delta {sum(deltas) / max(len(deltas), 1):.0f} B)")
+    print(f"storage per edit: {history / len(versions) / 1024:.1f} KB, encode {encode_ms:.1f} ms/edit")
+    print(f"rebuild: median {timings[len(timings) // 2]:.1f} ms, max {timings[-1]:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
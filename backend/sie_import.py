@@ -0,0 +1,506 @@
+"""
+SIE parsing on the server.
+
+Mirrors parseSIEFile in src/lib/sie.ts (same tokenizer, same balance check,
+same error messages) but works as a generator over lines, so a file is never
+held in memory as a whole.
+"""
+
+import codecs
+import mmap
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from money import to_ore
+
+# Bytes inspected when guessing the file encoding.
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+# Only the first errors are kept in a summary, the rest are counted.
+MAX_SUMMARY_ERRORS = 200
+
+_LINE_RE = re.compile(r"^#(\w+)\s*(.*)?$", re.ASCII)
+_FLOAT_RE = re.compile(r"^[+-]?(?:Infinity|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)")
+_INT_RE = re.compile(r"^[+-]?\d+")
+
+
+def detect_encoding(sample: bytes) -> str:
+    """
+    SIE files are officially PC8 (CP437), but files written by browsers and
+    newer programs are often UTF-8 while still declaring "#FORMAT PC8".
+    Valid UTF-8 wins; anything else is read as CP437.
+    """
+    try:
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as exc:
+        # A multi-byte character cut at the end of the sample is not an error
+        if exc.start >= len(sample) - 3 and exc.reason == "unexpected end of data":
+            return "utf-8"
+        return "cp437"
+
+
+def iter_decoded_lines(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    """Decode byte chunks and yield lines with \\r\\n and \\r normalized away."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        # A trailing \r may be the first half of a \r\n split across chunks
+        hold = ""
+        if pending.endswith("\r"):
+            pending, hold = pending[:-1], "\r"
+        lines = pending.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        pending = lines.pop() + hold
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield from pending.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+
+def parse_sie_line(line: str) -> tuple[str, list[str]] | None:
+    match = _LINE_RE.match(line)
+    if not match:
+        return None
+
+    command = match.group(1)
+    rest = match.group(2) or ""
+
+    # Fast paths tokenizing exactly like the character loop below:
+    # - no braces: split on quotes, then on spaces (#VER, #KONTO, #FNAMN ...)
+    # - no quotes: braces only as whole "{...}" tokens (#TRANS 1930 {} 100.00)
+    if "{" not in rest and "}" not in rest:
+        values = []
+        current = ""
+        parts = rest.split('"')
+        last = len(parts) - 1
+        for index, part in enumerate(parts):
+            if index % 2:
+                current += part
+                if index < last:
+                    values.append(current)
+                    current = ""
+                continue
+            tokens = part.split(" ")
+            current += tokens[0]
+            for token in tokens[1:]:
+                if current:
+                    values.append(current)
+                current = token
+        if current:
+            values.append(current)
+        return command, values
+
+    if '"' not in rest:
+        tokens = rest.split(" ")
+        if all(
+            ("{" not in t and "}" not in t)
+            or (t[0] == "{" and t[-1] == "}" and t.count("{") == 1 and t.count("}") == 1)
+            for t in tokens
+        ):
+            return command, [t for t in tokens if t]
+
+    values: list[str] = []
+    current = ""
+    in_quotes = False
+    i = 0
+    while i < len(rest):
+        char = rest[i]
+        if char == '"':
+            if in_quotes:
+                values.append(current)
+                current = ""
+                in_quotes = False
+            else:
+                in_quotes = True
+        elif char == " " and not in_quotes:
+            if current:
+                values.append(current)
+                current = ""
+        elif char == "{" and not in_quotes:
+            close_index = rest.find("}", i)
+            if close_index > i:
+                values.append(rest[i:close_index + 1])
+                i = close_index
+        elif char != "}" or in_quotes:
+            current += char
+        i += 1
+
+    if current:
+        values.append(current)
+    return command, values
+
+
+def parse_sie_date(value: str | None) -> str | None:
+    if not value or len(value) != 8:
+        return None
+    return f"{value[0:4]}-{value[4:6]}-{value[6:8]}"
+
+
+def _parse_float(value: str | None) -> float:
+    # Same result as `parseFloat(value) || 0` in JS
+    if not value:
+        return 0.0
+    match = _FLOAT_RE.match(value.lstrip())
+    if not match:
+        return 0.0
+    number = float(match.group(0).replace("Infinity", "inf"))
+    return number if number == number else 0.0
+
+
+def _parse_int(value: str | None) -> int:
+    match = _INT_RE.match((value or "").lstrip())
+    return int(match.group(0)) if match else 0
+
+
+def format_js_number(value: float) -> str:
+    """Render a float the way JS template strings do (12 rather than 12.0)."""
+    if value == int(value) and abs(value) < 1e21:
+        return str(int(value))
+    return repr(value)
+
+
+def unbalanced_detail(voucher: dict, total_debit_ore: int, total_credit_ore: int) -> str:
+    return (
+        f"Voucher {voucher['series']}{voucher['number']} is unbalanced "
+        f"(debit: {format_js_number(total_debit_ore / 100)}, credit: {format_js_number(total_credit_ore / 100)})"
+    )
+
+
+def format_error(line_number: int, detail: str) -> str:
+    return f"Line {line_number}: {detail}"
+
+
+def iter_sie_records(lines: Iterable[str], accounts: dict[str, str] | None = None, first_line_number: int = 1):
+    """
+    Yield parse events one at a time:
+      ("metadata", key, value)
+      ("account", {"number", "name"})
+      ("voucher", {"series", "number", "date", "description", "lines": [...]})
+      ("error", line_number, detail)   -> format_error() gives the parseSIEFile text
+
+    `accounts` collects #KONTO names and is used to name #TRANS lines; pass a
+    pre-filled dict when parsing a slice of a file.
+    """
+    if accounts is None:
+        accounts = {}
+    current = None
+    line_number = first_line_number - 1
+
+    for line in lines:
+        line_number += 1
+        # JS trim() also drops a byte order mark
+        trimmed = line.strip().strip("\ufeff")
+        if not trimmed:
+            continue
+
+        if trimmed == "}":
+            if current is not None:
+                # compared in öre, as the lines are stored, like parseSIEFile
+                total_debit = sum(to_ore(l["debit"]) for l in current["lines"])
+                total_credit = sum(to_ore(l["credit"]) for l in current["lines"])
+                if total_debit != total_credit:
+                    yield "error", line_number, unbalanced_detail(current, total_debit, total_credit)
+                elif current["lines"]:
+                    yield "voucher", current
+                current = None
+            continue
+
+        if not trimmed.startswith("#"):
+            continue
+
+        parsed = parse_sie_line(trimmed)
+        if not parsed:
+            continue
+        command, values = parsed
+
+        if command == "FNAMN":
+            yield "metadata", "companyName", values[0] if values else ""
+        elif command == "ORGNR":
+            yield "metadata", "organizationNumber", values[0] if values else ""
+        elif command == "RAR":
+            if len(values) >= 3 and values[0] == "0":
+                start = parse_sie_date(values[1])
+                end = parse_sie_date(values[2])
+                if start:
+                    yield "metadata", "fiscalYearStart", start
+                if end:
+                    yield "metadata", "fiscalYearEnd", end
+        elif command == "KONTO":
+            if len(values) >= 2 and values[0] and values[1]:
+                accounts.setdefault(values[0], values[1])
+                yield "account", {"number": values[0], "name": values[1]}
+        elif command == "VER":
+            if len(values) >= 3:
+                date = parse_sie_date(values[2])
+                if date:
+                    current = {
+                        "series": values[0] or "A",
+                        "number": _parse_int(values[1]),
+                        "date": date,
+                        "description": values[3] if len(values) > 3 else "",
+                        "lines": [],
+                    }
+        elif command == "TRANS":
+            if current is not None and len(values) >= 2:
+                account_number = values[0]
+                amount_index = 2 if values[1] == "{}" else 1
+                amount = _parse_float(values[amount_index] if len(values) > amount_index else None)
+                if account_number:
+                    current["lines"].append({
+                        "accountNumber": account_number,
+                        "accountName": accounts.get(account_number) or f"Account {account_number}",
+                        "debit": amount if amount > 0 else 0,
+                        "credit": abs(amount) if amount < 0 else 0,
+                    })
+
+
+def parse_sie(lines: Iterable[str]) -> dict:
+    """Collect a full result shaped like SIEParseResult in src/lib/sie.ts."""
+    result = {"accounts": [], "vouchers": [], "metadata": {}, "errors": []}
+    for record in iter_sie_records(lines):
+        kind = record[0]
+        if kind == "metadata":
+            result["metadata"][record[1]] = record[2]
+        elif kind == "account":
+            result["accounts"].append(record[1])
+        elif kind == "voucher":
+            result["vouchers"].append(record[1])
+        else:
+            result["errors"].append(format_error(record[1], record[2]))
+    return result
+
+
+def summarize_sie(lines: Iterable[str]) -> dict:
+    """Count what a file contains without keeping vouchers around (constant memory)."""
+    summary = {
+        "metadata": {},
+        "accountCount": 0,
+        "voucherCount": 0,
+        "transactionCount": 0,
+        "firstVoucherDate": None,
+        "lastVoucherDate": None,
+        "errorCount": 0,
+        "errors": [],
+    }
+    for record in iter_sie_records(lines):
+        kind = record[0]
+        if kind == "metadata":
+            summary["metadata"][record[1]] = record[2]
+        elif kind == "account":
+            summary["accountCount"] += 1
+        elif kind == "voucher":
+            voucher = record[1]
+            summary["voucherCount"] += 1
+            summary["transactionCount"] += len(voucher["lines"])
+            if summary["firstVoucherDate"] is None or voucher["date"] < summary["firstVoucherDate"]:
+                summary["firstVoucherDate"] = voucher["date"]
+            if summary["lastVoucherDate"] is None or voucher["date"] > summary["lastVoucherDate"]:
+                summary["lastVoucherDate"] = voucher["date"]
+        else:
+            summary["errorCount"] += 1
+            if len(summary["errors"]) < MAX_SUMMARY_ERRORS:
+                summary["errors"].append(format_error(record[1], record[2]))
+    return summary
+
+
+# ------------------------------------------------------------
+# Parallel parsing of large files
+# ------------------------------------------------------------
+# The file is cut right before a #VER line (with a valid date), where the
+# sequential parser has no state except the account names. Each chunk is
+# parsed in its own process; the ordered event lists are then replayed so
+# account naming, metadata and error line numbers match a sequential parse.
+PARALLEL_MIN_BYTES = int(os.getenv("SIE_PARALLEL_MIN_BYTES", str(8 * 1024 * 1024)))
+PARSE_WORKERS = int(os.getenv("SIE_PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+_NEWLINE_RE = re.compile(rb"\r\n|\r|\n")
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        return _pool
+
+
+def shutdown_parse_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _is_voucher_start(raw_line: bytes) -> bool:
+    trimmed = raw_line.strip()
+    if not trimmed.startswith(b"#VER"):
+        return False
+    # VER lines are ASCII up to the description, which is all we look at
+    parsed = parse_sie_line(trimmed.decode("latin-1"))
+    if not parsed or parsed[0] != "VER":
+        return False
+    values = parsed[1]
+    return len(values) >= 3 and parse_sie_date(values[2]) is not None
+
+
+def find_chunk_offsets(path: Path, chunks: int) -> list[int]:
+    """Byte offsets where chunks start (always begins with 0)."""
+    size = path.stat().st_size
+    offsets = [0]
+    if chunks <= 1 or size == 0:
+        return offsets
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, chunks):
+            pos = max(size * i // chunks, offsets[-1] + 1)
+            # move to the start of the next full line
+            match = _NEWLINE_RE.search(mm, pos - 1) if pos > 0 else None
+            if not match:
+                break
+            line_start = match.end()
+            while line_start < size:
+                nl = _NEWLINE_RE.search(mm, line_start)
+                line_end = nl.start() if nl else size
+                if _is_voucher_start(mm[line_start:line_end]):
+                    break
+                line_start = nl.end() if nl else size
+            if line_start >= size:
+                break
+            if line_start > offsets[-1]:
+                offsets.append(line_start)
+    return offsets
+
+
+def _iter_range(path: Path, start: int, end: int, chunk_size: int = 1024 * 1024):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                return
+            remaining -= len(data)
+            yield data
+
+
+def _parse_chunk(path: str, encoding: str, start: int, end: int) -> tuple[list, int]:
+    """Worker: parse one byte range, return its events and its line count."""
+    line_count = 0
+
+    def counted(lines):
+        nonlocal line_count
+        for line in lines:
+            line_count += 1
+            yield line
+
+    lines = counted(iter_decoded_lines(_iter_range(Path(path), start, end), encoding))
+    events = list(iter_sie_records(lines))
+    return events, line_count
+
+
+def merge_chunk_events(chunk_results: Iterable[tuple[list, int]]) -> dict:
+    """Replay per-chunk events in file order into one SIEParseResult-shaped dict."""
+    result = {"accounts": [], "vouchers": [], "metadata": {}, "errors": []}
+    accounts: dict[str, str] = {}
+    line_offset = 0
+
+    for events, line_count in chunk_results:
+        for record in events:
+            kind = record[0]
+            if kind == "metadata":
+                result["metadata"][record[1]] = record[2]
+            elif kind == "account":
+                account = record[1]
+                accounts.setdefault(account["number"], account["name"])
+                result["accounts"].append(account)
+            elif kind == "voucher":
+                voucher = record[1]
+                # names resolved against accounts seen earlier in the whole file
+                for line in voucher["lines"]:
+                    number = line["accountNumber"]
+                    line["accountName"] = accounts.get(number) or f"Account {number}"
+                result["vouchers"].append(voucher)
+            else:
+                result["errors"].append(format_error(record[1] + line_offset, record[2]))
+        line_offset += line_count
+    return result
+
+
+def parse_sie_file(path: Path, encoding: str | None = None, workers: int | None = None) -> dict:
+    """
+    Parse a stored SIE file. Files above PARALLEL_MIN_BYTES are split at #VER
+    boundaries and parsed across a process pool; smaller files are parsed
+    inline since process start-up and pickling would dominate.
+    """
+    path = Path(path)
+    if encoding is None:
+        with open(path, "rb") as f:
+            encoding = detect_encoding(f.read(ENCODING_SNIFF_BYTES))
+
+    workers = workers or PARSE_WORKERS
+    size = path.stat().st_size
+    if workers <= 1 or size < PARALLEL_MIN_BYTES:
+        return merge_chunk_events([_parse_chunk(str(path), encoding, 0, size)])
+
+    offsets = find_chunk_offsets(path, workers * 4)
+    ranges = list(zip(offsets, offsets[1:] + [size]))
+    pool = _get_pool() if workers == PARSE_WORKERS else ProcessPoolExecutor(max_workers=workers)
+    try:
+        results = pool.map(
+            _parse_chunk,
+            [str(path)] * len(ranges),
+            [encoding] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges],
+        )
+        return merge_chunk_events(results)
+    finally:
+        if pool is not _pool:
+            pool.shutdown()
+
+
+def _write_benchmark_file(path: Path, vouchers: int) -> None:
+    with open(path, "w", encoding="cp437", newline="\r\n") as f:
+        f.write('#FLAGGA 0\n#FORMAT PC8\n#SIETYP 4\n#FNAMN "Benchmark AB"\n#RAR 0 20250101 20251231\n')
+        f.write('#KONTO 1930 "Företagskonto"\n#KONTO 3001 "Försäljning"\n#KONTO 2611 "Utgående moms"\n')
+        for n in range(1, vouchers + 1):
+            day = 1 + n % 28
+            f.write(f'#VER A {n} 202501{day:02d} "Faktura {n}"\n{{\n')
+            f.write("#TRANS 1930 {} 1250.00\n#TRANS 3001 {} -1000.00\n#TRANS 2611 {} -250.00\n}\n")
+
+
+def main() -> int:
+    # python sie_import.py [file.se] -> parse timings for 1/2/4/8 workers
+    import sys
+    import tempfile
+    import time
+
+    if len(sys.argv) > 1:
+        path = Path(sys.argv[1])
+    else:
+        path = Path(tempfile.gettempdir()) / "sie_benchmark.se"
+        if not path.exists():
+            _write_benchmark_file(path, 500_000)
+
+    print(f"{path} ({path.stat().st_size / 1024 / 1024:.1f} MB), {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in (1, 2, 4, 8):
+        started = time.perf_counter()
+        result = parse_sie_file(path, workers=workers)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"workers={workers}: {elapsed:.2f}s ({baseline / elapsed:.2f}x), {len(result['vouchers'])} vouchers")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
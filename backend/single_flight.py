@@ -0,0 +1,106 @@
+"""
+Request coalescing for hot polling reads.
+
+Every open tab polls the company lock, the takeover requests and the SIE
+state, and the tabs of one company tend to ask at the same moment.
+ReadCoalescer.do(route, company_id, params, fn) runs fn once per key:
+callers that arrive while it runs wait for that result instead of
+querying themselves, and for COALESCE_WINDOW_MS afterwards the result is
+served from memory.
+
+Keys start with (route, company_id). Any write to a company bumps its
+generation (invalidate), and the generation is part of the key, so a read
+started before a write is never handed to a request made after it.
+Errors are passed to the callers that waited for them but not cached.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+COALESCE_WINDOW_MS = int(os.getenv("COALESCE_WINDOW_MS", "250"))
+# results kept for the window; the oldest are dropped beyond this
+COALESCE_CACHE_SIZE = int(os.getenv("COALESCE_CACHE_SIZE", "4096"))
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class ReadCoalescer:
+    def __init__(self, window_ms: int = COALESCE_WINDOW_MS, cache_size: int = COALESCE_CACHE_SIZE):
+        self.window = window_ms / 1000
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._in_flight: dict[Hashable, _Flight] = {}
+        # key -> (expires at, result); insertion order is expiry order
+        self._results: dict[Hashable, tuple[float, Any]] = {}
+        self._generations: dict[int, int] = {}
+        self._counters = {"requests": 0, "executed": 0, "collapsed": 0, "cached": 0}
+
+    def do(self, route: str, company_id: int, params: tuple, fn: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self._counters["requests"] += 1
+            key = (route, company_id, self._generations.get(company_id, 0), params)
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > now:
+                self._counters["cached"] += 1
+                return cached[1]
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self._counters["executed"] += 1
+            else:
+                self._counters["collapsed"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if flight.error is None and self.window > 0:
+                    self._store(key, flight.result, time.monotonic())
+            flight.done.set()
+        return flight.result
+
+    def _store(self, key: Hashable, result: Any, now: float) -> None:
+        self._results.pop(key, None)
+        self._results[key] = (now + self.window, result)
+        # drop expired results from the front, then the oldest over the limit
+        while self._results:
+            oldest = next(iter(self._results))
+            if self._results[oldest][0] > now and len(self._results) <= self.cache_size:
+                break
+            del self._results[oldest]
+
+    def invalidate(self, company_id: int) -> None:
+        """After a write to the company: later reads start a fresh query."""
+        with self._lock:
+            self._generations[company_id] = self._generations.get(company_id, 0) + 1
+            for key in [key for key in self._results if key[1] == company_id]:
+                del self._results[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["inFlight"] = len(self._in_flight)
+            counters["cachedResults"] = len(self._results)
+        counters["windowMs"] = int(self.window * 1000)
+        return counters
@@ -0,0 +1,149 @@
+"""
+Dashboard key figures.
+
+Read from ledger_monthly_totals (one row per company, month and account,
+rebuilt by ledger.sync_ledger) instead of the ledger lines, so a year of
+figures is a few hundred rows whatever the voucher count. The rows become
+one int64 month x account matrix, and every figure is an exact integer sum
+over it. Results are cached per ledger version: a new SIE save bumps the
+version and misses the cache.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ledger import debit_normal
+from models import LedgerMonthlyTotal
+
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "1024"))
+
+_summary_cache: OrderedDict = OrderedDict()
+_summary_cache_lock = threading.Lock()
+
+
+def _month_index(month: date) -> int:
+    return month.year * 12 + month.month - 1
+
+
+def _add_months(month: date, count: int) -> date:
+    index = _month_index(month) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _is_revenue(account: str) -> bool:
+    return account.startswith("3") or account == "8310"
+
+
+def _is_expense(account: str) -> bool:
+    # same split as ledger.income_statement / getIncomeStatement() in the browser
+    return account[:1] in ("4", "5", "6", "7") or (account.startswith("8") and account not in ("8310", "8999"))
+
+
+def _is_vat(account: str) -> bool:
+    return "2610" <= account[:4] <= "2649"
+
+
+def _figures(balances: np.ndarray, kinds: dict[str, np.ndarray]) -> list[dict]:
+    """
+    Key figures per row of a [row, account] matrix of öre balances (debit
+    positive). Revenue and expenses are signed sums of the balances in each
+    account's normal direction, as in getIncomeStatement(), so a refund or
+    correction nets out and revenue - expenses is always netResult.
+    """
+    signed = np.where(kinds["debit_normal"], balances, -balances)
+    revenue = np.where(kinds["revenue"], signed, 0).sum(axis=1)
+    expense = np.where(kinds["expense"], signed, 0).sum(axis=1)
+    vat = -np.where(kinds["vat"], balances, 0).sum(axis=1)
+    return [
+        {"revenue": r / 100, "expenses": e / 100, "netResult": (r - e) / 100, "vatDue": v / 100}
+        for r, e, v in zip(revenue.tolist(), expense.tolist(), vat.tolist())
+    ]
+
+
+def company_summary(
+    db: Session,
+    company_id: int,
+    ledger_version: int | None,
+    start: date,
+    end: date,
+    today: date | None = None,
+) -> dict:
+    """
+    Revenue, expenses, net result and VAT due for start..end (whole months)
+    with a per-month breakdown, plus the net result of the 12 months up to
+    the end of the period or the current month, whichever is earlier.
+    """
+    first_month = start.replace(day=1)
+    last_month = end.replace(day=1)
+    rolling_end = min(last_month, (today or date.today()).replace(day=1))
+    rolling_start = _add_months(rolling_end, -11)
+
+    key = (company_id, ledger_version, first_month, last_month, rolling_end)
+    with _summary_cache_lock:
+        if key in _summary_cache:
+            _summary_cache.move_to_end(key)
+            return _summary_cache[key]
+
+    rows = (
+        db.query(LedgerMonthlyTotal.month, LedgerMonthlyTotal.account, LedgerMonthlyTotal.debit_ore, LedgerMonthlyTotal.credit_ore)
+        .filter(
+            LedgerMonthlyTotal.company_id == company_id,
+            LedgerMonthlyTotal.month >= min(first_month, rolling_start),
+            LedgerMonthlyTotal.month <= max(last_month, rolling_end),
+        )
+        .all()
+    )
+
+    first_index = _month_index(min(first_month, rolling_start))
+    month_count = _month_index(max(last_month, rolling_end)) - first_index + 1
+    accounts = sorted({row[1] for row in rows})
+    column = {account: i for i, account in enumerate(accounts)}
+    balances = np.zeros((month_count, len(accounts)), dtype=np.int64)
+    if rows:
+        np.add.at(
+            balances,
+            (
+                np.array([_month_index(row[0]) - first_index for row in rows], dtype=np.int64),
+                np.array([column[row[1]] for row in rows], dtype=np.int64),
+            ),
+            np.array([int(row[2]) - int(row[3]) for row in rows], dtype=np.int64),
+        )
+    kinds = {
+        "debit_normal": np.array([debit_normal(a) for a in accounts], dtype=bool),
+        "revenue": np.array([_is_revenue(a) for a in accounts], dtype=bool),
+        "expense": np.array([_is_expense(a) for a in accounts], dtype=bool),
+        "vat": np.array([_is_vat(a) for a in accounts], dtype=bool),
+    }
+
+    period_rows = slice(_month_index(first_month) - first_index, _month_index(last_month) - first_index + 1)
+    rolling_rows = slice(_month_index(rolling_start) - first_index, _month_index(rolling_end) - first_index + 1)
+    month_figures = _figures(balances[period_rows], kinds)
+    period_figures, rolling_figures = _figures(
+        np.stack((balances[period_rows].sum(axis=0), balances[rolling_rows].sum(axis=0))), kinds
+    )
+
+    months = []
+    month = first_month
+    for figures in month_figures:
+        months.append({"month": month.strftime("%Y-%m"), **figures})
+        month = _add_months(month, 1)
+
+    summary = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "ledgerVersion": ledger_version,
+        **period_figures,
+        "months": months,
+        "rolling12Start": rolling_start.isoformat(),
+        "rolling12NetResult": rolling_figures["netResult"],
+    }
+    with _summary_cache_lock:
+        _summary_cache[key] = summary
+        while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+    return summary
@@ -0,0 +1,176 @@
+"""
+Streaming file uploads.
+
+The request body is written to disk chunk by chunk while a SHA-256 is
+computed, so uploads use constant memory regardless of file size. Both a raw
+body (application/octet-stream) and multipart/form-data are accepted; for
+multipart only the first file part is kept.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+STORAGE_DIR = Path(os.getenv("STORAGE_DIR", str(Path(__file__).parent / "storage")))
+
+# Upper bound for a single upload (default 1 GB).
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+
+
+class UploadedFile:
+    def __init__(self, path: Path, filename: str | None, content_type: str | None, sha256: str, size: int, head: bytes):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.sha256 = sha256
+        self.size = size
+        # first bytes of the file, handy for sniffing encodings / types
+        self.head = head
+
+    def discard(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class _HashingWriter:
+    def __init__(self, directory: Path, head_bytes: int):
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        self.file = os.fdopen(fd, "wb")
+        self.path = Path(name)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self._head_bytes = head_bytes
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        self.size += len(data)
+        if self.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="File too large")
+        if len(self.head) < self._head_bytes:
+            self.head += data[: self._head_bytes - len(self.head)]
+        self.hasher.update(data)
+        self.file.write(data)
+
+    def abort(self) -> None:
+        self.file.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class _MultipartFileSink:
+    """Feeds python-multipart and forwards the first file part to a writer."""
+
+    def __init__(self, boundary: bytes, writer: _HashingWriter):
+        self.writer = writer
+        self.filename: str | None = None
+        self.content_type: str | None = None
+        self.file_done = False
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: dict[bytes, bytes] = {}
+        self._in_file = False
+        self.parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._in_file = False
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if filename is not None and not self.file_done:
+            self._in_file = True
+            self.filename = filename.decode("utf-8", errors="replace")
+            ctype = self._headers.get(b"content-type")
+            self.content_type = ctype.decode("latin-1") if ctype else None
+
+    def _on_part_data(self, data, start, end):
+        if self._in_file:
+            self.writer.write(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self.file_done = True
+
+
+async def receive_upload(request: Request, directory: Path, filename: str | None = None, head_bytes: int = 64 * 1024) -> UploadedFile:
+    """
+    Stream the request body into a temporary file under `directory`.
+    The caller decides where the file ends up (see UploadedFile.path).
+    """
+    writer = _HashingWriter(directory, head_bytes)
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    sink = None
+    try:
+        if content_type == b"multipart/form-data":
+            boundary = options.get(b"boundary")
+            if not boundary:
+                raise HTTPException(status_code=400, detail="Missing multipart boundary")
+            sink = _MultipartFileSink(boundary, writer)
+            async for chunk in request.stream():
+                sink.parser.write(chunk)
+            sink.parser.finalize()
+            if not sink.file_done:
+                raise HTTPException(status_code=400, detail="No file part in upload")
+        else:
+            async for chunk in request.stream():
+                writer.write(chunk)
+        writer.file.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    if sink is not None:
+        filename = filename or sink.filename
+        file_content_type = sink.content_type
+    else:
+        file_content_type = content_type.decode("latin-1") or None
+
+    return UploadedFile(
+        path=writer.path,
+        filename=filename,
+        content_type=file_content_type,
+        sha256=writer.hasher.hexdigest(),
+        size=writer.size,
+        head=writer.head,
+    )
+
+
+def iter_file_chunks(path: Path, chunk_size: int = 1024 * 1024):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
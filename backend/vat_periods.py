@@ -0,0 +1,92 @@
+"""
+VAT period locking.
+
+A locked period keeps the VAT report box totals that were filed for it, so
+historical reports are read back instead of recomputed, and a digest of its
+vouchers so sie-state saves cannot change it afterwards (see
+ledger.sync_ledger).
+
+Box totals are computed by the client (computeReportBoxes in
+src/lib/vat/report.ts): they depend on the VAT code of each voucher line and
+on invoices, neither of which is part of the SIE state.
+"""
+
+import re
+from datetime import date
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from ledger import ledger_digest, period_bounds, to_ore
+from models import VatPeriodBox, VatPeriodLock
+
+_BOX_RE = re.compile(r"^\d{2}$")
+
+
+def vat_period_bounds(period_key: str) -> tuple[date, date]:
+    bounds = period_bounds(period_key)
+    if not bounds:
+        raise HTTPException(status_code=400, detail="Invalid VAT period")
+    return bounds
+
+
+def lock_vat_period(db: Session, company_id: int, period_key: str, boxes: dict[str, float], user_id: int) -> VatPeriodLock:
+    """Lock a period and store its box totals (caller commits). The ledger must be up to date."""
+    start, end = vat_period_bounds(period_key)
+    existing = (
+        db.query(VatPeriodLock.id)
+        .filter(VatPeriodLock.company_id == company_id, VatPeriodLock.period_key == period_key)
+        .first()
+    )
+    if existing:
+        raise HTTPException(status_code=409, detail=f"VAT period {period_key} is already locked")
+    for box in boxes:
+        if not _BOX_RE.match(box):
+            raise HTTPException(status_code=400, detail=f"Invalid VAT box {box}")
+
+    lock = VatPeriodLock(
+        company_id=company_id,
+        period_key=period_key,
+        start_date=start,
+        end_date=end,
+        digest=ledger_digest(db, company_id, start, end),
+        locked_by_user_id=user_id,
+    )
+    db.add(lock)
+    db.flush()
+    for box, amount in sorted(boxes.items()):
+        db.add(VatPeriodBox(lock_id=lock.id, box=box, amount_ore=to_ore(amount)))
+    return lock
+
+
+def unlock_vat_period(db: Session, company_id: int, period_key: str) -> None:
+    """Remove a lock and its stored totals (caller commits)."""
+    lock = (
+        db.query(VatPeriodLock)
+        .filter(VatPeriodLock.company_id == company_id, VatPeriodLock.period_key == period_key)
+        .first()
+    )
+    if not lock:
+        raise HTTPException(status_code=404, detail=f"VAT period {period_key} is not locked")
+    db.query(VatPeriodBox).filter(VatPeriodBox.lock_id == lock.id).delete(synchronize_session=False)
+    db.delete(lock)
+
+
+def vat_period_report(db: Session, company_id: int, period_key: str) -> dict | None:
+    """Stored box totals of a locked period, or None if it is not locked."""
+    lock = (
+        db.query(VatPeriodLock)
+        .filter(VatPeriodLock.company_id == company_id, VatPeriodLock.period_key == period_key)
+        .first()
+    )
+    if not lock:
+        return None
+    boxes = db.query(VatPeriodBox.box, VatPeriodBox.amount_ore).filter(VatPeriodBox.lock_id == lock.id).all()
+    return {
+        "periodKey": lock.period_key,
+        "startDate": lock.start_date.isoformat(),
+        "endDate": lock.end_date.isoformat(),
+        "lockedAt": lock.locked_at.isoformat() if lock.locked_at else None,
+        "lockedByUserId": lock.locked_by_user_id,
+        "boxes": {box: amount / 100 for box, amount in sorted(boxes)},
+    }
@@ -30,6 +30,13 @@ if [[ -z "${USER_ID}" ]]; then
   fail "Failed to create test user."
 fi
 
+echo "Checking customer bulk import..."
+if ! printf 'type,name,address,postalCode,city,country\ncompany,Bulk AB,Gatan 1,11122,Stockholm,Sverige\n' \
+  | curl -fsS -X POST "${BASE_API_URL}/customers/bulk-import?user_id=${USER_ID}" \
+    -H "Content-Type: text/csv" --data-binary @- | grep -q '"imported":1'; then
+  fail "Customer bulk import failed."
+fi
+
 echo "Checking script-runner (declaration PDF)..."
 if ! curl -fsS -X POST "${BASE_SCRIPT_URL}/api/scripts/run" \
   -H "Content-Type: application/json" \
@@ -12,6 +12,7 @@ import {
   AlertDialogHeader,
   AlertDialogTitle,
 } from "@/components/ui/alert-dialog";
+import { authFetch } from "@/lib/api";
 
 type TakeoverRequestRow = {
   id: number;
@@ -66,7 +67,7 @@ export function TakeoverListener(props: {
 
     try {
       const url = API_BASE_URL + "/companies/" + companyId + "/takeover-requests";
-      const res = await fetch(url, { method: "GET" });
+      const res = await authFetch(url, { method: "GET" });
       if (!res.ok) return;
 
       const data = (await res.json()) as TakeoverListResponse;
@@ -117,7 +118,7 @@ export function TakeoverListener(props: {
     setBusy(true);
     try {
       const url = API_BASE_URL + "/companies/takeover/" + req.id + "/approve";
-      const res = await fetch(url, {
+      const res = await authFetch(url, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ user_id: userId }),
@@ -146,7 +147,7 @@ export function TakeoverListener(props: {
     setBusy(true);
     try {
       const url = API_BASE_URL + "/companies/takeover/" + req.id + "/reject";
-      const res = await fetch(url, {
+      const res = await authFetch(url, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ user_id: userId }),
@@ -2,6 +2,7 @@ import { useEffect, useState } from "react"
 import { Button } from "@/components/ui/button"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { toast } from "sonner"
+import { authFetch } from "@/lib/api";
 
 const API_BASE_URL =
   (import.meta as any).env?.VITE_API_BASE_URL ?? "http://localhost:8000"
@@ -27,7 +28,7 @@ export function TakeoverPopup({ companyId, userId }: Props) {
 
   const loadRequests = async () => {
     try {
-      const res = await fetch(
+      const res = await authFetch(
         API_BASE_URL + "/companies/" + companyId + "/takeover-requests"
 			)
       if (!res.ok) return
@@ -49,7 +50,7 @@ export function TakeoverPopup({ companyId, userId }: Props) {
     setLoading(true)
 
     try {
-      const res = await fetch(
+      const res = await authFetch(
         API_BASE_URL + "/companies/takeover/" + id + "/approve",
         {
           method: "POST",
@@ -78,7 +79,7 @@ export function TakeoverPopup({ companyId, userId }: Props) {
     setLoading(true)
 
     try {
-      const res = await fetch(
+      const res = await authFetch(
         API_BASE_URL + "/companies/takeover/" + id + "/reject",
         {
           method: "POST",
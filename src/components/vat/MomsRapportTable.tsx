@@ -8,6 +8,7 @@ import { BoxResult } from "@/lib/vat/report";
 import { REPORT_BOX_GROUPS, getReportBox } from "@/lib/vat/reportBoxes";
 import { ChevronRight } from "lucide-react";
 import { cn } from "@/lib/utils";
+import { toOre } from "@/lib/money";
 
 interface Props {
   results: BoxResult[];
@@ -41,7 +42,7 @@ export function MomsRapportTable({ results }: Props) {
                 </TableHeader>
                 <TableBody>
                   {g.rows.map((r) => {
-                    const empty = Math.abs(r.amount) < 0.01;
+                    const empty = toOre(r.amount) === 0;
                     return (
                       <TableRow
                         key={r.box}
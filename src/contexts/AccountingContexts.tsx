@@ -3,6 +3,9 @@ import { BASAccount, getAccountClass, calculateBalance, getLatestBASAccounts } f
 import { useAuth } from "./AuthContext";
 import { authService } from "@/services/auth";
 import { parseSIEFile, generateSIEFile, convertSIEVouchersToInternal, convertSIEAccountsToBAS } from "@/lib/sie";
+import { fromOre, sumOre, toOre } from "@/lib/money";
+import { ApiError, authFetch, putSieState } from "@/lib/api";
+import { toast } from "sonner";
 
 export interface VoucherLine {
   id: string;
@@ -89,6 +92,12 @@ export function AccountingProvider({ children }: { children: ReactNode }) {
   const companyId = activeCompany?.id || "";
   const removedBasAccountsStorageKey = companyId ? `accountpro_removed_bas_accounts_${companyId}` : "";
   const activeCompanyIdRef = useRef(companyId);
+  // sie-state version this tab last read or wrote; saves send it as If-Match so they need no edit lock
+  const sieVersionRef = useRef<number | null>(null);
+  // saves run one at a time, so each If-Match carries the version the previous save returned
+  const sieSaveQueueRef = useRef<Promise<void>>(Promise.resolve());
+  // newest SIE text not yet sent; edits made while a save is in flight replace it
+  const pendingSieSaveRef = useRef<{ companyId: string; userId: number; sieContent: string } | null>(null);
 
   useEffect(() => {
     activeCompanyIdRef.current = companyId;
@@ -109,20 +118,43 @@ export function AccountingProvider({ children }: { children: ReactNode }) {
       fiscalYearEnd: activeCompany.fiscalYearEnd,
     });
 
-    fetch(`${API_BASE_URL}/companies/${numericCompanyId}/sie-state`, {
-      method: "PUT",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        user_id: numericUserId,
-        sie_content: sieContent,
-      }),
-    }).catch(() => undefined);
+    const queued = pendingSieSaveRef.current !== null;
+    pendingSieSaveRef.current = { companyId, userId: numericUserId, sieContent };
+    if (queued) return;
+
+    sieSaveQueueRef.current = sieSaveQueueRef.current.then(async () => {
+      const pending = pendingSieSaveRef.current;
+      pendingSieSaveRef.current = null;
+      if (!pending || activeCompanyIdRef.current !== pending.companyId) return;
+
+      try {
+        const payload = await putSieState(
+          Number(pending.companyId),
+          pending.userId,
+          pending.sieContent,
+          sieVersionRef.current ?? undefined
+        );
+        if (activeCompanyIdRef.current !== pending.companyId) return;
+        sieVersionRef.current = typeof payload?.version === "number" ? payload.version : null;
+      } catch (error) {
+        if (activeCompanyIdRef.current !== pending.companyId || !(error instanceof ApiError)) return;
+        if (error.status === 412) {
+          // someone else saved first; don't overwrite their version blindly (later saves need the edit lock)
+          sieVersionRef.current = null;
+          toast.error("The bookkeeping was changed by someone else, so your latest change was not saved. Reload to get their version.");
+        } else {
+          toast.error(`Saving failed: ${error.message}`);
+        }
+      }
+    });
   };
 
   // Load data when company changes
   useEffect(() => {
     const latestAccounts = getLatestBASAccounts(accountingStandard);
     const latestK3Accounts = getLatestBASAccounts("K3");
+    sieVersionRef.current = null;
+    pendingSieSaveRef.current = null;
 
     if (!companyId) {
       setAccounts(latestAccounts);
@@ -205,7 +237,7 @@ export function AccountingProvider({ children }: { children: ReactNode }) {
     const hydrationController = new AbortController();
     const requestedCompanyId = companyId;
 
-    fetch(`${API_BASE_URL}/companies/${numericCompanyId}/sie-state?user_id=${numericUserId}`, {
+    authFetch(`${API_BASE_URL}/companies/${numericCompanyId}/sie-state?user_id=${numericUserId}`, {
       signal: hydrationController.signal,
     })
       .then((response) => {
@@ -219,6 +251,7 @@ export function AccountingProvider({ children }: { children: ReactNode }) {
           return;
         }
 
+        sieVersionRef.current = typeof payload?.version === "number" ? payload.version : null;
         const sieContent = typeof payload?.sieContent === "string" ? payload.sieContent : "";
         if (!sieContent.trim()) {
           return;
@@ -313,12 +346,16 @@ export function AccountingProvider({ children }: { children: ReactNode }) {
   };
 
   const validateVoucher = (lines: VoucherLine[]) => {
-    const totalDebit = lines.reduce((sum, line) => sum + (line.debit || 0), 0);
-    const totalCredit = lines.reduce((sum, line) => sum + (line.credit || 0), 0);
-    const difference = Math.abs(totalDebit - totalCredit);
-    const isValid = difference < 0.01 && totalDebit > 0;
+    const debitOre = sumOre(lines.map((line) => line.debit || 0));
+    const creditOre = sumOre(lines.map((line) => line.credit || 0));
+    const isValid = debitOre === creditOre && debitOre > 0;
     
-    return { isValid, totalDebit, totalCredit, difference };
+    return {
+      isValid,
+      totalDebit: fromOre(debitOre),
+      totalCredit: fromOre(creditOre),
+      difference: fromOre(Math.abs(debitOre - creditOre)),
+    };
   };
 
   const createVoucher = (voucherData: Omit<Voucher, "id" | "companyId" | "voucherNumber" | "createdAt">) => {
@@ -430,10 +467,11 @@ export function AccountingProvider({ children }: { children: ReactNode }) {
       })
       .forEach(v => {
         v.lines.forEach(l => {
+          // summed in öre, converted back below
           const current = ledger.get(l.accountNumber) || { totalDebit: 0, totalCredit: 0 };
           ledger.set(l.accountNumber, {
-            totalDebit: current.totalDebit + l.debit,
-            totalCredit: current.totalCredit + l.credit,
+            totalDebit: current.totalDebit + toOre(l.debit),
+            totalCredit: current.totalCredit + toOre(l.credit),
           });
         });
       });
@@ -445,9 +483,9 @@ export function AccountingProvider({ children }: { children: ReactNode }) {
         return {
           accountNumber,
           accountName: account?.name || "Unknown",
-          totalDebit,
-          totalCredit,
-          balance: calculateBalance(accountClass, totalDebit, totalCredit),
+          totalDebit: fromOre(totalDebit),
+          totalCredit: fromOre(totalCredit),
+          balance: fromOre(calculateBalance(accountClass, totalDebit, totalCredit)),
         };
       })
       .sort((a, b) => a.accountNumber.localeCompare(b.accountNumber));
@@ -465,9 +503,7 @@ export function AccountingProvider({ children }: { children: ReactNode }) {
       (e.accountNumber.startsWith("8") && e.accountNumber !== "8310" && e.accountNumber !== "8999")
     );
 
-    const totalRevenue = revenues.reduce((sum, e) => sum + e.balance, 0);
-    const totalExpenses = expenses.reduce((sum, e) => sum + e.balance, 0);
-    const netResult = totalRevenue - totalExpenses;
+    const netResult = fromOre(sumOre(revenues.map((e) => e.balance)) - sumOre(expenses.map((e) => e.balance)));
 
     return { revenues, expenses, netResult };
   };
@@ -478,11 +514,13 @@ export function AccountingProvider({ children }: { children: ReactNode }) {
     const assets = ledger.filter(e => e.accountNumber.startsWith("1"));
     const equityLiabilities = ledger.filter(e => e.accountNumber.startsWith("2"));
 
-    const totalAssets = assets.reduce((sum, e) => sum + e.balance, 0);
-    const totalEquityLiabilities = equityLiabilities.reduce((sum, e) => sum + e.balance, 0);
+    const assetsOre = sumOre(assets.map((e) => e.balance));
+    const equityLiabilitiesOre = sumOre(equityLiabilities.map((e) => e.balance));
+    const totalAssets = fromOre(assetsOre);
+    const totalEquityLiabilities = fromOre(equityLiabilitiesOre);
     
     // In a balanced system, Assets = Equity + Liabilities
-    const isBalanced = Math.abs(totalAssets - totalEquityLiabilities) < 0.01;
+    const isBalanced = assetsOre === equityLiabilitiesOre;
 
     return { assets, equityLiabilities, totalAssets, totalEquityLiabilities, isBalanced };
   };
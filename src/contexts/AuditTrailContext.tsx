@@ -1,5 +1,10 @@
 import { createContext, useContext, useState, useEffect, ReactNode } from "react";
 import { useAuth } from "./AuthContext";
+import { authService } from "@/services/auth";
+import { shouldUseLocalStorageMode } from "@/lib/runtimeMode";
+import { authFetch } from "@/lib/api";
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
 export interface AuditEntry {
   id: string;
@@ -22,20 +27,45 @@ export function AuditTrailProvider({ children }: { children: ReactNode }) {
   const [entries, setEntries] = useState<AuditEntry[]>([]);
 
   const companyId = activeCompany?.id || "";
+  const parsedCompanyId = Number(companyId);
+  const shouldUseDatabase =
+    authService.isDatabaseConnected() && !shouldUseLocalStorageMode() && Number.isFinite(parsedCompanyId);
 
   // Load entries when company changes
   useEffect(() => {
+    let isCurrentEffect = true;
+
     if (!companyId) {
       setEntries([]);
       return;
     }
+
+    if (shouldUseDatabase && user) {
+      authFetch(`${API_BASE_URL}/companies/${parsedCompanyId}/audit?user_id=${user.id}&limit=200`)
+        .then((response) => response.json())
+        .then((payload) => {
+          if (!isCurrentEffect) return;
+          setEntries(
+            Array.isArray(payload?.entries)
+              ? payload.entries.map((entry: any) => ({ ...entry, userName: entry.userName ?? "" }))
+              : []
+          );
+        })
+        .catch(() => {
+          if (isCurrentEffect) setEntries([]);
+        });
+      return () => {
+        isCurrentEffect = false;
+      };
+    }
+
     const stored = localStorage.getItem(`accountpro_audit_trail_${companyId}`);
     if (stored) {
       setEntries(JSON.parse(stored));
     } else {
       setEntries([]);
     }
-  }, [companyId]);
+  }, [companyId, user, shouldUseDatabase, parsedCompanyId]);
 
   const addEntry = (description: string) => {
     if (!user || !companyId) return;
@@ -51,6 +81,16 @@ export function AuditTrailProvider({ children }: { children: ReactNode }) {
 
     const newEntries = [entry, ...entries];
     setEntries(newEntries);
+
+    if (shouldUseDatabase) {
+      authFetch(`${API_BASE_URL}/companies/${parsedCompanyId}/audit`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ user_id: user.id, description }),
+      }).catch(() => undefined);
+      return;
+    }
+
     localStorage.setItem(`accountpro_audit_trail_${companyId}`, JSON.stringify(newEntries));
   };
 
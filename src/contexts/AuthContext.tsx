@@ -1,7 +1,7 @@
 // src/contexts/AuthContext.tsx
 import { createContext, useContext, useState, useEffect, useRef, ReactNode } from 'react';
 import { authService, User } from '@/services/auth';
-import { unlockCompany } from "@/lib/api";
+import { authFetch, setSessionTokens, unlockCompany } from "@/lib/api";
 
 export type { User } from '@/services/auth';
 
@@ -153,7 +153,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
     const controller = new AbortController();
     companyUpdateControllersRef.current[companyId] = controller;
 
-    return fetch(API_BASE_URL + '/companies/' + companyId, {
+    return authFetch(API_BASE_URL + '/companies/' + companyId, {
       method: 'PUT',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(toCompanyRequestBody(company)),
@@ -223,7 +223,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
       }
 
       if (authService.isDatabaseConnected()) {
-        fetch(API_BASE_URL + '/companies?user_id=' + parsedUser.id)
+        authFetch(API_BASE_URL + '/companies?user_id=' + parsedUser.id)
           .then((response) => response.json())
           .then((payload) => {
             const apiCompanies = Array.isArray(payload) ? payload.map(mapCompanyFromApi) : [];
@@ -271,7 +271,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
 
     if (authService.isDatabaseConnected()) {
       try {
-        const response = await fetch(API_BASE_URL + '/companies?user_id=' + newUser.id);
+        const response = await authFetch(API_BASE_URL + '/companies?user_id=' + newUser.id);
         const payload = await response.json().catch(() => []);
         const apiCompanies = Array.isArray(payload) ? payload.map(mapCompanyFromApi) : [];
 
@@ -340,7 +340,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
     };
 
     if (authService.isDatabaseConnected()) {
-      const createResponse = await fetch(API_BASE_URL + '/companies', {
+      const createResponse = await authFetch(API_BASE_URL + '/companies', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -398,6 +398,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
 		setIsFirstTimeUser(false);
 
 		localStorage.removeItem("accountpro_user");
+		setSessionTokens(null);
 		localStorage.removeItem("accountpro_first_time");
 		localStorage.removeItem("accountpro_companies");
 		localStorage.removeItem("accountpro_active_company");
@@ -451,7 +452,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
     setUser(newUser);
     localStorage.setItem('accountpro_user', JSON.stringify(newUser));
 
-    const createCompanyRes = await fetch(API_BASE_URL + '/companies', {
+    const createCompanyRes = await authFetch(API_BASE_URL + '/companies', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(toCompanyRequestBody(company, newUser.id)),
@@ -462,7 +463,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
       throw new Error(created?.detail || created?.error || 'Failed to create company');
     }
 
-    const listRes = await fetch(API_BASE_URL + '/companies?user_id=' + newUser.id);
+    const listRes = await authFetch(API_BASE_URL + '/companies?user_id=' + newUser.id);
     const listPayload = await listRes.json().catch(() => []);
     const apiCompanies = Array.isArray(listPayload) ? listPayload.map(mapCompanyFromApi) : [];
 
@@ -505,7 +506,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
 		}
 
 		// Skapa JOIN REQUEST (inte direkt medlemskap)
-		const reqRes = await fetch(API_BASE_URL + '/companies/join-requests', {
+		const reqRes = await authFetch(API_BASE_URL + '/companies/join-requests', {
 			method: 'POST',
 			headers: { 'Content-Type': 'application/json' },
 			body: JSON.stringify({
@@ -545,7 +546,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
       setCompanies((prev) => [...prev, newCompany]);
       setActiveCompanyId(newCompany.id);
 
-      fetch(API_BASE_URL + '/companies', {
+      authFetch(API_BASE_URL + '/companies', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(toCompanyRequestBody(newCompany, user.id)),
@@ -614,7 +615,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
     const newCompanies = companies.filter((c) => c.id !== companyId);
 
     if (authService.isDatabaseConnected()) {
-      fetch(API_BASE_URL + '/companies/' + companyId, { method: 'DELETE' }).catch(() => undefined);
+      authFetch(API_BASE_URL + '/companies/' + companyId, { method: 'DELETE' }).catch(() => undefined);
       setCompanies(newCompanies);
 
       if (newCompanies.length === 0) {
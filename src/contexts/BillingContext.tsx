@@ -3,6 +3,7 @@ import { Customer, Product, Invoice, VoucherTemplate } from "@/lib/billing/types
 import { useAuth } from "./AuthContext";
 import { authService } from "@/services/auth";
 import { shouldUseLocalStorageMode } from "@/lib/runtimeMode";
+import { authFetch } from "@/lib/api";
 
 interface BillingContextType {
   customers: Customer[];
@@ -99,7 +100,7 @@ export function BillingProvider({ children }: { children: ReactNode }) {
     else setNextInvoiceNumber(1);
 
     if (shouldUseDatabase && user && hasNumericCompanyId) {
-      fetch(`${API_BASE_URL}/customers?user_id=${user.id}&company_id=${parsedCompanyId}`)
+      authFetch(`${API_BASE_URL}/customers?user_id=${user.id}&company_id=${parsedCompanyId}`)
         .then((response) => response.json())
         .then((payload) => {
           if (!isCurrentEffect) {
@@ -114,7 +115,7 @@ export function BillingProvider({ children }: { children: ReactNode }) {
           }
         });
 
-      fetch(`${API_BASE_URL}/products?user_id=${user.id}&company_id=${parsedCompanyId}`)
+      authFetch(`${API_BASE_URL}/products?user_id=${user.id}&company_id=${parsedCompanyId}`)
         .then((response) => response.json())
         .then((payload) => {
           if (!isCurrentEffect) {
@@ -181,7 +182,7 @@ export function BillingProvider({ children }: { children: ReactNode }) {
     };
 
     if (shouldUseDatabase && user && hasNumericCompanyId) {
-      fetch(`${API_BASE_URL}/customers`, {
+      authFetch(`${API_BASE_URL}/customers`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -214,7 +215,7 @@ export function BillingProvider({ children }: { children: ReactNode }) {
 
   const updateCustomer = (customer: Customer) => {
     if (shouldUseDatabase && hasNumericCompanyId) {
-      fetch(`${API_BASE_URL}/customers/${customer.id}`, {
+      authFetch(`${API_BASE_URL}/customers/${customer.id}`, {
         method: "PUT",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -242,7 +243,7 @@ export function BillingProvider({ children }: { children: ReactNode }) {
 
   const deleteCustomer = (customerId: string) => {
     if (shouldUseDatabase && hasNumericCompanyId) {
-      fetch(`${API_BASE_URL}/customers/${customerId}`, { method: "DELETE" }).then((response) => {
+      authFetch(`${API_BASE_URL}/customers/${customerId}`, { method: "DELETE" }).then((response) => {
         if (!response.ok) {
           return;
         }
@@ -265,7 +266,7 @@ export function BillingProvider({ children }: { children: ReactNode }) {
     };
 
     if (shouldUseDatabase && user && hasNumericCompanyId) {
-      fetch(`${API_BASE_URL}/products`, {
+      authFetch(`${API_BASE_URL}/products`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -295,7 +296,7 @@ export function BillingProvider({ children }: { children: ReactNode }) {
 
   const updateProduct = (product: Product) => {
     if (shouldUseDatabase && hasNumericCompanyId) {
-      fetch(`${API_BASE_URL}/products/${product.id}`, {
+      authFetch(`${API_BASE_URL}/products/${product.id}`, {
         method: "PUT",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -320,7 +321,7 @@ export function BillingProvider({ children }: { children: ReactNode }) {
 
   const deleteProduct = (productId: string) => {
     if (shouldUseDatabase && hasNumericCompanyId) {
-      fetch(`${API_BASE_URL}/products/${productId}`, { method: "DELETE" }).then((response) => {
+      authFetch(`${API_BASE_URL}/products/${productId}`, { method: "DELETE" }).then((response) => {
         if (!response.ok) {
           return;
         }
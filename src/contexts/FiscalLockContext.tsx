@@ -1,5 +1,11 @@
 import { createContext, useContext, useState, useEffect, ReactNode } from "react";
 import { useAuth } from "./AuthContext";
+import { authService } from "@/services/auth";
+import { shouldUseLocalStorageMode } from "@/lib/runtimeMode";
+import { api, authFetch } from "@/lib/api";
+import { toast } from "sonner";
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
 interface FiscalLockContextType {
   lockedYears: number[];
@@ -13,22 +19,42 @@ interface FiscalLockContextType {
 const FiscalLockContext = createContext<FiscalLockContextType | undefined>(undefined);
 
 export function FiscalLockProvider({ children }: { children: ReactNode }) {
-  const { activeCompany } = useAuth();
+  const { activeCompany, user } = useAuth();
   const companyId = activeCompany?.id || "";
   const [lockedYears, setLockedYears] = useState<number[]>([]);
 
+  const parsedCompanyId = Number(companyId);
+  // Closed years live on the server (year close stores opening balances there)
+  const shouldUseDatabase =
+    authService.isDatabaseConnected() && !shouldUseLocalStorageMode() && Number.isFinite(parsedCompanyId);
+
+  const loadClosedYears = () => {
+    if (!user) return Promise.resolve();
+    return authFetch(`${API_BASE_URL}/companies/${parsedCompanyId}/fiscal-years?user_id=${user.id}`)
+      .then((response) => response.json())
+      .then((payload) => {
+        setLockedYears(Array.isArray(payload) ? payload.map((fy: any) => Number(fy.year)) : []);
+      })
+      .catch(() => setLockedYears([]));
+  };
+
   useEffect(() => {
     if (!companyId) {
       setLockedYears([]);
       return;
     }
+    if (shouldUseDatabase) {
+      loadClosedYears();
+      return;
+    }
     const stored = localStorage.getItem(`accountpro_locked_years_${companyId}`);
     if (stored) {
       setLockedYears(JSON.parse(stored));
     } else {
       setLockedYears([]);
     }
-  }, [companyId]);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [companyId, user, shouldUseDatabase]);
 
   const save = (years: number[]) => {
     setLockedYears(years);
@@ -68,11 +94,30 @@ export function FiscalLockProvider({ children }: { children: ReactNode }) {
     return { allowed: true };
   };
 
+  const postYearAction = (year: number, action: "close" | "reopen") => {
+    if (!user) return;
+    api
+      .post(`/companies/${parsedCompanyId}/fiscal-years/${year}/${action}`, { user_id: Number(user.id) })
+      .catch((error: Error) =>
+        toast.error(`Kunde inte ${action === "close" ? "låsa" : "låsa upp"} räkenskapsår ${year}: ${error.message}`)
+      )
+      .finally(() => loadClosedYears());
+  };
+
   const lockYear = (year: number) => {
-    if (!lockedYears.includes(year)) save([...lockedYears, year]);
+    if (lockedYears.includes(year)) return;
+    if (shouldUseDatabase) {
+      postYearAction(year, "close");
+      return;
+    }
+    save([...lockedYears, year]);
   };
 
   const unlockYear = (year: number) => {
+    if (shouldUseDatabase) {
+      postYearAction(year, "reopen");
+      return;
+    }
     save(lockedYears.filter((y) => y !== year));
   };
 
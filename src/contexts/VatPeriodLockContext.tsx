@@ -1,12 +1,23 @@
 import { createContext, useContext, useEffect, useState, ReactNode } from "react";
 import { useAuth } from "./AuthContext";
 import { useVat } from "./VatContext";
+import { authService } from "@/services/auth";
+import { shouldUseLocalStorageMode } from "@/lib/runtimeMode";
+import { authFetch } from "@/lib/api";
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
+
+/** Report box -> amount, as stored when the period was locked */
+export type LockedVatBoxes = Record<string, number>;
 
 interface VatPeriodLockContextType {
   lockedPeriods: string[];
-  lockPeriod: (periodKey: string) => void;
+  lockPeriod: (periodKey: string, boxes?: LockedVatBoxes) => void;
   unlockPeriod: (periodKey: string) => void;
   isPeriodLocked: (periodKey: string) => boolean;
+  /** Box totals saved when the period was locked (database mode only, loaded on demand) */
+  lockedBoxes: (periodKey: string) => LockedVatBoxes | undefined;
+  loadLockedBoxes: (periodKey: string) => void;
   /** Given an ISO date "YYYY-MM-DD", check if the corresponding period is locked */
   isDateInLockedPeriod: (isoDate: string) => boolean;
   /** Compute the period key for a given ISO date based on company settings */
@@ -20,17 +31,38 @@ function quarterFromMonth(monthIndex: number): number {
 }
 
 export function VatPeriodLockProvider({ children }: { children: ReactNode }) {
-  const { activeCompany } = useAuth();
+  const { activeCompany, user } = useAuth();
   const { vatSettings } = useVat();
   const companyId = activeCompany?.id || "";
 
   const [lockedPeriods, setLockedPeriods] = useState<string[]>([]);
+  const [boxesByPeriod, setBoxesByPeriod] = useState<Record<string, LockedVatBoxes>>({});
+
+  const parsedCompanyId = Number(companyId);
+  const shouldUseDatabase =
+    authService.isDatabaseConnected() && !shouldUseLocalStorageMode() && Number.isFinite(parsedCompanyId);
+  const periodsUrl = `${API_BASE_URL}/companies/${parsedCompanyId}/vat-periods`;
+
+  const loadLockedPeriods = () => {
+    if (!user) return;
+    authFetch(`${periodsUrl}?user_id=${user.id}`)
+      .then((response) => response.json())
+      .then((payload) => {
+        setLockedPeriods(Array.isArray(payload) ? payload.map((p: any) => String(p.periodKey)) : []);
+      })
+      .catch(() => setLockedPeriods([]));
+  };
 
   useEffect(() => {
+    setBoxesByPeriod({});
     if (!companyId) {
       setLockedPeriods([]);
       return;
     }
+    if (shouldUseDatabase) {
+      loadLockedPeriods();
+      return;
+    }
     const stored = localStorage.getItem(`vat_locked_periods_${companyId}`);
     if (stored) {
       try {
@@ -41,21 +73,66 @@ export function VatPeriodLockProvider({ children }: { children: ReactNode }) {
     } else {
       setLockedPeriods([]);
     }
-  }, [companyId]);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [companyId, user, shouldUseDatabase]);
 
   const persist = (next: string[]) => {
     setLockedPeriods(next);
     if (companyId) localStorage.setItem(`vat_locked_periods_${companyId}`, JSON.stringify(next));
   };
 
-  const lockPeriod = (key: string) => {
-    if (!lockedPeriods.includes(key)) persist([...lockedPeriods, key]);
+  const lockPeriod = (key: string, boxes: LockedVatBoxes = {}) => {
+    if (lockedPeriods.includes(key)) return;
+    if (shouldUseDatabase && user) {
+      authFetch(`${periodsUrl}/${key}/lock`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ user_id: user.id, boxes }),
+      })
+        .then((response) => (response.ok ? response.json() : null))
+        .then((payload) => {
+          if (payload?.boxes) setBoxesByPeriod((prev) => ({ ...prev, [key]: payload.boxes }));
+        })
+        .catch(() => undefined)
+        .finally(() => loadLockedPeriods());
+      return;
+    }
+    persist([...lockedPeriods, key]);
   };
 
   const unlockPeriod = (key: string) => {
+    if (shouldUseDatabase && user) {
+      authFetch(`${periodsUrl}/${key}/unlock`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ user_id: user.id }),
+      })
+        .then(() => {
+          setBoxesByPeriod((prev) => {
+            const next = { ...prev };
+            delete next[key];
+            return next;
+          });
+        })
+        .catch(() => undefined)
+        .finally(() => loadLockedPeriods());
+      return;
+    }
     persist(lockedPeriods.filter((k) => k !== key));
   };
 
+  const lockedBoxes = (key: string) => boxesByPeriod[key];
+
+  const loadLockedBoxes = (key: string) => {
+    if (!shouldUseDatabase || !user || boxesByPeriod[key]) return;
+    authFetch(`${periodsUrl}/${key}/report?user_id=${user.id}`)
+      .then((response) => (response.ok ? response.json() : null))
+      .then((payload) => {
+        if (payload?.boxes) setBoxesByPeriod((prev) => ({ ...prev, [key]: payload.boxes }));
+      })
+      .catch(() => undefined);
+  };
+
   const isPeriodLocked = (key: string) => lockedPeriods.includes(key);
 
   const periodKeyForDate = (isoDate: string): string => {
@@ -75,7 +152,7 @@ export function VatPeriodLockProvider({ children }: { children: ReactNode }) {
   };
 
   return (
-    <VatPeriodLockContext.Provider value={{ lockedPeriods, lockPeriod, unlockPeriod, isPeriodLocked, isDateInLockedPeriod, periodKeyForDate }}>
+    <VatPeriodLockContext.Provider value={{ lockedPeriods, lockPeriod, unlockPeriod, isPeriodLocked, lockedBoxes, loadLockedBoxes, isDateInLockedPeriod, periodKeyForDate }}>
       {children}
     </VatPeriodLockContext.Provider>
   );
@@ -3,6 +3,82 @@
 const API_BASE =
   ((import.meta as any).env?.VITE_API_BASE_URL || 'http://localhost:8000').replace(/\/+$/, '');
 
+// ---- Session tokens (signed by the backend, see /auth/login and /auth/refresh) ----
+const TOKEN_STORAGE_KEY = 'sessionTokens';
+
+type SessionTokens = { accessToken: string; refreshToken: string };
+
+function readSessionTokens(): SessionTokens | null {
+  try {
+    const raw = localStorage.getItem(TOKEN_STORAGE_KEY);
+    return raw ? (JSON.parse(raw) as SessionTokens) : null;
+  } catch {
+    return null;
+  }
+}
+
+export function setSessionTokens(tokens: Partial<SessionTokens> | null) {
+  if (tokens?.accessToken && tokens.refreshToken) {
+    localStorage.setItem(
+      TOKEN_STORAGE_KEY,
+      JSON.stringify({ accessToken: tokens.accessToken, refreshToken: tokens.refreshToken })
+    );
+  } else {
+    localStorage.removeItem(TOKEN_STORAGE_KEY);
+  }
+}
+
+// Thrown by apiRequest for non-2xx responses; `data` is the parsed body (detail, currentVersion, ...)
+export class ApiError extends Error {
+  status: number;
+  data: any;
+
+  constructor(message: string, status: number, data: any) {
+    super(message);
+    this.status = status;
+    this.data = data;
+  }
+}
+
+let refreshing: Promise<boolean> | null = null;
+
+// one refresh at a time, shared by every request that got a 401
+function refreshSession(): Promise<boolean> {
+  const tokens = readSessionTokens();
+  if (!tokens) return Promise.resolve(false);
+  refreshing ??= fetch(API_BASE + '/auth/refresh', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ refresh_token: tokens.refreshToken }),
+  })
+    .then(async (res) => {
+      const data = res.ok ? await res.json().catch(() => null) : null;
+      setSessionTokens(data);
+      return Boolean(data?.accessToken);
+    })
+    .catch(() => false)
+    .finally(() => {
+      refreshing = null;
+    });
+  return refreshing;
+}
+
+// fetch() with the session token, refreshed once on a 401; for callers that read the Response themselves
+export async function authFetch(url: string, init: RequestInit = {}, retried = false): Promise<Response> {
+  const headers = new Headers(init.headers);
+  const tokens = readSessionTokens();
+  if (tokens && !headers.has('Authorization')) {
+    headers.set('Authorization', 'Bearer ' + tokens.accessToken);
+  }
+
+  const res = await fetch(url, { ...init, headers });
+
+  if (res.status === 401 && tokens && !retried && (await refreshSession())) {
+    return authFetch(url, init, true);
+  }
+  return res;
+}
+
 export async function apiRequest<T = any>(
   path: string,
   options: RequestInit & { json?: any } = {}
@@ -23,7 +99,7 @@ export async function apiRequest<T = any>(
     body = JSON.stringify(options.json);
   }
 
-  const res = await fetch(url, {
+  const res = await authFetch(url, {
     ...options,
     headers,
     body,
@@ -37,11 +113,12 @@ export async function apiRequest<T = any>(
     : await res.text().catch(() => '');
 
   if (!res.ok) {
+    const detail = data && typeof data === 'object' ? data.detail || data.message || data.error : null;
     const msg =
-      (data && typeof data === 'object' && (data.detail || data.message || data.error)) ||
+      (detail && typeof detail === 'object' ? detail.message : detail) ||
       (typeof data === 'string' && data) ||
       ('Request failed (' + res.status + ')');
-    throw new Error(String(msg));
+    throw new ApiError(String(msg), res.status, data);
   }
 
   return data as T;
@@ -65,8 +142,9 @@ export async function listCompanies(userId: number) {
 }
 
 // lock / unlock (backend verkar redan stödja detta)
-export async function lockCompany(companyId: number | string, userId: number | string) {
-  return api.post('/companies/' + companyId + '/lock', { user_id: Number(userId) });
+// scope: 'company' (default), 'billing', 'payroll', 'series:<serie>' or 'year:<YYYY>'
+export async function lockCompany(companyId: number | string, userId: number | string, scope?: string) {
+  return api.post('/companies/' + companyId + '/lock', { user_id: Number(userId), scope });
 }
 
 // takeover (lock)
@@ -76,8 +154,8 @@ export async function createTakeoverRequest(companyId: number | string, userId:
   });
 }
 
-export async function unlockCompany(companyId: number | string, userId: number | string) {
-  return api.post('/companies/' + companyId + '/unlock', { user_id: Number(userId) });
+export async function unlockCompany(companyId: number | string, userId: number | string, scope?: string) {
+  return api.post('/companies/' + companyId + '/unlock', { user_id: Number(userId), scope });
 }
 
 // ---- Companies: create / join / members / requests ----
@@ -170,8 +248,8 @@ export async function decideJoinRequest(
 }
 
 // ---- Lock heartbeat ----
-export async function lockHeartbeat(companyId: number | string, userId: number | string) {
-  return api.post('/companies/' + companyId + '/lock/heartbeat', { user_id: Number(userId) });
+export async function lockHeartbeat(companyId: number | string, userId: number | string, scope?: string) {
+  return api.post('/companies/' + companyId + '/lock/heartbeat', { user_id: Number(userId), scope });
 }
 
 // ---- SIE state ----
@@ -179,6 +257,24 @@ export async function getSieState(companyId: number | string, userId: number | s
   return api.get('/companies/' + companyId + '/sie-state?user_id=' + Number(userId));
 }
 
-export async function putSieState(companyId: number | string, userId: number | string, sieContent: string) {
-  return api.put('/companies/' + companyId + '/sie-state', { user_id: Number(userId), sie_content: sieContent });
+// With `version` the save is a compare-and-swap (If-Match) and needs no edit lock; 412 means it is stale.
+export async function putSieState(
+  companyId: number | string,
+  userId: number | string,
+  sieContent: string,
+  version?: number
+) {
+  return apiRequest('/companies/' + companyId + '/sie-state', {
+    method: 'PUT',
+    json: { user_id: Number(userId), sie_content: sieContent },
+    headers: version !== undefined ? { 'If-Match': '"' + version + '"' } : undefined,
+  });
+}
+
+// Write-behind save (needs the edit lock): acknowledged at once, written together with the rest of the burst.
+export async function autosaveSieState(companyId: number | string, userId: number | string, sieContent: string) {
+  return apiRequest('/companies/' + companyId + '/sie-state/autosave', {
+    method: 'PUT',
+    json: { user_id: Number(userId), sie_content: sieContent },
+  });
 }
\ No newline at end of file
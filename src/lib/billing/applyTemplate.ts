@@ -1,4 +1,5 @@
 import { Invoice, VoucherTemplate, VoucherTemplateLine } from "./types";
+import { sumOre } from "../money";
 
 export interface BuiltVoucherLine {
   id: string;
@@ -47,7 +48,7 @@ export function buildVoucherFromTemplate(
 
 export function isTemplateBalanced(invoice: Invoice, template: VoucherTemplate): boolean {
   const built = buildVoucherFromTemplate(invoice, template);
-  const debit = built.lines.reduce((s, l) => s + l.debit, 0);
-  const credit = built.lines.reduce((s, l) => s + l.credit, 0);
-  return Math.abs(debit - credit) < 0.01 && debit > 0;
+  const debit = sumOre(built.lines.map((l) => l.debit));
+  const credit = sumOre(built.lines.map((l) => l.credit));
+  return debit === credit && debit > 0;
 }
@@ -0,0 +1,15 @@
+// Amounts as whole öre, the way the backend stores them, so sums and balance
+// checks are exact integer arithmetic instead of float comparisons.
+
+export function toOre(amount: number): number {
+  return Math.round(amount * 100);
+}
+
+export function fromOre(ore: number): number {
+  return ore / 100;
+}
+
+/** Exact sum of SEK amounts, in öre. */
+export function sumOre(amounts: number[]): number {
+  return amounts.reduce((sum, amount) => sum + toOre(amount), 0);
+}
@@ -3,6 +3,7 @@
 
 import { BASAccount, getAccountClass } from "./bas-accounts";
 import { Voucher, VoucherLine } from "@/contexts/AccountingContexts";
+import { fromOre, sumOre } from "./money";
 
 export interface SIEAccount {
   number: string;
@@ -57,12 +58,12 @@ export function parseSIEFile(content: string): SIEParseResult {
     // Handle voucher block closing
     if (trimmedLine === "}") {
       if (currentVoucher) {
-        // Validate voucher balance
-        const totalDebit = currentVoucher.lines.reduce((sum, l) => sum + l.debit, 0);
-        const totalCredit = currentVoucher.lines.reduce((sum, l) => sum + l.credit, 0);
+        // Validate voucher balance (in öre, as the backend stores the lines)
+        const totalDebit = sumOre(currentVoucher.lines.map((l) => l.debit));
+        const totalCredit = sumOre(currentVoucher.lines.map((l) => l.credit));
         
-        if (Math.abs(totalDebit - totalCredit) > 0.01) {
-          result.errors.push(`Line ${lineNumber}: Voucher ${currentVoucher.series}${currentVoucher.number} is unbalanced (debit: ${totalDebit}, credit: ${totalCredit})`);
+        if (totalDebit !== totalCredit) {
+          result.errors.push(`Line ${lineNumber}: Voucher ${currentVoucher.series}${currentVoucher.number} is unbalanced (debit: ${fromOre(totalDebit)}, credit: ${fromOre(totalCredit)})`);
         } else if (currentVoucher.lines.length > 0) {
           result.vouchers.push(currentVoucher);
         }
@@ -30,6 +30,7 @@ import { Footer } from "@/components/layout/Footer";
 import { TakeoverPopup } from "@/components/company/TakeoverPopup";
 import { TakeoverListener } from "@/components/company/TakeoverListener";
 import { MomsSettingsCard } from "@/components/vat/MomsSettingsCard";
+import { authFetch } from "@/lib/api";
 
 const API_BASE_URL = (import.meta as any).env?.VITE_API_BASE_URL ?? "http://localhost:8000";
 
@@ -204,15 +205,11 @@ export default function CompanyPage() {
 
         if (result.success) {
           if (authService.isDatabaseConnected() && user) {
-            fetch(API_BASE_URL + '/sie-files', {
+            const form = new FormData();
+            form.append("file", file, file.name);
+            authFetch(API_BASE_URL + '/sie-files/upload?user_id=' + encodeURIComponent(String(user.id)), {
               method: "POST",
-              headers: { "Content-Type": "application/json" },
-              body: JSON.stringify({
-                user_id: Number(user.id),
-                filename: file.name,
-                storage_path: 'browser-upload:' + file.name,
-                period: new Date().getFullYear().toString(),
-              }),
+              body: form,
             }).catch(() => undefined);
           }
 
@@ -1,5 +1,5 @@
 import { Link } from "react-router-dom";
-import { useMemo, useEffect } from "react";
+import { useMemo, useEffect, useState } from "react";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import {
@@ -23,7 +23,21 @@ import {
 import { Area, AreaChart, XAxis, YAxis, ReferenceLine } from "recharts";
 import { useAccounting } from "@/contexts/AccountingContext";
 import { useAuth } from "@/contexts/AuthContext";
+import { authService } from "@/services/auth";
+import { shouldUseLocalStorageMode } from "@/lib/runtimeMode";
 import { format, startOfMonth, endOfMonth, subMonths } from "date-fns";
+import { authFetch } from "@/lib/api";
+import { fromOre, sumOre } from "@/lib/money";
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
+
+interface CompanySummary {
+  revenue: number;
+  expenses: number;
+  netResult: number;
+  months: { month: string; netResult: number }[];
+  rolling12NetResult: number;
+}
 
 const economyModules = [
   {
@@ -72,7 +86,12 @@ const chartConfig = {
 
 export default function EconomyIndex() {
   const { getIncomeStatement } = useAccounting();
-  const { user } = useAuth();
+  const { user, activeCompany } = useAuth();
+  const [summary, setSummary] = useState<CompanySummary | null>(null);
+
+  const parsedCompanyId = Number(activeCompany?.id);
+  const shouldUseDatabase =
+    authService.isDatabaseConnected() && !shouldUseLocalStorageMode() && Number.isFinite(parsedCompanyId);
 
   // Scroll to top on mount
   useEffect(() => {
@@ -81,10 +100,38 @@ export default function EconomyIndex() {
 
   const currentYear = new Date().getFullYear();
 
+  // With the database the key figures come pre-aggregated from the server in one request
+  useEffect(() => {
+    let isCurrentEffect = true;
+    setSummary(null);
+    if (!shouldUseDatabase || !user) return;
+
+    authFetch(`${API_BASE_URL}/companies/${parsedCompanyId}/summary?user_id=${user.id}&period=${currentYear}`)
+      .then((response) => (response.ok ? response.json() : null))
+      .then((payload) => {
+        if (isCurrentEffect && payload) setSummary(payload);
+      })
+      .catch(() => undefined);
+    return () => {
+      isCurrentEffect = false;
+    };
+  }, [shouldUseDatabase, parsedCompanyId, user, currentYear]);
+
   const monthlyData = useMemo(() => {
     const data = [];
     const now = new Date();
     const currentMonth = now.getMonth(); // 0-11
+
+    if (summary) {
+      return summary.months.slice(0, currentMonth + 1).map((month, i) => {
+        const monthDate = new Date(currentYear, i, 1);
+        return {
+          month: format(monthDate, "MMM"),
+          fullMonth: format(monthDate, "MMMM yyyy"),
+          netResult: month.netResult,
+        };
+      });
+    }
     
     for (let i = 0; i <= currentMonth; i++) {
       const monthDate = new Date(currentYear, i, 1);
@@ -101,28 +148,33 @@ export default function EconomyIndex() {
     }
     
     return data;
-  }, [getIncomeStatement, currentYear]);
+  }, [getIncomeStatement, currentYear, summary]);
 
   const hasData = monthlyData.some(d => d.netResult !== 0);
 
   // Year-to-date totals
   const yearTotals = useMemo(() => {
+    if (summary) {
+      return { totalRevenue: summary.revenue, totalExpenses: summary.expenses, netResult: summary.netResult };
+    }
     const yearStart = `${currentYear}-01-01`;
     const yearEnd = format(endOfMonth(new Date()), "yyyy-MM-dd");
     const { revenues, expenses, netResult } = getIncomeStatement(yearStart, yearEnd);
-    const totalRevenue = revenues.reduce((sum, r) => sum + Math.abs(r.balance), 0);
-    const totalExpenses = expenses.reduce((sum, e) => sum + Math.abs(e.balance), 0);
+    // signed balances, so totalRevenue - totalExpenses is netResult (same as the summary endpoint)
+    const totalRevenue = fromOre(sumOre(revenues.map((r) => r.balance)));
+    const totalExpenses = fromOre(sumOre(expenses.map((e) => e.balance)));
     return { totalRevenue, totalExpenses, netResult };
-  }, [getIncomeStatement, currentYear]);
+  }, [getIncomeStatement, currentYear, summary]);
 
   // Rolling 12-month net result
   const rolling12 = useMemo(() => {
+    if (summary) return summary.rolling12NetResult;
     const now = new Date();
     const start = format(startOfMonth(subMonths(now, 11)), "yyyy-MM-dd");
     const end = format(endOfMonth(now), "yyyy-MM-dd");
     const { netResult } = getIncomeStatement(start, end);
     return netResult;
-  }, [getIncomeStatement]);
+  }, [getIncomeStatement, summary]);
 
   // Not logged in - show informational overview
   if (!user) {
@@ -1,4 +1,4 @@
-import { useMemo, useState } from "react";
+import { useEffect, useMemo, useState } from "react";
 import { Calculator, Lock, Unlock, FileText, AlertTriangle, CheckCircle2 } from "lucide-react";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
@@ -30,7 +30,7 @@ export default function MomsPage() {
   const { vouchers } = useAccounting();
   const { invoices } = useBilling();
   const { vatCodes, vatSettings, setVatSettings } = useVat();
-  const { lockPeriod, unlockPeriod, isPeriodLocked, periodKeyForDate } = useVatPeriodLock();
+  const { lockPeriod, unlockPeriod, isPeriodLocked, lockedBoxes, loadLockedBoxes, periodKeyForDate } = useVatPeriodLock();
 
   const [year, setYear] = useState<number | undefined>(new Date().getFullYear());
   const [periodIdx, setPeriodIdx] = useState(Math.floor(new Date().getMonth() / 3));
@@ -62,17 +62,26 @@ export default function MomsPage() {
     return { startDate: format(s, "yyyy-MM-dd"), endDate: format(e, "yyyy-MM-dd"), periodLabel: label, periodKey: key };
   }, [year, reportingPeriod, periodIdx]);
 
-  const results = useMemo(
-    () => computeReportBoxes({ invoices, vouchers, codes: vatCodes, startDate, endDate }),
-    [invoices, vouchers, vatCodes, startDate, endDate]
-  );
+  const locked = isPeriodLocked(periodKey);
+  const storedBoxes = locked ? lockedBoxes(periodKey) : undefined;
+
+  useEffect(() => {
+    if (locked) loadLockedBoxes(periodKey);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [locked, periodKey]);
+
+  // A locked period shows the totals saved when it was locked, not a recomputation
+  const results = useMemo(() => {
+    const computed = computeReportBoxes({ invoices, vouchers, codes: vatCodes, startDate, endDate });
+    if (!storedBoxes) return computed;
+    return computed.map((r) => ({ ...r, amount: storedBoxes[r.box] ?? 0 }));
+  }, [invoices, vouchers, vatCodes, startDate, endDate, storedBoxes]);
 
   const sumBoxes = (nums: string[]) => results.filter((r) => nums.includes(r.box)).reduce((s, r) => s + r.amount, 0);
   const utgaende = sumBoxes(["10", "11", "12", "30", "31", "32", "60", "61", "62"]);
   const ingaende = sumBoxes(["48"]);
   const attBetala = utgaende - ingaende;
 
-  const locked = isPeriodLocked(periodKey);
   const status: MomsPeriodStatus = locked ? "last" : reviewMarked[periodKey] ? "klar" : "pagaende";
 
   // Varningar
@@ -334,7 +343,7 @@ export default function MomsPage() {
         onOpenChange={setLockOpen}
         periodLabel={periodLabel}
         onConfirm={() => {
-          lockPeriod(periodKey);
+          lockPeriod(periodKey, Object.fromEntries(results.map((r) => [r.box, r.amount])));
           setLockOpen(false);
           toast.success(`Momsperioden ${periodLabel} är nu låst`);
         }}
@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { Users, Plus, Trash2, Edit, Lock } from "lucide-react";
+import { Users, Plus, Trash2, Edit, Lock, Play } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
@@ -28,8 +28,13 @@ import {
   AlertDialogTitle,
 } from "@/components/ui/alert-dialog";
 import { useAuth } from "@/contexts/AuthContext";
+import { authService } from "@/services/auth";
+import { shouldUseLocalStorageMode } from "@/lib/runtimeMode";
 import { toast } from "sonner";
 import { Link } from "react-router-dom";
+import { authFetch } from "@/lib/api";
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
 interface Employee {
   id: string;
@@ -41,6 +46,8 @@ interface Employee {
   salary: number;
   jobTitle: string;
   employmentType: "full-time" | "part-time" | "seasonal" | "hourly";
+  // municipal tax table (29-42); the server default is used when missing
+  taxTable?: number;
 }
 
 function EmployeeForm({
@@ -63,6 +70,7 @@ function EmployeeForm({
   const [city, setCity] = useState(editEmployee?.city || "");
   const [salary, setSalary] = useState(editEmployee?.salary?.toString() || "");
   const [jobTitle, setJobTitle] = useState(editEmployee?.jobTitle || "");
+  const [taxTable, setTaxTable] = useState(editEmployee?.taxTable?.toString() || "");
 
   const handleSubmit = (e: React.FormEvent) => {
     e.preventDefault();
@@ -75,6 +83,10 @@ function EmployeeForm({
     if (!city.trim()) { toast.error("City is required"); return; }
     if (!salary || parseFloat(salary) <= 0) { toast.error("Valid salary is required"); return; }
     if (!jobTitle.trim()) { toast.error("Job title is required"); return; }
+    const parsedTaxTable = taxTable ? parseInt(taxTable, 10) : undefined;
+    if (parsedTaxTable !== undefined && !(parsedTaxTable >= 29 && parsedTaxTable <= 42)) {
+      toast.error("Tax table must be between 29 and 42"); return;
+    }
 
     onSubmit({
       name: name.trim(),
@@ -85,6 +97,7 @@ function EmployeeForm({
       salary: parseFloat(salary),
       jobTitle: jobTitle.trim(),
       employmentType,
+      taxTable: parsedTaxTable,
     });
   };
 
@@ -143,6 +156,10 @@ function EmployeeForm({
           </Select>
         </div>
       </div>
+      <div className="space-y-1.5">
+        <Label className="text-xs">Tax Table</Label>
+        <Input type="number" min="29" max="42" step="1" value={taxTable} onChange={(e) => setTaxTable(e.target.value)} placeholder="e.g. 33 (from the employee's municipality)" className="h-9 text-sm" />
+      </div>
       <div className="flex gap-3 pt-3">
         <Button type="button" variant="outline" onClick={onCancel} className="flex-1" size="sm">Cancel</Button>
         <Button type="submit" className="flex-1" size="sm">{editEmployee ? "Save Changes" : "Add Employee"}</Button>
@@ -173,6 +190,15 @@ export default function SalaryPage() {
   const [dialogOpen, setDialogOpen] = useState(false);
   const [editingEmployee, setEditingEmployee] = useState<Employee | undefined>();
   const [deleteConfirm, setDeleteConfirm] = useState<string | null>(null);
+  const [runningPayroll, setRunningPayroll] = useState(false);
+  // hours worked this month per hourly employee, asked for before the run
+  const [hoursDialogOpen, setHoursDialogOpen] = useState(false);
+  const [payrollHours, setPayrollHours] = useState<Record<string, string>>({});
+  const hourlyEmployees = employees.filter((e) => e.employmentType === "hourly");
+
+  const parsedCompanyId = Number(companyId);
+  const shouldUseDatabase =
+    authService.isDatabaseConnected() && !shouldUseLocalStorageMode() && Number.isFinite(parsedCompanyId);
 
   const saveEmployees = (updated: Employee[]) => {
     setEmployees(updated);
@@ -199,6 +225,56 @@ export default function SalaryPage() {
     toast.success("Employee deleted");
   };
 
+  // Gross to net, employer contributions and vacation accrual are computed server-side,
+  // which also books the salary voucher for the month (paid on the 25th)
+  const handleRunPayroll = async () => {
+    if (!user) return;
+    const missingHours = hourlyEmployees.filter((e) => !(parseFloat(payrollHours[e.id]) >= 0));
+    if (missingHours.length > 0) {
+      toast.error(`Enter hours worked for ${missingHours.map((e) => e.name).join(", ")}`);
+      return;
+    }
+    setHoursDialogOpen(false);
+    const now = new Date();
+    const period = `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, "0")}`;
+    setRunningPayroll(true);
+    try {
+      const response = await authFetch(`${API_BASE_URL}/companies/${parsedCompanyId}/payroll-runs`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          user_id: user.id,
+          period,
+          pay_date: `${period}-25`,
+          employees: employees.map((e) => ({
+            employee_id: e.id,
+            name: e.name,
+            personal_number: e.personalNumber,
+            employment_type: e.employmentType,
+            salary: e.salary,
+            hours: e.employmentType === "hourly" ? parseFloat(payrollHours[e.id]) : undefined,
+            tax_table: e.taxTable,
+          })),
+        }),
+      });
+      const payload = await response.json().catch(() => null);
+      if (!response.ok) {
+        const detail = payload?.detail;
+        toast.error(typeof detail === "string" ? detail : detail?.message || "Payroll run failed");
+        return;
+      }
+      setPayrollHours({});
+      toast.success(
+        `Payroll ${period}: net ${payload.net.toLocaleString("sv-SE")} SEK, tax ${payload.tax.toLocaleString("sv-SE")} SEK` +
+          (payload.voucherNumber ? ` (voucher A${payload.voucherNumber})` : "")
+      );
+    } catch {
+      toast.error("Payroll run failed");
+    } finally {
+      setRunningPayroll(false);
+    }
+  };
+
   const employmentLabel = (t: string) => {
     switch (t) {
       case "full-time": return "Full-time";
@@ -316,8 +392,19 @@ export default function SalaryPage() {
       {/* Summary */}
       {employees.length > 0 && (
         <Card>
-          <CardHeader className="py-3 pb-2">
+          <CardHeader className="py-3 pb-2 flex flex-row items-center justify-between space-y-0">
             <CardTitle className="text-sm">Payroll Summary</CardTitle>
+            {shouldUseDatabase && (
+              <Button
+                size="sm"
+                variant="outline"
+                disabled={runningPayroll}
+                onClick={() => (hourlyEmployees.length > 0 ? setHoursDialogOpen(true) : handleRunPayroll())}
+              >
+                <Play className="h-3.5 w-3.5 mr-1" />
+                {runningPayroll ? "Running..." : "Run Payroll"}
+              </Button>
+            )}
           </CardHeader>
           <CardContent className="pb-3">
             <div className="grid grid-cols-3 gap-3 text-sm">
@@ -356,6 +443,35 @@ export default function SalaryPage() {
         </DialogContent>
       </Dialog>
 
+      {/* Hours for hourly employees */}
+      <Dialog open={hoursDialogOpen} onOpenChange={setHoursDialogOpen}>
+        <DialogContent className="max-w-md">
+          <DialogHeader>
+            <DialogTitle className="text-base">Hours worked this month</DialogTitle>
+          </DialogHeader>
+          <div className="space-y-3">
+            {hourlyEmployees.map((emp) => (
+              <div key={emp.id} className="grid grid-cols-2 items-center gap-3">
+                <Label className="text-xs">{emp.name} ({emp.salary.toLocaleString("sv-SE")} SEK/h)</Label>
+                <Input
+                  type="number"
+                  min="0"
+                  step="0.5"
+                  value={payrollHours[emp.id] ?? ""}
+                  onChange={(e) => setPayrollHours((prev) => ({ ...prev, [emp.id]: e.target.value }))}
+                  placeholder="Hours"
+                  className="h-9 text-sm"
+                />
+              </div>
+            ))}
+            <div className="flex gap-3 pt-3">
+              <Button type="button" variant="outline" onClick={() => setHoursDialogOpen(false)} className="flex-1" size="sm">Cancel</Button>
+              <Button type="button" onClick={handleRunPayroll} disabled={runningPayroll} className="flex-1" size="sm">Run Payroll</Button>
+            </div>
+          </div>
+        </DialogContent>
+      </Dialog>
+
       {/* Delete confirmation */}
       <AlertDialog open={!!deleteConfirm} onOpenChange={() => setDeleteConfirm(null)}>
         <AlertDialogContent>
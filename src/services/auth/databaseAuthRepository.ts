@@ -1,4 +1,5 @@
 import { IAuthRepository, AuthCredentials, SignupData, AuthResult, User } from "./types";
+import { setSessionTokens } from "@/lib/api";
 
 const apiBaseUrl = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
@@ -18,6 +19,8 @@ export class DatabaseAuthRepository implements IAuthRepository {
       };
     }
 
+    setSessionTokens(payload);
+
     return {
       success: true,
       user: payload.user as User,